@@ -1,9 +1,18 @@
 import argparse
 import os
-from pypdf import PdfReader
+from pypdf import PdfReader, PdfWriter
 import re
-import urllib.request
-import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from classifier import Classifier, confident_match, load_classification
+from dest_index import DEFAULT_DEST_INDEX_PATH, DestinationIndex
+from isbn_lookup import DAY, DEFAULT_CACHE_PATH, GoogleBooksProvider, IsbnLookup, LookupCache, OpenLibraryProvider
+from metadata_resolver import STRATEGIES, MetadataResolver, ProviderSlot
+import metrics
+from metrics import METRICS
+from pdf_update import update_info, update_many
+from scan_index import DEFAULT_INDEX_PATH, ScanIndex, iter_files
 
 __author__ = "Fabian Schober"
 __version__ = "0.1.0"
@@ -12,76 +21,268 @@ __license__ = "MIT"
 target_filelist = []
 dest_dirlist = []
 
-def target_to_filelist(target_dir):
-    pdf_files = []
-    for root, dirs, files in os.walk(target_dir, topdown=False):
-        for name in files:
-            # print(os.path.join(root, name))
+GOOGLE_BOOKS = GoogleBooksProvider()
+OPEN_LIBRARY = OpenLibraryProvider()
+
+ISBN_PAGE_BUDGET = 9
+# ISBN-10 or ISBN-13 with optional hyphens/dashes/spaces between the digits
+ISBN_PATTERN = re.compile(r"(?<![0-9Xx])(?:97[89][-– ]?)?[0-9](?:[-– ]?[0-9]){8}[-– ]?[0-9Xx](?![0-9Xx])")
+
+def target_to_filelist(target_dir, index=None, full_scan=False):
+    # With a ScanIndex, unchanged files come back with "indexed" and their stored metadata
+    with METRICS.stage("scan"):
+        if index is not None:
+            pdf_files = index.scan(target_dir, full_scan)
+            for file in pdf_files:
+                file["filename"] = clean_filename(file["filename"])
+            return pdf_files
+
+        pdf_files = []
+        for root, entry in iter_files(target_dir):
             pdf_files.append(
                 {
-                "filepath": os.path.join(root, name), 
-                "filename": clean_filename(name)
+                "filepath": entry.path, 
+                "filename": clean_filename(entry.name)
                 }
                 )
-    return pdf_files
+        return pdf_files
 
-def dest_to_dirlist(dirlist_dir):
-    dirs = []
-    for root, dirs, files in os.walk(dirlist_dir, topdown=False):
-        for name in dirs:
-            # print(os.path.join(root, name))
-            dirs.append(os.path.join(root, name))
-    return dirs
+def dest_to_dirlist(dirlist_dir, index_path=None):
+    # All directories below dirlist_dir, through the (optionally persistent) destination index
+    return list(DestinationIndex(dirlist_dir, index_path).refresh().paths)
+
+def open_dest_index(args):
+    with METRICS.stage("dest_index"):
+        return DestinationIndex(args.dest_dir, None if args.no_dest_index else args.dest_index).refresh()
 
 def clean_filename(filename):
     return filename.replace("_", " ").replace("-", " ")
 
-def pdf_existing_metadata_extractor(pdf_file):
-    reader = PdfReader(pdf_file["filepath"])
-    pdf_meta = reader.metadata
-    
-    pdf_file["title" ]= pdf_meta.title
-    pdf_file["author"] = pdf_meta.author
-    pdf_file["subject"] = pdf_meta.subject
-    pdf_file["isbn"] = extract_isbns(reader)
-
-    # print(pdf_file)
-
-def extract_isbns(reader):
-
-    text = ""
-    number_of_pages = len(reader.pages)
-    for i in range(9):
-        page = reader.pages[i]
-        text += page.extract_text()
-   
-    # print(text[100:])
-    # Define a regex pattern to match ISBNs
-    isbn_pattern = r"((978[-– ])?[0-9][0-9-– ]{10}[-– ][0-9xX])|((978)?[0-9]{9}[0-9Xx])"
-
-    # Find all matches of the ISBN pattern in the text
-    isbns = re.findall(isbn_pattern, text)
-    # print(isbns)
-
-    # Extract only the portions with numbers and dashes
-    isbns_cleaned = [isbn[0] for isbn in isbns if isbn != '']
-
-    return isbns_cleaned
-
-def pdf_metadata_completion(pdf_file):
+def pdf_existing_metadata_extractor(pdf_file, isbn_pages=ISBN_PAGE_BUDGET):
+    """
+    Identifies a PDF, the cheapest source first.
+
+    1. The file name. The Info dictionary is still read for the title,
+       author and subject, but the XMP and text stages are skipped.
+    2. The Info dictionary, only the cross-reference table and trailer are read.
+    3. The XMP metadata stream.
+    4. The text layer of at most isbn_pages pages.
+
+    Sets "title", "author", "subject", "isbn", "isbn_source", the stage the
+    ISBNs came from (None if no stage found one), and "filename_title", the
+    file name without ISBN.
+    """
+    with METRICS.stage("identify_filename"):
+        filename_isbns, title = filename_identity(os.path.basename(pdf_file["filepath"]))
+
+    with open(pdf_file["filepath"], "rb") as file:
+        with METRICS.stage("pdf_parse"):
+            # A file object keeps PdfReader from reading the whole file into memory
+            reader = PdfReader(file)
+            pdf_meta = reader.metadata
+        METRICS.count("pdfs_parsed")
+
+        pdf_file["title" ]= pdf_meta.title if pdf_meta else None
+        pdf_file["author"] = pdf_meta.author if pdf_meta else None
+        pdf_file["subject"] = pdf_meta.subject if pdf_meta else None
+        if filename_isbns:
+            return identified(pdf_file, filename_isbns, "filename", title)
+
+        with METRICS.stage("identify_info"):
+            isbns = info_isbns(pdf_meta)
+        if isbns:
+            return identified(pdf_file, isbns, "info", title)
+
+        with METRICS.stage("identify_xmp"):
+            isbns = xmp_isbns(reader)
+        if isbns:
+            return identified(pdf_file, isbns, "xmp", title)
+
+        with METRICS.stage("isbn_extraction"):
+            isbns = extract_isbns(reader, isbn_pages)
+    return identified(pdf_file, isbns, "text" if isbns else None, title)
+
+def identified(pdf_file, isbns, source, filename_title):
+    pdf_file["isbn"] = isbns
+    pdf_file["isbn_source"] = source
+    # What the classifier falls back to if no title is known
+    pdf_file["filename_title"] = filename_title
+    METRICS.count(f"identified_by_{source}" if source else "unidentified")
+    return pdf_file
+
+def filename_identity(filename):
+    """
+    Returns:
+        tuple: (ISBNs in the file name, the rest of the name as a title or None)
+    """
+    name = clean_filename(os.path.splitext(filename)[0])
+    isbns = find_isbns(name)
+    if not re.search(r"isbn", name, re.IGNORECASE):
+        # A ten digit number with a valid checksum is too common in file names
+        isbns = [isbn for isbn in isbns if len(isbn) == 13]
+    title = ISBN_PATTERN.sub(" ", name)
+    title = " ".join(re.sub(r"\bisbn\b:?", " ", title, flags=re.IGNORECASE).split())
+    return isbns, title or None
+
+def info_isbns(pdf_meta):
+    # Any entry may name the ISBN: /Isbn-13 as written by write_to_pdf, /ISBN, /Subject, /Keywords, ...
+    if not pdf_meta:
+        return []
+    return find_isbns(" ".join(str(pdf_meta[key]) for key in pdf_meta if isinstance(pdf_meta[key], str)))
+
+def xmp_isbns(reader):
+    # The raw XMP packet is searched, dc:identifier, prism:isbn and urn:isbn: all count
+    metadata = reader.trailer["/Root"].get("/Metadata")
+    if metadata is None:
+        return []
+    try:
+        data = metadata.get_object().get_data()
+    except Exception:
+        return []
+    return find_isbns(data.decode("utf-8", "replace"))
+
+def extract_metadata_worker(pdf_file, isbn_pages=ISBN_PAGE_BUDGET):
+    # Runs in a worker process; a broken PDF only fails its own entry
+    pdf_file = dict(pdf_file)
+    try:
+        pdf_existing_metadata_extractor(pdf_file, isbn_pages)
+    except Exception as error:
+        pdf_file["error"] = f"{type(error).__name__}: {error}"
+    return pdf_file
+
+def extract_metadata_measured(pdf_file, isbn_pages=ISBN_PAGE_BUDGET):
+    # Worker process side of a measured run, the metrics travel back with the result
+    METRICS.reset()
+    METRICS.enabled = True
+    pdf_file = extract_metadata_worker(pdf_file, isbn_pages)
+    pdf_file["metrics"] = METRICS.snapshot()
+    return pdf_file
+
+def iter_extracted_metadata(pdf_files, jobs=1, isbn_pages=ISBN_PAGE_BUDGET):
+    """
+    Extracts the existing metadata of all PDFs, optionally on a process pool.
+
+    Results are yielded as soon as they are ready, in the order of pdf_files.
+    Files that could not be read come back with an "error" entry.
+    """
+    if jobs <= 1:
+        for pdf_file in pdf_files:
+            yield extract_metadata_worker(pdf_file, isbn_pages)
+        return
+
+    worker = extract_metadata_measured if METRICS.enabled else extract_metadata_worker
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for pdf_file in executor.map(partial(worker, isbn_pages=isbn_pages), pdf_files):
+            if "metrics" in pdf_file:
+                METRICS.merge(pdf_file.pop("metrics"))
+            yield pdf_file
+
+def isbn_page_order(number_of_pages, max_pages=ISBN_PAGE_BUDGET):
+    # The copyright page (usually page 2-4) first, then the rest of the front matter
+    likely = [i for i in (2, 3, 4, 1, 0) if i < number_of_pages]
+    rest = [i for i in range(min(max_pages, number_of_pages)) if i not in likely]
+    return (likely + rest)[:max_pages]
+
+def normalize_isbn(candidate):
+    return re.sub(r"[-– ]", "", candidate).upper()
+
+def is_valid_isbn(isbn):
+    """Checks the ISBN-10 or ISBN-13 checksum of a normalized ISBN."""
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == "X"):
+        total = sum((10 - i) * int(d) for i, d in enumerate(isbn[:9]))
+        total += 10 if isbn[9] == "X" else int(isbn[9])
+        return total % 11 == 0
+    if len(isbn) == 13 and isbn.isdigit() and isbn.startswith(("978", "979")):
+        total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(isbn))
+        return total % 10 == 0
+    return False
+
+def find_isbns(text):
+    """Returns the valid, normalized ISBNs in text, in order of appearance."""
+    isbns = []
+    for match in ISBN_PATTERN.finditer(text):
+        isbn = normalize_isbn(match.group())
+        if is_valid_isbn(isbn) and isbn not in isbns:
+            isbns.append(isbn)
+    return isbns
+
+def extract_isbns(reader, max_pages=ISBN_PAGE_BUDGET):
+    """
+    Extracts ISBNs from the text layer, page by page.
+
+    Pages are extracted lazily, most likely pages first, and extraction stops
+    at the first page with a valid ISBN-10/13.
+
+    Args:
+        reader (PdfReader): The opened PDF.
+        max_pages (int): Page budget, at most this many pages are extracted.
+
+    Returns:
+        list: Normalized ISBNs (digits only) found on that page.
+    """
+    for i in isbn_page_order(len(reader.pages), max_pages):
+        METRICS.count("pages_extracted")
+        isbns = find_isbns(reader.pages[i].extract_text() or "")
+        if isbns:
+            return isbns
+    return []
+
+def pdf_metadata_completion(pdf_file, lookup=None, resolver=None):
+    # Single file; batches go through resolver.resolve_batch directly
+    resolver = resolver or MetadataResolver(lookup=lookup or IsbnLookup())
+    with METRICS.stage("resolve"):
+        record = resolver.resolve_batch([pdf_file["isbn"]])[0]
+    apply_metadata_record(pdf_file, record)
+
+def apply_metadata_record(pdf_file, record):
+    if record is None:
+        return
+
+    pdf_file["title" ]= record["title"]
+    pdf_file["author"] = record["authors"]
+    pdf_file["subject"] = record["subject"]
+    pdf_file["categories"] = record["categories"]
+    pdf_file["isbn_10"] = record.get("isbn_10")
+    pdf_file["isbn_13"] = record.get("isbn_13")
+
+def split_isbns(pdf_file):
+    # The record's own ISBNs, else the first ISBN-10 and ISBN-13 found in the file
+    isbn_10 = pdf_file.get("isbn_10")
+    isbn_13 = pdf_file.get("isbn_13")
+    for isbn in pdf_file.get("isbn") or []:
+        if len(isbn) == 10 and isbn_10 is None:
+            isbn_10 = isbn
+        elif len(isbn) == 13 and isbn_13 is None:
+            isbn_13 = isbn
+    return isbn_10, isbn_13
+
+def info_entries(pdf_file):
+    """
+    Returns:
+        dict: The Info dictionary entries for a pdf_file dict, None for unknown values.
+    """
+    author = pdf_file.get("author")
+    if isinstance(author, list):
+        author = ", ".join(author)
+    categories = pdf_file.get("categories")
+    isbn_10, isbn_13 = split_isbns(pdf_file)
+    return {
+        "/Author": author or None,
+        "/Title": pdf_file.get("title"),
+        "/Subject": ", ".join(categories) if categories else pdf_file.get("subject"),
+        "/Isbn-10": isbn_10,
+        "/Isbn-13": isbn_13,
+    }
 
-    basic_infos_obj = fetch_basic_infos(pdf_file["isbn"])
-    # extended_infos_obj = open_library_search(pdf_file)
-    # print(basic_infos_obj)
+def write_to_pdf(pdf_file, atomic=True):
 
-    pdf_file["title" ]= basic_infos_obj["title"]
-    pdf_file["author"] = basic_infos_obj["authors"]
-    pdf_file["subject"] = basic_infos_obj["subject"]
-    pdf_file["categories"] = basic_infos_obj["categories"],
+     # ! This Function writes to file !
 
-def write_to_pdf(pdf_file):
+    # Appended as an incremental update, the pages are neither parsed nor written again
+    return update_info(pdf_file["filepath"], info_entries(pdf_file), atomic)
 
-     # ! This Function writes to file !
+def rewrite_pdf(pdf_file):
+    # Writes the whole file again, kept for comparison in benchmarks/bench_pdf_metadata_write.py
 
     reader = PdfReader(pdf_file["filepath"])
     writer = PdfWriter()
@@ -95,69 +296,137 @@ def write_to_pdf(pdf_file):
         writer.add_metadata(reader.metadata)
 
     writer.add_metadata(
-    {
-        "/Author": pdf_file["author"],
-        "/Title": pdf_file["title"],
-        "/Subject": pdf_file["categories"],
-        "/Isbn-10": pdf_file["ISBN_10"], # TODO: Split ISBN Object into 10 and 13
-        "/Isbn-13": pdf_file["ISBN_13"],
-
-    }
+        {key: value for key, value in info_entries(pdf_file).items() if value is not None}
     )
 
     # Save the new PDF to a file
     with open(pdf_file["filepath"], "wb") as f:
         writer.write(f)
 
-def fetch_basic_infos(isbn):
-    base_api_link = "https://www.googleapis.com/books/v1/volumes?q=isbn:"
-
-    with urllib.request.urlopen(base_api_link + isbn[1]) as f:
-        text = f.read()
-
-    decoded_text = text.decode("utf-8")
-    obj = json.loads(decoded_text) # deserializes decoded_text to a Python object
-    # print(obj["items"])
-    return obj["items"]
-
-def open_library_search(pdf_file):
-    # https://openlibrary.org/dev/docs/api/books
-
-    openlibrary_api_link = "https://openlibrary.org/search.json?q="
-
-    with urllib.request.urlopen(openlibrary_api_link + isbn[1]) as f:
-        text = f.read()
-
-    decoded_text = text.decode("utf-8")
-    obj = json.loads(decoded_text) # deserializes decoded_text to a Python object
-    # print(obj["items"])
-    return obj["docs"][0]
+def write_metadata_batch(pdf_files, atomic=True, workers=1, index=None):
+    # Files without anything to write are left alone; "metadata_written" is kept by the scan index
+    results = update_many([(file["filepath"], info_entries(file)) for file in pdf_files], atomic, workers)
+    written = 0
+    for file, (path, size, error) in zip(pdf_files, results):
+        if error is not None:
+            print("not written", path, error)
+            continue
+        file["metadata_written"] = True
+        if size:
+            written += 1
+            if index is not None:
+                index.refresh(path)
+    print(f"metadata written to {written} of {len(pdf_files)} files")
+    return results
+
+def classify_pdf(pdf_file, classifier, top_k=5, min_score=0.3, min_margin=0.1):
+    # Sets "class_code" for confident matches, otherwise only the "candidates" for a person
+    with METRICS.stage("classify"):
+        matches = classifier.classify(pdf_file, top_k)
+    pdf_file["candidates"] = [[match.code, round(match.score, 3)] for match in matches]
+    match = confident_match(classifier, matches, min_score, min_margin)
+    pdf_file["class_code"] = match.code if match else None
+    return match
 
 def create_markdown_file(pdf_file):
     # Write isbn and all additional infos in there
     pass
 
-def main(args):
+def build_resolver(args, lookup):
+    providers = {
+        "google_books": GoogleBooksProvider(args.google_books_url),
+        "open_library": OpenLibraryProvider(args.open_library_url),
+    }
+    slots = []
+    for name in args.providers.split(","):
+        if name not in providers:
+            raise SystemExit(f"Unknown provider '{name}', choose from {', '.join(providers)}")
+        slots.append(ProviderSlot(providers[name], args.provider_timeout, args.provider_concurrency))
+    return MetadataResolver(slots, lookup, args.resolve_strategy, args.hedge_delay)
 
-    if args.target_dir and args.dest_dir:
+def main(args):
 
-        target_filelist = target_to_filelist(args.target_dir)
-        # dest_dirlist = dest_to_dirlist(args.dest_dir)
+    cache = None
+    if not args.no_lookup_cache:
+        cache = LookupCache(args.lookup_cache, args.lookup_ttl * DAY, args.not_found_ttl * DAY)
+    lookup = IsbnLookup(cache, timeout=args.provider_timeout)
+    resolver = build_resolver(args, lookup)
+    index = None
+    if not args.no_scan_index:
+        index = ScanIndex(args.scan_index, args.scan_hash)
+    classifier = None
+    if args.classification:
+        with METRICS.stage("classifier_build"):
+            classifier = Classifier(load_classification(args.classification))
+    classify = partial(
+        classify_pdf, classifier=classifier, top_k=args.top_k, min_score=args.min_score, min_margin=args.min_margin
+    )
 
-        for file in target_filelist:
-            if file["filepath"].endswith(".pdf"):
-                print("processing file", file)
-                pdf_existing_metadata_extractor(file)
-                pdf_metadata_completion(file)
+    if args.target_dir and args.dest_dir and not args.target_file:
+
+        target_filelist = target_to_filelist(args.target_dir, index, args.full_scan)
+        dirs = open_dest_index(args) if classifier is not None else None
+        pdf_files = [file for file in target_filelist if file["filepath"].endswith(".pdf")]
+        # Files processed by an earlier run are not opened again
+        pdf_files = [file for file in pdf_files if not file.get("indexed")]
+
+        extracted = []
+        for file in iter_extracted_metadata(pdf_files, args.jobs, args.isbn_pages):
+            if "error" in file:
+                print("skipping file", file["filepath"], file["error"])
+                continue
+            print("processing file", file)
+            extracted.append(file)
+
+        # All lookups of the batch at once, each provider within its own limits
+        with METRICS.stage("resolve"):
+            records = resolver.resolve_batch([file["isbn"] for file in extracted])
+        review = 0
+        for file, record in zip(extracted, records):
+            apply_metadata_record(file, record)
+            if classifier is not None:
+                if classify(file):
+                    print("class", file["class_code"], file["filepath"], "->", dirs.find(file["class_code"]))
+                else:
+                    review += 1
+                    print("review", file["filepath"], file["candidates"])
+        if args.write_metadata and extracted:
+            write_metadata_batch(extracted, not args.write_in_place, args.jobs, index)
+        if index is not None:
+            for file in extracted:
+                index.record(file)
+        if classifier is not None:
+            print(f"{len(extracted) - review} files classified, {review} need review")
     
     elif args.target_file:
-        pdf_existing_metadata_extractor(args.target_file)
-        pdf_metadata_completion(args.target_file)
-
-
-
-if __name__ == "__main__":
-    """ This is executed when run from the command line """
+        file = {
+            "filepath": args.target_file,
+            "filename": clean_filename(os.path.basename(args.target_file)),
+        }
+        pdf_existing_metadata_extractor(file, args.isbn_pages)
+        pdf_metadata_completion(file, resolver=resolver)
+        if args.write_metadata:
+            write_to_pdf(file, not args.write_in_place)
+        if classifier is not None:
+            # Read by process_pdfs.sh
+            match = classify(file)
+            print("class:", match.code if match else "")
+            print("candidates:", " ".join(code for code, _ in file["candidates"]))
+            if match and args.dest_dir:
+                print("destination:", open_dest_index(args).find(match.code) or "")
+
+    print(resolver.stats())
+    if cache is not None:
+        print(cache.stats())
+    if index is not None:
+        print(index.stats())
+        index.close()
+    resolver.close()
+
+
+
+def build_parser():
+    # Shared with ingest_pdfs.py, which adds its own options
     parser = argparse.ArgumentParser()
 
 
@@ -190,6 +459,144 @@ if __name__ == "__main__":
         "-f",
         "--target_file",
         help="Target File to process.", action="store", dest="target_file")
-     
-    args = parser.parse_args()
-    main(args)
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes extracting PDF metadata in parallel.", action="store", dest="jobs")
+
+    parser.add_argument(
+        "--isbn-pages",
+        type=int,
+        default=ISBN_PAGE_BUDGET,
+        help="Maximum number of pages searched for an ISBN.", action="store", dest="isbn_pages")
+
+    parser.add_argument(
+        "--lookup-cache",
+        default=DEFAULT_CACHE_PATH,
+        help="SQLite file caching ISBN lookups.", action="store", dest="lookup_cache")
+
+    parser.add_argument(
+        "--no-lookup-cache",
+        help="Query the ISBN providers without caching.", action="store_true", dest="no_lookup_cache")
+
+    parser.add_argument(
+        "--lookup-ttl",
+        type=float,
+        default=90,
+        help="Days a cached ISBN record stays valid.", action="store", dest="lookup_ttl")
+
+    parser.add_argument(
+        "--not-found-ttl",
+        type=float,
+        default=7,
+        help="Days a cached 'not found' answer stays valid.", action="store", dest="not_found_ttl")
+
+    parser.add_argument(
+        "--providers",
+        default="google_books,open_library",
+        help="Comma separated metadata providers, in order of preference.", action="store", dest="providers")
+
+    parser.add_argument(
+        "--google-books-url",
+        default=GOOGLE_BOOKS.base_url,
+        help="Google Books volumes endpoint, e.g. a local stub.", action="store", dest="google_books_url")
+
+    parser.add_argument(
+        "--open-library-url",
+        default=OPEN_LIBRARY.base_url,
+        help="Open Library search endpoint, e.g. a local stub.", action="store", dest="open_library_url")
+
+    parser.add_argument(
+        "--provider-timeout",
+        type=float,
+        default=10,
+        help="Seconds to wait for one provider answer.", action="store", dest="provider_timeout")
+
+    parser.add_argument(
+        "--provider-concurrency",
+        type=int,
+        default=4,
+        help="Maximum requests in flight per provider.", action="store", dest="provider_concurrency")
+
+    parser.add_argument(
+        "--resolve-strategy",
+        choices=STRATEGIES,
+        default="first",
+        help="Use the first provider answer or merge all answers.", action="store", dest="resolve_strategy")
+
+    parser.add_argument(
+        "--hedge-delay",
+        type=float,
+        default=None,
+        help="Seconds before the next provider is asked too (default: ask all at once).", action="store", dest="hedge_delay")
+
+    parser.add_argument(
+        "-c",
+        "--classification",
+        help="Outline (.txt) or YAML/JSON scheme to classify the PDFs with.", action="store", dest="classification")
+
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=5,
+        help="Number of candidate classes reported per file.", action="store", dest="top_k")
+
+    parser.add_argument(
+        "--min-score",
+        type=float,
+        default=0.3,
+        help="Lowest score a class is filed automatically with.", action="store", dest="min_score")
+
+    parser.add_argument(
+        "--min-margin",
+        type=float,
+        default=0.1,
+        help="Lead the best class needs over unrelated candidates.", action="store", dest="min_margin")
+
+    parser.add_argument(
+        "--dest-index",
+        default=DEFAULT_DEST_INDEX_PATH,
+        help="SQLite file indexing the destination directories by class code.", action="store", dest="dest_index")
+
+    parser.add_argument(
+        "--no-dest-index",
+        help="Walk the destination tree without keeping an index between runs.", action="store_true", dest="no_dest_index")
+
+    parser.add_argument(
+        "--scan-index",
+        default=DEFAULT_INDEX_PATH,
+        help="SQLite file indexing already processed PDFs.", action="store", dest="scan_index")
+
+    parser.add_argument(
+        "--no-scan-index",
+        help="Process every PDF, without reading or updating the scan index.", action="store_true", dest="no_scan_index")
+
+    parser.add_argument(
+        "--full-scan",
+        help="List every directory and stat every file, even where the index says nothing changed.", action="store_true", dest="full_scan")
+
+    parser.add_argument(
+        "--scan-hash",
+        help="Hash new and changed files, so touched or moved files keep their metadata.", action="store_true", dest="scan_hash")
+
+    parser.add_argument(
+        "--write-metadata",
+        help="Write title, author, subject and ISBNs into the PDFs, appended as an incremental update.", action="store_true", dest="write_metadata")
+
+    parser.add_argument(
+        "--write-in-place",
+        help="Append the metadata update to the PDF itself instead of writing a copy and renaming it.", action="store_true", dest="write_in_place")
+
+    metrics.add_arguments(parser)
+
+    return parser
+
+
+if __name__ == "__main__":
+    """ This is executed when run from the command line """
+    args = build_parser().parse_args()
+    with metrics.measured(args):
+        main(args)
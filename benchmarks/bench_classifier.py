@@ -0,0 +1,75 @@
+"""
+Benchmark of the TF-IDF classifier.
+
+Builds a synthetic classification with a fixed seed, then times building the
+inverted index and ranking generated document metadata against it.
+
+e.g. `python3 benchmarks/bench_classifier.py --nodes 100000 --documents 20000`
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification_tree import ClassificationTree  # noqa: E402
+from classifier import Classifier, confident_match  # noqa: E402
+
+
+def random_word(rng):
+    return "".join(rng.choice("abcdefghiklmnoprstuvw") for _ in range(rng.randrange(4, 10)))
+
+
+def build_tree(nodes, vocabulary, depth=5, seed=0):
+    rng = random.Random(seed)
+    tree = ClassificationTree()
+    levels = [[0]]
+    for i in range(nodes):
+        level = rng.randrange(min(len(levels), depth))
+        parent = rng.choice(levels[level][-50:])
+        name = " ".join(rng.choice(vocabulary) for _ in range(rng.randrange(1, 5)))
+        node = tree.add(f"C{i}", name, parent)
+        if level + 1 == len(levels):
+            levels.append([])
+        levels[level + 1].append(node)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classifier benchmark")
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    vocabulary = sorted({random_word(rng) for _ in range(args.vocabulary)})
+    tree = build_tree(args.nodes, vocabulary)
+
+    start = time.perf_counter()
+    classifier = Classifier(tree)
+    print(f"index of {args.nodes} nodes built in {time.perf_counter() - start:.3f}s")
+
+    documents = [
+        {
+            "title": " ".join(rng.choice(vocabulary) for _ in range(rng.randrange(2, 8))),
+            "categories": [rng.choice(vocabulary)],
+        }
+        for _ in range(args.documents)
+    ]
+    start = time.perf_counter()
+    confident = sum(
+        1 for document in documents if confident_match(classifier, classifier.classify(document))
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.documents} documents ranked in {elapsed:.3f}s, "
+        f"{args.documents / elapsed:.0f} documents/s, {confident} confident"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark of the two-phase rename planner of clean_filenames.
+
+Creates empty PDFs with dirty names (some of them colliding after cleaning),
+then times the plan pass, applying the plan with a growing number of worker
+threads (with an optional per-rename latency to mimic a network share) and a
+rollback.
+
+e.g. `python3 benchmarks/bench_clean_filenames.py --files 100000 --workers 1 8`
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clean_filenames  # noqa: E402
+from clean_filenames import apply_renames, plan_renames, target_to_filelist  # noqa: E402
+from move_journal import MoveJournal  # noqa: E402
+
+
+def build_library(directory, files, per_dir=500, collisions=0.01, seed=0):
+    rng = random.Random(seed)
+    for i in range(files):
+        subdir = os.path.join(directory, f"d{i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.mkdir(subdir)
+        name = f"Author_{rng.randrange(10**6)}_-_Title_{i}_(auth.).pdf"
+        open(os.path.join(subdir, name), "w").close()
+        if rng.random() < collisions:
+            # Cleans to the same name as the file above
+            open(os.path.join(subdir, name.replace("_", " ", 1)), "w").close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="clean_filenames benchmark")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every rename")
+    args = parser.parse_args()
+
+    if args.latency:
+        rename = os.rename
+
+        def slow_rename(src, dst):
+            time.sleep(args.latency)
+            rename(src, dst)
+
+        clean_filenames.os.rename = slow_rename
+
+    directory = tempfile.mkdtemp(prefix="bench-clean-")
+    try:
+        library = os.path.join(directory, "library")
+        os.mkdir(library)
+        build_library(library, args.files)
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            files = target_to_filelist(library)
+            renames, collisions, unchanged = plan_renames(files)
+            planned = time.perf_counter() - start
+
+            journal = MoveJournal(os.path.join(directory, f"journal-{workers}.jsonl"))
+            start = time.perf_counter()
+            done, failed = apply_renames(renames, journal, workers=workers)
+            applied = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rolled_back = journal.rollback()
+            rollback = time.perf_counter() - start
+            journal.close()
+
+            if failed or len(rolled_back) != len(done):
+                sys.exit(f"{len(failed)} renames failed, {len(rolled_back)} of {len(done)} rolled back")
+            print(
+                f"workers={workers:2d}  plan {len(files)} files {planned:7.3f}s "
+                f"({len(files) / planned:8.0f}/s, {len(collisions)} collisions)  "
+                f"apply {len(done)} {applied:7.3f}s ({len(done) / applied:8.0f}/s)  "
+                f"rollback {rollback:7.3f}s"
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the destination index against walking the tree.
+
+Creates a classification-like folder tree ("C123 - Name" folders), then times
+`find -type d`-style os.walk, the first index build, a refresh of the
+unchanged tree, a refresh after adding folders, and code and prefix lookups.
+
+e.g. `python3 benchmarks/bench_dest_index.py --dirs 100000`
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dest_index import DestinationIndex  # noqa: E402
+
+
+def build_tree(base_dir, dirs, fanout, seed=0):
+    rng = random.Random(seed)
+    paths = [base_dir]
+    codes = []
+    for i in range(dirs):
+        parent = paths[min(len(paths) - 1, i // fanout)] if i >= fanout else base_dir
+        code = f"C{i}"
+        path = os.path.join(parent, f"{code} - Class {rng.randrange(10**6)}")
+        os.mkdir(path)
+        paths.append(path)
+        codes.append(code)
+    return paths, codes
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:32s} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Destination index benchmark")
+    parser.add_argument("--dirs", type=int, default=20000)
+    parser.add_argument("--fanout", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-dest-")
+    try:
+        base_dir = os.path.join(directory, "library")
+        os.mkdir(base_dir)
+        paths, codes = build_tree(base_dir, args.dirs, args.fanout)
+        index_path = os.path.join(directory, "dest_index.sqlite")
+
+        timed("os.walk", lambda: sum(len(d) for _, d, _ in os.walk(base_dir)))
+        index = timed("first build", lambda: DestinationIndex(base_dir, index_path).refresh())
+        index.close()
+
+        # Old mtimes, as in a library that was not touched for a while
+        for path in paths:
+            os.utime(path, ns=(0, 0))
+        DestinationIndex(base_dir, index_path).refresh().close()
+        index = timed("refresh, nothing changed", lambda: DestinationIndex(base_dir, index_path).refresh())
+        print(index.stats())
+
+        for i in range(10):
+            os.mkdir(os.path.join(paths[i * 97 % len(paths)], f"N{i} - New class"))
+        index = timed("refresh, 10 folders added", lambda: index.refresh())
+        print(index.stats())
+        if index.find("N9") is None or len(index) != args.dirs + 10:
+            sys.exit("Added folders are missing from the index")
+
+        rng = random.Random(1)
+        sample = [rng.choice(codes) for _ in range(args.lookups)]
+        timed(f"{args.lookups} code lookups", lambda: [index.find(code) for code in sample])
+        timed(f"{args.lookups} longest prefix lookups", lambda: [index.longest_prefix(code + ".9") for code in sample])
+        timed("1000 prefix lookups", lambda: [index.with_prefix(code[:3]) for code in sample[:1000]])
+        index.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
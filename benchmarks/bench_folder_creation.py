@@ -0,0 +1,65 @@
+"""
+Benchmark of parallel directory creation on a simulated high-latency filesystem.
+
+Every mkdir goes through a shim that sleeps --latency seconds before calling
+os.mkdir, like a round trip to an SMB/NFS/FUSE server would.
+
+e.g. `python3 benchmarks/bench_folder_creation.py --latency 0.002 --jobs 1 4 8 21`
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_plan import FolderPlan  # noqa: E402
+
+
+def synthetic_paths(top_level, children, grandchildren):
+    for i in range(top_level):
+        top = f"C{i} - Class {i}"
+        yield top
+        for j in range(children):
+            child = os.path.join(top, f"C{i}S{j} - Subclass {j}")
+            yield child
+            for k in range(grandchildren):
+                yield os.path.join(child, f"C{i}S{j}.{k} - Topic {k}")
+
+
+def latency_mkdir(latency):
+    def mkdir(path):
+        time.sleep(latency)
+        os.mkdir(path)
+
+    return mkdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Folder creation benchmark")
+    parser.add_argument("--top-level", type=int, default=21)
+    parser.add_argument("--children", type=int, default=10)
+    parser.add_argument("--grandchildren", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, 21])
+    args = parser.parse_args()
+
+    paths = list(synthetic_paths(args.top_level, args.children, args.grandchildren))
+
+    for jobs in args.jobs:
+        base_dir = tempfile.mkdtemp(prefix="bench-folders-")
+        try:
+            plan = FolderPlan(base_dir, paths)
+            start = time.perf_counter()
+            created = plan.apply(jobs=jobs, mkdir=latency_mkdir(args.latency))
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(base_dir)
+        print(f"jobs={jobs:3d}  directories={created:6d}  {elapsed:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the multi-provider metadata resolver against a local stub.
+
+The stub answers Google Books slowly and Open Library quickly. A batch of
+ISBNs is resolved sequentially through Google Books only (the old behaviour)
+and then with MetadataResolver for every strategy, so the batch time should
+follow the fastest provider instead of the slowest one.
+
+e.g. `python3 benchmarks/bench_metadata_resolver.py --files 100 --google-latency 0.2`
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from isbn_lookup import GoogleBooksProvider, IsbnLookup, OpenLibraryProvider  # noqa: E402
+from metadata_resolver import MetadataResolver, ProviderSlot  # noqa: E402
+from pdf_corpus import random_isbn13  # noqa: E402
+from stub_isbn_server import StubServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata resolver benchmark")
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--google-latency", type=float, default=0.2)
+    parser.add_argument("--open-library-latency", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hedge-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    isbns = [random_isbn13(rng) for _ in range(args.files)]
+    catalog = {
+        isbn: {"title": f"Book {i}", "authors": ["Author"], "categories": ["Science"]}
+        for i, isbn in enumerate(isbns)
+    }
+    server = StubServer(
+        catalog,
+        latency={
+            "/books/v1/volumes": args.google_latency,
+            "/search.json": args.open_library_latency,
+        },
+    ).start()
+    google_books = GoogleBooksProvider(server.base_url + "/books/v1/volumes")
+    open_library = OpenLibraryProvider(server.base_url + "/search.json")
+
+    try:
+        lookup = IsbnLookup()
+        start = time.perf_counter()
+        found = sum(1 for isbn in isbns if lookup.lookup(google_books, isbn) is not None)
+        elapsed = time.perf_counter() - start
+        lookup.close()
+        print(f"{'sequential google':22s} found={found}  {elapsed:8.3f}s")
+
+        for label, strategy, hedge_delay in (
+            ("first, all at once", "first", None),
+            ("first, hedged", "first", args.hedge_delay),
+            ("merge", "merge", None),
+        ):
+            slots = [
+                ProviderSlot(google_books, args.timeout, args.concurrency),
+                ProviderSlot(open_library, args.timeout, args.concurrency),
+            ]
+            lookup = IsbnLookup()
+            resolver = MetadataResolver(slots, lookup, strategy, hedge_delay)
+            start = time.perf_counter()
+            records = resolver.resolve_batch([[isbn] for isbn in isbns])
+            elapsed = time.perf_counter() - start
+            resolver.close()
+
+            found = sum(1 for record in records if record is not None)
+            if found != len(isbns):
+                sys.exit(f"{label}: only {found} of {len(isbns)} ISBNs resolved")
+            print(f"{label:22s} found={found}  {elapsed:8.3f}s  {resolver.stats()}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark of the streaming outline parser against the previous two-pass
+trim_classification_text/parse_classification_outline implementation.
+
+A synthetic page with the LCC start and end markers is generated, the number
+of outline lines is given with --lines.
+
+e.g. `python3 benchmarks/bench_outline_parser.py --lines 100000 500000`
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outline_parser import END_MARKER, START_MARKER, parse_outline  # noqa: E402
+from synthetic import outline_page  # noqa: E402
+
+
+def legacy_trim_classification_text(text):
+    start_index = text.find(START_MARKER)
+    end_index = text.find(END_MARKER)
+    if start_index == -1 or end_index == -1:
+        return None
+    return text[start_index : end_index + len(END_MARKER)]
+
+
+def legacy_parse_classification_outline(text):
+    classification_dict = defaultdict(dict)
+    current_class = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("Class "):
+            if " – " in line:
+                class_code, class_desc = line.split(" – ", 1)
+                current_class = class_code.replace("Class", "")
+                classification_dict[current_class] = {
+                    "description": class_desc,
+                    "subclasses": {},
+                }
+        elif line.startswith("Subclass ") or line.startswith("Subclasses "):
+            if " – " in line:
+                subclass_code, subclass_desc = line.split(" – ", 1)
+                current_subclass = subclass_code.replace("Subclasses ", "").replace(
+                    "Subclass ", ""
+                )
+                classification_dict[current_class]["subclasses"][
+                    current_subclass
+                ] = subclass_desc
+    return classification_dict
+
+
+def measure(function, *args, repeat=3):
+    # Time without tracemalloc, its allocation hooks would distort the timings
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outline parser benchmark")
+    parser.add_argument("--lines", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        page = outline_page(lines)
+        path = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"outline-{lines}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(page)
+
+        legacy, legacy_time, legacy_peak = measure(
+            lambda text: legacy_parse_classification_outline(
+                legacy_trim_classification_text(text)
+            ),
+            page,
+        )
+        streamed, stream_time, stream_peak = measure(
+            lambda text: parse_outline(io.StringIO(text)), page
+        )
+
+        def parse_file(file_path):
+            with open(file_path, "r", encoding="utf-8") as file:
+                return parse_outline(file)
+
+        from_file, file_time, file_peak = measure(parse_file, path)
+        os.remove(path)
+
+        if legacy != streamed or legacy != from_file:
+            sys.exit(f"Streaming parser result differs for {lines} lines")
+
+        print(f"lines={lines}")
+        print(f"  legacy  {legacy_time:8.3f}s  peak {legacy_peak / 2**20:8.1f} MiB")
+        print(f"  stream  {stream_time:8.3f}s  peak {stream_peak / 2**20:8.1f} MiB")
+        print(f"  file    {file_time:8.3f}s  peak {file_peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
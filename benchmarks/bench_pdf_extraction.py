@@ -0,0 +1,84 @@
+"""
+Benchmark of PDF metadata extraction with a growing number of processes.
+
+A corpus of generated PDFs (plus a few broken files) is extracted with
+iter_extracted_metadata for every --jobs value. The results must come back
+in the same order with the broken files failing on their own. Shares of the
+ISBNs can be put into the file names and Info dictionaries; the number of
+files identified by each stage of the cascade is printed with the timings.
+
+e.g. `python3 benchmarks/bench_pdf_extraction.py --files 200 --jobs 1 2 4 8`
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automatic_pdf_sorter import iter_extracted_metadata  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from pdf_corpus import generate_corpus  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction benchmark")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--broken", type=int, default=3)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--isbn-in-name", type=float, default=0.0, help="Share of ISBNs also in the file name")
+    parser.add_argument("--isbn-in-info", type=float, default=0.0, help="Share of the other ISBNs also in /Keywords")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-pdf-")
+    try:
+        corpus = generate_corpus(
+            directory,
+            args.files,
+            args.pages,
+            broken=args.broken,
+            isbn_in_name=args.isbn_in_name,
+            isbn_in_info=args.isbn_in_info,
+        )
+        pdf_files = [{"filepath": path, "filename": os.path.basename(path)} for path in corpus]
+        expected = None
+
+        METRICS.enabled = True
+        for jobs in args.jobs:
+            METRICS.reset()
+            start = time.perf_counter()
+            results = list(iter_extracted_metadata(pdf_files, jobs))
+            elapsed = time.perf_counter() - start
+            counters = METRICS.snapshot()["counters"]
+            errors = sum(1 for result in results if "error" in result)
+
+            if [result["filepath"] for result in results] != list(corpus):
+                sys.exit(f"Results with {jobs} jobs are out of order")
+            if expected is None:
+                expected = results
+            elif results != expected:
+                sys.exit(f"Results with {jobs} jobs differ from the first run")
+
+            print(
+                f"jobs={jobs:3d}  files={len(results)}  errors={errors}  "
+                f"{elapsed:8.3f}s  {len(results) / elapsed:8.1f} files/s  "
+                f"pages extracted={counters.get('pages_extracted', 0)}"
+            )
+            print(
+                "  identified by "
+                + ", ".join(
+                    f"{source}={counters.get('identified_by_' + source, 0)}"
+                    for source in ("filename", "info", "xmp", "text")
+                )
+                + f", unidentified={counters.get('unidentified', 0)}"
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
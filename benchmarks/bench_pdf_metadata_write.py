@@ -0,0 +1,89 @@
+"""
+Benchmark of writing metadata back into PDFs.
+
+Every file of a generated corpus (one image per page to get the size of a
+scanned book) gets a new title, author, subject and ISBNs three times: by
+rewriting the whole file with PdfWriter, by the incremental update through a
+temporary copy (write_to_pdf) and by appending the update in place. Reported
+are the time, the bytes written to disk and the peak Python heap per method.
+
+e.g. `python3 benchmarks/bench_pdf_metadata_write.py --files 20 --image-kb 2000`
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automatic_pdf_sorter import rewrite_pdf, write_to_pdf  # noqa: E402
+from pdf_corpus import generate_corpus  # noqa: E402
+from pypdf import PdfReader  # noqa: E402
+
+
+def metadata(path, i):
+    return {
+        "filepath": path,
+        "title": f"Updated title {i}",
+        "author": ["First Author", "Second Author"],
+        "categories": ["Mathematics", "Algebra"],
+        "isbn": ["9780306406157", "0306406152"],
+    }
+
+
+def run(label, corpus, write, written):
+    files = [metadata(path, i) for i, path in enumerate(corpus)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    total = 0
+    for file in files:
+        total += written(file, write(file))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    for file in files:
+        info = PdfReader(file["filepath"], strict=True).metadata
+        if info.title != file["title"] or info.get("/Isbn-13") != "9780306406157":
+            sys.exit(f"{label}: {file['filepath']} has not the new metadata")
+    print(
+        f"{label:14s} {elapsed:8.3f}s  {elapsed / len(files) * 1000:8.2f}ms/file  "
+        f"written {total / len(files) / 1024:10.1f}KB/file  peak heap {peak / 2**20:8.2f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF metadata write benchmark")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--image-kb", type=int, default=500, help="Size of the image on every page")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-pdf-write-")
+    try:
+        source = os.path.join(directory, "source")
+        corpus = list(generate_corpus(source, args.files, args.pages, image_bytes=args.image_kb * 1024))
+        size = sum(os.path.getsize(path) for path in corpus)
+        print(f"{args.files} files, {size / 2**20:.1f}MB")
+
+        methods = [
+            ("rewrite", rewrite_pdf, lambda file, _: os.path.getsize(file["filepath"])),
+            # The temporary copy is written as well
+            ("incremental", write_to_pdf, lambda file, update: os.path.getsize(file["filepath"])),
+            ("in place", lambda file: write_to_pdf(file, atomic=False), lambda file, update: update),
+        ]
+        for label, write, written in methods:
+            target = os.path.join(directory, label.replace(" ", "-"))
+            shutil.copytree(source, target)
+            run(label, [os.path.join(target, os.path.basename(path)) for path in corpus], write, written)
+            shutil.rmtree(target)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
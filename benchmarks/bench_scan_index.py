@@ -0,0 +1,93 @@
+"""
+Benchmark of the incremental scan index against a plain os.walk.
+
+Builds a library of small files in nested directories, then times a plain
+os.walk + stat, the first indexed scan, a re-scan right after it, a re-scan
+with pruning once the directory mtimes are old, and a re-scan after adding a
+few files.
+
+e.g. `python3 benchmarks/bench_scan_index.py --files 50000`
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_index import ScanIndex  # noqa: E402
+
+
+def build_library(directory, files, per_dir, seed=0):
+    rng = random.Random(seed)
+    dirs = [directory]
+    for i in range(files):
+        if i % per_dir == 0:
+            parent = rng.choice(dirs)
+            path = os.path.join(parent, f"d{len(dirs):05d}")
+            os.mkdir(path)
+            dirs.append(path)
+        with open(os.path.join(dirs[-1], f"book_{i:06d}.pdf"), "wb") as f:
+            f.write(b"%PDF" * rng.randrange(1, 8))
+    return dirs
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:28s} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan index benchmark")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--per-dir", type=int, default=50)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-scan-")
+    try:
+        library = os.path.join(directory, "library")
+        os.mkdir(library)
+        dirs = build_library(library, args.files, args.per_dir)
+        index = ScanIndex(os.path.join(directory, "index.sqlite"))
+
+        def walk():
+            return [
+                os.stat(os.path.join(root, name))
+                for root, _, names in os.walk(library)
+                for name in names
+            ]
+
+        timed("os.walk + stat", walk)
+        files = timed("first scan", lambda: index.scan(library))
+        for file in files:
+            index.record(dict(file, isbn=[]))
+        index.commit()
+        timed("re-scan (recent mtimes)", lambda: index.scan(library))
+
+        for path in dirs:
+            os.utime(path, (0, 0))
+        index.scan(library)
+        timed("re-scan (pruned)", lambda: index.scan(library))
+        print(index.stats())
+
+        for i in range(10):
+            with open(os.path.join(dirs[i * 7 % len(dirs)], f"new_{i}.pdf"), "wb") as f:
+                f.write(b"%PDF")
+        files = timed("re-scan (10 new files)", lambda: index.scan(library))
+        print(index.stats())
+        new = sum(1 for file in files if not file["indexed"])
+        if new != 10:
+            sys.exit(f"Expected 10 new files, got {new}")
+        index.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
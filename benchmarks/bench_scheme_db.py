@@ -0,0 +1,84 @@
+"""
+Benchmark of the SQLite scheme database.
+
+Writes a synthetic scheme of --nodes classes with save_tree, loads it back and
+times code, path, ancestor, descendant and prefix queries, next to the same
+questions answered by loading the YAML file and walking the tree.
+
+e.g. `python3 benchmarks/bench_scheme_db.py --nodes 1000000`
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification_tree import ClassificationTree  # noqa: E402
+from scheme_db import SchemeDatabase, save_tree  # noqa: E402
+from synthetic import scheme_tree, write_scheme  # noqa: E402
+from yaml_io import load_file  # noqa: E402
+
+
+def timed(label, function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    elapsed = (time.perf_counter() - start) / repeat
+    if repeat > 1:
+        print(f"{label:36s} {elapsed * 1e6:10.1f}us")
+    else:
+        print(f"{label:36s} {elapsed:10.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheme database benchmark")
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--yaml", action="store_true", help="Also time the YAML file for comparison")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-scheme-db-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    try:
+        tree = scheme_tree(args.nodes, args.depth)
+        db_path = os.path.join(directory, "scheme.sqlite")
+        timed(f"save_tree {args.nodes} nodes", lambda: save_tree(tree, db_path))
+        print(f"{'database size':36s} {os.path.getsize(db_path) / 2**20:10.1f}MB")
+
+        database = SchemeDatabase(db_path)
+        loaded = timed("load whole tree", database.load)
+        if loaded.codes[1:] != [tree.codes[node] for node, _ in tree.walk()]:
+            sys.exit("Loaded tree differs from the saved one")
+
+        rng = random.Random(1)
+        codes = [rng.choice(tree.codes[1:]) for _ in range(args.queries)]
+        top_level = tree.codes[next(tree.children())]
+        queries = iter(codes * 10)
+        timed("find", lambda: database.find(next(queries)), args.queries)
+        timed("code_path", lambda: database.code_path(next(queries)), args.queries)
+        timed("ancestors", lambda: database.ancestors(next(queries)), args.queries)
+        timed("descendants of a random class", lambda: database.descendants(next(queries)), args.queries)
+        timed("children of a random class", lambda: database.descendants(next(queries), 1), args.queries)
+        timed("prefix of a random class", lambda: database.with_prefix(next(queries)[:4]), args.queries)
+        timed(f"descendants of top-level {top_level}", lambda: database.descendants(top_level), 10)
+        timed(f"load subtree of {top_level}", lambda: database.load(top_level))
+        database.close()
+
+        if args.yaml:
+            yaml_path = write_scheme(tree, os.path.join(directory, "scheme.yaml"))
+            timed(
+                "YAML load and code_path",
+                lambda: ClassificationTree.from_dict(load_file(yaml_path, use_cache=False)).code_path(codes[0]),
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
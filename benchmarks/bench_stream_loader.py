@@ -0,0 +1,86 @@
+"""
+Benchmark of the streaming scheme loader against loading the whole document.
+
+Measures the time until the first folder path is known and the peak memory
+of walking all paths, for a generated JSON or YAML scheme.
+
+e.g. `python3 benchmarks/bench_stream_loader.py --nodes 200000 --format json`
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification_tree import ClassificationTree  # noqa: E402
+from stream_loader import iter_scheme_paths  # noqa: E402
+from synthetic import scheme_tree  # noqa: E402
+from yaml_io import dump_yaml, parse_file  # noqa: E402
+
+
+def folder_name(code, name):
+    return f"{code} {name}".strip()
+
+
+def full_load(file_path):
+    tree = ClassificationTree.from_dict(parse_file(file_path))
+    return tree.iter_folder_paths(folder_name)
+
+
+def streamed(file_path):
+    return iter_scheme_paths(file_path, folder_name, os.sep)
+
+
+def measure(paths_factory, file_path):
+    start = time.perf_counter()
+    paths = paths_factory(file_path)
+    next(paths)
+    first = time.perf_counter() - start
+    count = 1 + sum(1 for _ in paths)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in paths_factory(file_path):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, first, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming loader benchmark")
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--format", choices=["json", "yaml"], default="json")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-stream-")
+    file_path = os.path.join(directory, f"scheme.{args.format}")
+    try:
+        data = scheme_tree(args.nodes, args.depth).to_yaml_dict()
+        with open(file_path, "w", encoding="utf-8") as file:
+            if args.format == "json":
+                json.dump(data, file)
+            else:
+                dump_yaml(data, file)
+        del data
+        print(f"{args.format} size={os.path.getsize(file_path) / 2**20:.1f} MiB")
+
+        for label, factory in (("full load", full_load), ("streamed ", streamed)):
+            count, first, total, peak = measure(factory, file_path)
+            print(
+                f"  {label}  paths={count}  first={first * 1000:9.1f}ms  "
+                f"total={total:7.2f}s  peak={peak / 2**20:7.1f} MiB"
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
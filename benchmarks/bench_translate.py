@@ -0,0 +1,91 @@
+"""
+Benchmark of the translation engine against a local fake translator.
+
+Runs the same synthetic outline through BatchTranslator with an increasing
+number of workers. Every backend call sleeps for --latency seconds to mimic
+a slow network link. With --langs the outline is also translated into all of
+them, one language after the other and with translate_many at once.
+
+e.g. `python3 benchmarks/bench_translate.py --latency 0.05 --workers 1 4 16 --langs en de fr`
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification_tree import ClassificationTree  # noqa: E402
+from translator import BatchTranslator, FakeBackend  # noqa: E402
+
+
+def synthetic_outline(classes, subclasses, seed=0):
+    rng = random.Random(seed)
+    words = ["history", "science", "law", "music", "medicine", "art", "general", "works"]
+    outline = {}
+    for i in range(classes):
+        code = f"C{i}"
+        outline[code] = {
+            "description": " ".join(rng.choices(words, k=4)),
+            "subclasses": {
+                f"{code}S{j}": " ".join(rng.choices(words, k=5)) + f" {i}.{j}"
+                for j in range(subclasses)
+            },
+        }
+    return outline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translation engine benchmark")
+    parser.add_argument("--classes", type=int, default=21)
+    parser.add_argument("--subclasses", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--payload-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--langs", nargs="+", default=[], help="Target languages of the multi-language run")
+    args = parser.parse_args()
+
+    outline = synthetic_outline(args.classes, args.subclasses)
+    expected = None
+
+    for workers in args.workers:
+        backend = FakeBackend(latency=args.latency)
+        translator = BatchTranslator(
+            backend, max_payload_size=args.payload_size, workers=workers
+        )
+        start = time.perf_counter()
+        result = translator.translate_tree(outline, "de")
+        elapsed = time.perf_counter() - start
+
+        if expected is None:
+            expected = result
+        elif result != expected:
+            sys.exit(f"Result with {workers} workers differs from the first run")
+
+        print(f"workers={workers:3d}  calls={backend.calls:4d}  {elapsed:8.3f}s")
+
+    if len(args.langs) > 1:
+        names = ClassificationTree.from_dict(outline).names[1:]
+        for workers in args.workers:
+            translator = BatchTranslator(
+                FakeBackend(latency=args.latency), max_payload_size=args.payload_size, workers=workers
+            )
+            start = time.perf_counter()
+            sequential = {lang: translator.translate_strings(names, lang) for lang in args.langs}
+            sequential_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            combined = translator.translate_many(names, args.langs)
+            combined_time = time.perf_counter() - start
+            if combined != sequential:
+                sys.exit(f"translate_many with {workers} workers differs from one language at a time")
+            print(
+                f"langs={','.join(args.langs)}  workers={workers:3d}  "
+                f"one by one {sequential_time:8.3f}s  at once {combined_time:8.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
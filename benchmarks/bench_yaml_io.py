@@ -0,0 +1,86 @@
+"""
+Benchmark of YAML loading: pure-Python loader, libyaml loader (cold) and the
+compiled cache (warm).
+
+A classification.yaml with --classes top-level classes, each extended with
+custom levels of --fanout children down to --depth, is generated first.
+
+e.g. `python3 benchmarks/bench_yaml_io.py --classes 21 --fanout 6 --depth 4`
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification_tree import ClassificationTree  # noqa: E402
+from yaml_io import SafeLoader, cache_path, dump_yaml, load_file  # noqa: E402
+
+
+def synthetic_tree(classes, fanout, depth):
+    tree = ClassificationTree()
+    level = [tree.add(f"C{i}", f"Class {i}") for i in range(classes)]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for j in range(fanout):
+                code = f"{tree.codes[parent]}.{j}"
+                next_level.append(tree.add(code, f"Custom topic {code}", parent))
+        level = next_level
+    return tree
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YAML loading benchmark")
+    parser.add_argument("--classes", type=int, default=21)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--depth", type=int, default=3)
+    args = parser.parse_args()
+
+    tree = synthetic_tree(args.classes, args.fanout, args.depth)
+    directory = tempfile.mkdtemp(prefix="bench-yaml-")
+    file_path = os.path.join(directory, "classification.yaml")
+    try:
+        def dump():
+            with open(file_path, "w") as file:
+                dump_yaml(tree.to_yaml_dict(), file)
+
+        _, dump_time = timed(dump)
+        print(f"nodes={len(tree)}  size={os.path.getsize(file_path) / 2**20:.1f} MiB")
+        print(f"  dump (libyaml={SafeLoader is not yaml.SafeLoader})  {dump_time:8.3f}s")
+
+        def pure_python():
+            with open(file_path, "r", encoding="utf8") as file:
+                return yaml.load(file, Loader=yaml.SafeLoader)
+
+        expected, pure_time = timed(pure_python)
+        print(f"  pure-python load    {pure_time:8.3f}s")
+
+        cold, cold_time = timed(load_file, file_path)
+        print(f"  cold (parse+cache)  {cold_time:8.3f}s")
+
+        warm, warm_time = timed(load_file, file_path)
+        print(f"  warm (cache)        {warm_time:8.3f}s")
+
+        if not os.path.exists(cache_path(file_path)):
+            sys.exit("No cache file was written")
+        if not expected == cold == warm:
+            sys.exit("Loaded documents differ")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Generator for synthetic PDF corpora used by the benchmarks.
+
+Writes small but valid PDFs with a text layer (Helvetica, one content stream
+per page), an Info dictionary and optionally an ISBN on the copyright page.
+Pages can carry an uncompressed grayscale image of random bytes to get the
+file sizes of scanned books. No third-party library is needed to create them.
+"""
+
+import os
+import random
+
+IMAGE_WIDTH = 1024
+
+WORDS = [
+    "classification", "library", "history", "science", "mathematics", "law",
+    "music", "medicine", "agriculture", "technology", "bibliography", "theory",
+]
+
+
+def isbn13_check_digit(digits):
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def random_isbn13(rng):
+    digits = "978" + "".join(str(rng.randrange(10)) for _ in range(9))
+    return digits + isbn13_check_digit(digits)
+
+
+def pdf_string(text):
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def write_pdf(path, pages, title="", author="", isbn_page=None, isbn=None, rng=None, image_bytes=0, keywords=None):
+    """
+    Writes a PDF with pages pages of random text.
+
+    Args:
+        path (str): Output file.
+        pages (int): Number of pages.
+        title (str): /Title of the Info dictionary.
+        author (str): /Author of the Info dictionary.
+        isbn_page (int): Page the "ISBN ..." line is printed on.
+        isbn (str): The ISBN to print.
+        rng (random.Random): Source of the random text.
+        image_bytes (int): Size of the image drawn on every page, 0 for none.
+        keywords (str): /Keywords of the Info dictionary.
+    """
+    rng = rng or random.Random(0)
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages_obj = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    image_height = -(-image_bytes // IMAGE_WIDTH)
+
+    page_ids = []
+    for number in range(pages):
+        lines = [" ".join(rng.choices(WORDS, k=8)) for _ in range(30)]
+        if number == isbn_page and isbn:
+            lines.insert(5, f"ISBN {isbn[:3]}-{isbn[3]}-{isbn[4:8]}-{isbn[8:12]}-{isbn[12:]}")
+        content = "BT /F1 10 Tf 50 780 Td 12 TL\n"
+        content += "\n".join(f"{pdf_string(line)} '" for line in lines)
+        content += "\nET"
+        resources = b"/Font << /F1 %d 0 R >>" % font
+        if image_bytes:
+            pixels = rng.randbytes(IMAGE_WIDTH * image_height)
+            image = add(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (IMAGE_WIDTH, image_height, len(pixels))
+                + pixels
+                + b"\nendstream"
+            )
+            resources += b" /XObject << /Im1 %d 0 R >>" % image
+            content += "\nq 512 0 0 384 50 50 cm /Im1 Do Q"
+        data = content.encode("latin-1")
+        stream = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        page_ids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+                b"/Resources << %s >> /Contents %d 0 R >>"
+                % (pages_obj, resources, stream)
+            )
+        )
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    kids = b" ".join(b"%d 0 R" % page for page in page_ids)
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    info = b"/Title %s /Author %s" % (pdf_string(title).encode("latin-1"), pdf_string(author).encode("latin-1"))
+    if keywords:
+        info += b" /Keywords %s" % pdf_string(keywords).encode("latin-1")
+    info = add(b"<< %s >>" % info)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        catalog,
+        info,
+        xref,
+    )
+    with open(path, "wb") as file:
+        file.write(out)
+
+
+def generate_corpus(
+    directory, files, pages=12, isbn_ratio=0.7, broken=0, seed=0, image_bytes=0, isbn_in_name=0.0, isbn_in_info=0.0
+):
+    """
+    Generates a corpus of PDFs below directory.
+
+    Args:
+        directory (str): Output directory, created if missing.
+        files (int): Number of PDFs.
+        pages (int): Pages per PDF.
+        isbn_ratio (float): Share of PDFs with an ISBN on page 2-4.
+        broken (int): Number of additional files that are not valid PDFs.
+        seed (int): Random seed.
+        image_bytes (int): Size of the image on every page, see write_pdf.
+        isbn_in_name (float): Share of the PDFs with an ISBN that also carry it in the file name.
+        isbn_in_info (float): Share of the others with an ISBN that carry it in /Keywords.
+
+    Returns:
+        dict: Mapping of file path to the ISBN printed in it (or None).
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    corpus = {}
+    for i in range(files):
+        name = f"book_{i:05d}"
+        isbn = random_isbn13(rng) if rng.random() < isbn_ratio else None
+        keywords = None
+        if isbn and (isbn_in_name or isbn_in_info):
+            share = rng.random()
+            if share < isbn_in_name:
+                name += f"_{isbn}"
+            elif share < isbn_in_name + (1 - isbn_in_name) * isbn_in_info:
+                keywords = f"ISBN {isbn}"
+        path = os.path.join(directory, name + ".pdf")
+        write_pdf(
+            path,
+            pages,
+            title=f"Book {i}",
+            author=f"Author {i % 97}",
+            isbn_page=rng.randint(2, min(4, pages - 1)),
+            isbn=isbn,
+            rng=rng,
+            image_bytes=image_bytes,
+            keywords=keywords,
+        )
+        corpus[path] = isbn
+    for i in range(broken):
+        path = os.path.join(directory, f"broken_{i:05d}.pdf")
+        with open(path, "wb") as file:
+            file.write(b"%PDF-1.4\nthis is not a pdf\n")
+        corpus[path] = None
+    return corpus
@@ -0,0 +1,143 @@
+"""
+Local stub of the Google Books and Open Library APIs.
+
+Answers /books/v1/volumes?q=isbn:... and /search.json?isbn=... from an
+in-memory catalog with an optional per-request latency, over HTTP/1.1
+keep-alive connections. Used by the benchmarks to run lookups offline.
+
+e.g. `python3 benchmarks/stub_isbn_server.py --port 8765` and point the
+providers at http://127.0.0.1:8765/books/v1/volumes and .../search.json
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        # Called once per connection, keep-alive requests share it
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        delay = server.latency.get(url.path, server.default_latency)
+        with server.lock:
+            server.requests[url.path] = server.requests.get(url.path, 0) + 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if delay:
+                time.sleep(delay)
+            self.answer(server, url, query)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def answer(self, server, url, query):
+
+        if url.path == "/books/v1/volumes":
+            isbn = query.get("q", [""])[0].replace("isbn:", "")
+            book = server.catalog.get(isbn)
+            body = {"totalItems": 0}
+            if book:
+                body = {
+                    "totalItems": 1,
+                    "items": [
+                        {
+                            "volumeInfo": {
+                                "title": book["title"],
+                                "authors": book["authors"],
+                                "categories": book["categories"],
+                                "industryIdentifiers": [
+                                    {"type": "ISBN_13", "identifier": isbn}
+                                ],
+                            }
+                        }
+                    ],
+                }
+        elif url.path == "/search.json":
+            isbn = query.get("isbn", [""])[0]
+            book = server.catalog.get(isbn)
+            body = {"numFound": 0, "docs": []}
+            if book:
+                body = {
+                    "numFound": 1,
+                    "docs": [
+                        {
+                            "title": book["title"],
+                            "author_name": book["authors"],
+                            "subject": book["categories"],
+                            "isbn": [isbn],
+                        }
+                    ],
+                }
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Args:
+        catalog (dict): Mapping of ISBN-13 to {"title", "authors", "categories"}.
+        default_latency (float): Seconds every request is delayed.
+        latency (dict): Per-path latency overriding default_latency.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, catalog, port=0, default_latency=0.0, latency=None):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.catalog = catalog
+        self.default_latency = default_latency
+        self.latency = latency or {}
+        self.requests = {}
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub ISBN API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer({}, args.port, args.latency)
+    print(f"Serving on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
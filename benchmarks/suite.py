@@ -0,0 +1,236 @@
+"""
+Benchmark suite of the hot paths, with a regression check.
+
+Generates seeded inputs (outline text, YAML and JSON schemes of every --sizes
+at every --depths, PDF corpora with and without ISBNs, file trees), times
+every stage on tmpfs and writes the results as JSON. Given a baseline, every
+stage slower than baseline * (1 + --threshold) is reported and the suite
+exits with status 1. Nothing is fetched from the network.
+
+Stages:
+    parse_outline            parse_classification_outline
+    load_yaml / load_json    load_yaml_file without the compiled cache
+    load_yaml_cached         load_yaml_file from the compiled cache
+    save_sqlite / load_sqlite  scheme database written by save_tree and loaded back
+    create_folders           create_folder_structure of the main script
+    yaml_to_dir              yaml_to_dir.create_folder_structure
+    extract_isbns            PDF metadata and ISBN extraction per corpus
+    target_to_filelist       scan of the inbox tree
+
+e.g. `python3 benchmarks/suite.py --output results.json --baseline benchmarks/baseline.json`
+and `--sizes 1000 10000 100000 1000000` for the full range.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import yaml_to_dir  # noqa: E402
+from automatic_pdf_sorter import pdf_existing_metadata_extractor, target_to_filelist  # noqa: E402
+from pdf_corpus import generate_corpus  # noqa: E402
+from scheme_db import load_tree, save_tree  # noqa: E402
+from synthetic import file_tree, outline_page, scheme_tree, write_scheme  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Slowdowns smaller than this are timer and scheduler noise, not regressions
+MIN_DIFFERENCE = 0.01
+
+
+def load_main_script():
+    # The entry point has a dash in its name and cannot be imported normally
+    spec = importlib.util.spec_from_file_location(
+        "classification_structure_creator", os.path.join(ROOT, "classification-structure-creator.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def scratch_directory():
+    # tmpfs, so the disk does not dominate the timings
+    for candidate in ("/dev/shm", None):
+        if candidate is None or (os.path.isdir(candidate) and os.access(candidate, os.W_OK)):
+            return tempfile.mkdtemp(prefix="bench-suite-", dir=candidate)
+
+
+def best_of(repeat, function, setup=None):
+    """Runs setup (untimed) and function repeat times, returns the fastest run in seconds."""
+    best = None
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function(argument) if setup else function()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def fresh_directory(parent):
+    # Every timed run creates its folders in a new, empty directory
+    return lambda: tempfile.mkdtemp(dir=parent)
+
+
+class Suite:
+    def __init__(self, directory, repeat, stages):
+        self.directory = directory
+        self.repeat = repeat
+        self.stages = stages
+        self.results = {}
+        self.main_script = load_main_script()
+
+    def run(self, stage, key, function, setup=None):
+        if self.stages and stage not in self.stages:
+            return
+        name = f"{stage}[{key}]"
+        seconds = best_of(self.repeat, function, setup)
+        self.results[name] = round(seconds, 6)
+        print(f"{name:40s} {seconds:10.4f}s")
+
+    def classification(self, sizes, depths, max_folder_nodes):
+        main_script = self.main_script
+        for size in sizes:
+            outline = os.path.join(self.directory, f"outline-{size}.txt")
+            with open(outline, "w", encoding="utf-8") as f:
+                f.write(outline_page(size))
+
+            def parse(outline=outline):
+                with open(outline, encoding="utf-8") as f:
+                    main_script.parse_classification_outline(f)
+
+            self.run("parse_outline", size, parse)
+
+            for depth in depths:
+                tree = scheme_tree(size, depth)
+                key = f"{size},depth={depth}"
+                yaml_path = write_scheme(tree, os.path.join(self.directory, f"scheme-{size}-{depth}.yaml"))
+                json_path = write_scheme(tree, os.path.join(self.directory, f"scheme-{size}-{depth}.json"))
+                self.run("load_yaml", key, lambda: main_script.load_yaml_file(yaml_path, use_cache=False))
+                self.run("load_json", key, lambda: main_script.load_yaml_file(json_path, use_cache=False))
+                main_script.load_yaml_file(yaml_path)
+                self.run("load_yaml_cached", key, lambda: main_script.load_yaml_file(yaml_path))
+                db_path = os.path.join(self.directory, f"scheme-{size}-{depth}.sqlite")
+                self.run("save_sqlite", key, lambda: save_tree(tree, db_path))
+                self.run("load_sqlite", key, lambda: load_tree(db_path))
+
+                if size > max_folder_nodes:
+                    continue
+                folders = os.path.join(self.directory, "folders")
+                os.makedirs(folders, exist_ok=True)
+                self.run(
+                    "create_folders",
+                    key,
+                    lambda base: main_script.create_folder_structure(base, tree),
+                    fresh_directory(folders),
+                )
+                self.run(
+                    "yaml_to_dir",
+                    key,
+                    lambda base: yaml_to_dir.create_folder_structure(base, tree),
+                    fresh_directory(folders),
+                )
+                shutil.rmtree(folders)
+
+    def pdfs(self, files, pages):
+        for label, ratio in (("with_isbn", 1.0), ("without_isbn", 0.0)):
+            corpus_dir = os.path.join(self.directory, f"pdfs-{label}")
+            corpus = generate_corpus(corpus_dir, files, pages, isbn_ratio=ratio)
+
+            def extract(corpus=corpus):
+                for path in corpus:
+                    pdf_existing_metadata_extractor({"filepath": path})
+
+            self.run("extract_isbns", f"{files},{label}", extract)
+
+    def scans(self, sizes, max_scan_files):
+        for size in sizes:
+            if size > max_scan_files:
+                continue
+            inbox = os.path.join(self.directory, f"inbox-{size}")
+            os.mkdir(inbox)
+            file_tree(inbox, size)
+            self.run("target_to_filelist", size, lambda: target_to_filelist(inbox))
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        list: (stage, baseline seconds, seconds) of every regression.
+    """
+    regressions = []
+    for stage, seconds in results.items():
+        before = baseline.get(stage)
+        if before is None or seconds - before < MIN_DIFFERENCE:
+            continue
+        if seconds > before * (1 + threshold):
+            regressions.append((stage, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[3, 8])
+    parser.add_argument("--pdfs", type=int, default=50, help="PDFs per corpus")
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-folder-nodes", type=int, default=100000)
+    parser.add_argument("--max-scan-files", type=int, default=100000)
+    parser.add_argument("--stages", nargs="+", help="Only run these stages")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with this results file, e.g. " + DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline")
+    args = parser.parse_args()
+
+    directory = scratch_directory()
+    try:
+        suite = Suite(directory, args.repeat, args.stages)
+        print(f"scratch directory {directory}")
+        suite.classification(args.sizes, args.depths, args.max_folder_nodes)
+        suite.pdfs(args.pdfs, args.pages)
+        suite.scans(args.sizes, args.max_scan_files)
+    finally:
+        shutil.rmtree(directory)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "results": suite.results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(suite.results, baseline, args.threshold)
+        for stage, before, seconds in regressions:
+            print(f"REGRESSION {stage}: {before:.4f}s -> {seconds:.4f}s ({seconds / before - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
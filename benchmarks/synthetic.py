@@ -0,0 +1,71 @@
+"""
+Generators for synthetic benchmark inputs, all seeded.
+
+outline_page writes Wikipedia-like outline text between the start and end
+markers, scheme_tree builds a classification of any size and depth that can be
+dumped to YAML or JSON. PDF corpora come from pdf_corpus.
+"""
+
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classification_tree import ClassificationTree  # noqa: E402
+from outline_parser import END_MARKER, START_MARKER  # noqa: E402
+from yaml_io import dump_yaml  # noqa: E402
+
+WORDS = ["history", "science", "law", "music", "medicine", "art", "general", "works"]
+
+
+def outline_page(lines, seed=0):
+    rng = random.Random(seed)
+    out = ["Introduction text", "", START_MARKER, ""]
+    for i in range(lines):
+        description = " ".join(rng.choices(WORDS, k=5))
+        if i % 50 == 0:
+            out.append(f"Class C{i} – {description}")
+        else:
+            out.append(f"Subclass C{i}S – {description}")
+        if i % 7 == 0:
+            out.append("")
+    out += [END_MARKER, "", "See also", "Further reading"]
+    return "\n".join(out) + "\n"
+
+
+def scheme_tree(nodes, max_depth, seed=0):
+    rng = random.Random(seed)
+    tree = ClassificationTree()
+    frontier = [(0, -1)]
+    for i in range(nodes):
+        parent, depth = rng.choice(frontier)
+        node = tree.add(f"N{i}", f"Topic {i}", parent)
+        if depth + 1 < max_depth:
+            frontier.append((node, depth + 1))
+    return tree
+
+
+def write_scheme(tree, file_path):
+    # YAML in the README layout read by yaml_to_dir.py, or the same as JSON
+    data = tree.to_yaml_dict()
+    with open(file_path, "w", encoding="utf-8") as f:
+        if file_path.endswith(".json"):
+            json.dump(data, f)
+        else:
+            dump_yaml(data, f)
+    return file_path
+
+
+def file_tree(directory, files, per_dir=100, seed=0):
+    # Empty files in nested directories, for the directory scans
+    rng = random.Random(seed)
+    dirs = [directory]
+    for i in range(files):
+        if i % per_dir == 0:
+            path = os.path.join(rng.choice(dirs), f"d{len(dirs):05d}")
+            os.mkdir(path)
+            dirs.append(path)
+        open(os.path.join(dirs[-1], f"book_{i:06d}.pdf"), "wb").close()
+    return directory
@@ -1,267 +1,264 @@
-import wikipediaapi
-from collections import defaultdict
+import io
 import os
-import yaml
 import argparse
-from deep_translator import GoogleTranslator
-
+import metrics
+from classification_tree import ClassificationTree, parse_languages, scheme_languages
+from folder_plan import materialize
+from lcc_source import SnapshotStore, get_page_text, iter_source_lines
+from metrics import METRICS
+from outline_parser import END_MARKER, iter_outline_lines, parse_outline
+from scheme_db import is_database, load_tree, save_tree
+from translator import BatchTranslator, TranslationCache
+from yaml_io import dump_yaml, load_file
+
+
+def get_lcc_from_wikipedia(lang, translator=None, page_text=None):
+    """
+    Parses the LCC outline and translates it if a language is given.
 
-def get_lcc_from_wikipedia(lang):
+    Args:
+        lang (str): Target language code, no translation if empty.
+        translator (BatchTranslator): Translator to use for the outline.
+        page_text (str or iterable): Text of the Wikipedia page, e.g. from a
+            snapshot, or an iterable of its lines. Downloaded when not given.
 
-    wiki_wiki = wikipediaapi.Wikipedia(
-        user_agent="LCC(merlin@example.com)",
-        language="en",
-        extract_format=wikipediaapi.ExtractFormat.WIKI,
-    )
-    p_wiki = wiki_wiki.page("Library of Congress Classification")
+    Returns:
+        ClassificationTree: The classification.
+    """
+    if page_text is None:
+        page_text = get_page_text()
 
-    return_dict = {}
+    with METRICS.stage("parse"):
+        tree = ClassificationTree.from_dict(parse_outline(page_text))
 
     if lang:
-        return_dict = translate_dict(
-            parse_classification_outline(trim_classification_text(p_wiki.text)), lang
-        )
-    else:
-        return_dict = parse_classification_outline(
-            trim_classification_text(p_wiki.text)
-        )
+        tree = translate_tree(tree, lang, translator)
+
+    return tree
+
+
+def get_lcc_languages(langs, translator=None, page_text=None):
+    """
+    Parses the LCC outline once and translates it into several languages.
+
+    Args:
+        langs (list): Target language codes.
+        translator (BatchTranslator): Translator to use for the outline.
+        page_text (str or iterable): Text of the Wikipedia page, downloaded when not given.
+
+    Returns:
+        dict: Language code to ClassificationTree, all with the same node ids.
+    """
+    if page_text is None:
+        page_text = get_page_text()
+
+    with METRICS.stage("parse"):
+        tree = ClassificationTree.from_dict(parse_outline(page_text))
 
-    return return_dict
+    return translate_languages(tree, langs, translator)
 
 
-def translate_dict(d, lang):
+def translate_languages(tree, langs, translator=None):
+    """
+    Translates all names of a ClassificationTree into several languages at once.
+
+    Returns:
+        dict: Language code to a translated copy of the tree.
+    """
+    translator = translator or BatchTranslator()
+    with METRICS.stage("translate"):
+        translations = translator.translate_many(tree.names[1:], langs)
+    return {lang: tree.relabel(translations[lang]) for lang in langs}
+
+
+def language_path(file_path, lang):
+    # classification.yaml -> classification.de.yaml
+    root, extension = os.path.splitext(file_path)
+    return f"{root}.{lang}{extension}"
+
+
+def translate_tree(tree, lang, translator=None):
+    """
+    Translates all names of a ClassificationTree, each unique name once.
+
+    Args:
+        tree (ClassificationTree): The tree to translate.
+        lang (str): The target language code.
+        translator (BatchTranslator): Translator to use, defaults to Google.
+
+    Returns:
+        ClassificationTree: A translated copy of the tree.
+    """
+    translator = translator or BatchTranslator()
+    with METRICS.stage("translate"):
+        return tree.relabel(translator.translate_strings(tree.names[1:], lang))
+
+
+def translate_dict(d, lang, backend=None, batch=True, translator=None):
     """
     Recursively translate all string values in a dictionary.
 
+    In batch mode (the default) the dictionary is walked once, every unique
+    string is collected and translated in as few backend requests as possible.
+
     :param d: The dictionary to translate.
     :param lang: The target language code (e.g., 'fr' for French).
+    :param backend: Translation backend, defaults to Google Translate.
+    :param batch: Translate all strings in packed batches instead of one by one.
+    :param translator: Preconfigured BatchTranslator, e.g. one with a cache.
     :return: A new dictionary with translated values.
     """
+    if batch:
+        return (translator or BatchTranslator(backend)).translate_tree(d, lang)
+
     translated_dict = {}
     for key, value in d.items():
         if isinstance(value, dict):
             # Recursively translate dictionaries
-            translated_dict[key] = translate_dict(value, lang)
+            translated_dict[key] = translate_dict(value, lang, backend, batch)
         elif isinstance(value, list):
             # Translate lists
             translated_dict[key] = [
                 (
-                    translate_dict(v, lang)
+                    translate_dict(v, lang, backend, batch)
                     if isinstance(v, dict)
-                    else translate_text(lang, v) if isinstance(v, str) else v
+                    else translate_text(lang, v, backend) if isinstance(v, str) else v
                 )
                 for v in value
             ]
         elif isinstance(value, str):
             # Translate strings
-            translated_dict[key] = translate_text(lang, value)
+            translated_dict[key] = translate_text(lang, value, backend)
         else:
             # Copy other types without modification
             translated_dict[key] = value
     return translated_dict
 
 
-def translate_text(lang, text):
-    # Helper function to split text into chunks
-    def split_text_into_chunks(text, max_chunk_size=5000):
-        chunks = []
-        current_chunk = []
-        current_length = 0
-
-        for line in text.splitlines(keepends=True):
-            line_length = len(line)
-            if current_length + line_length > max_chunk_size:
-                chunks.append("".join(current_chunk))
-                current_chunk = [line]
-                current_length = line_length
-            else:
-                current_chunk.append(line)
-                current_length += line_length
-
-        if current_chunk:
-            chunks.append("".join(current_chunk))
-
-        return chunks
-
-    # Split text into manageable chunks
-    chunks = split_text_into_chunks(text)
-
-    # Translate each chunk and concatenate results
-    translated_chunks = [
-        GoogleTranslator(source="auto", target=lang).translate(chunk)
-        for chunk in chunks
-    ]
-    translated_text = "".join(translated_chunks)
-
-    return translated_text
+def translate_text(lang, text, backend=None):
+    # Split text into manageable chunks, translate each and concatenate results
+    return BatchTranslator(backend).translate_text(text, lang)
 
 
 def parse_classification_outline(text):
-    classification_dict = defaultdict(dict)
-    current_class = None
-    current_subclass = None
-
-    for line in text.splitlines():
-        line = line.strip()
-
-        # Skip empty lines
-        if not line:
-            continue
-
-        # Check if the line is a Class
-        if line.startswith("Class "):
-            if " – " in line:
-                # Split by ' – ' to separate the class code and description
-                class_code, class_desc = line.split(" – ", 1)
-                current_class = class_code.replace("Class", "")
-                classification_dict[current_class] = {
-                    "description": class_desc,
-                    "subclasses": {},
-                }
-            else:
-                # Handle cases where the line doesn't follow the expected format
-                print(f"Warning: Class line not in expected format: '{line}'")
-
-        # Check if the line is a Subclass
-        elif line.startswith("Subclass ") or line.startswith("Subclasses "):
-            if " – " in line:
-                # Split by ' – ' to separate the subclass code and description
-                subclass_code, subclass_desc = line.split(" – ", 1)
-                current_subclass = subclass_code.replace("Subclasses ", "").replace(
-                    "Subclass ", ""
-                )
-                classification_dict[current_class]["subclasses"][
-                    current_subclass
-                ] = subclass_desc
-            else:
-                # Handle cases where the line doesn't follow the expected format
-                print(f"Warning: Subclass line not in expected format: '{line}'")
+    """
+    Parses class and subclass lines into a classification dictionary.
 
-    return classification_dict
+    Args:
+        text (str or iterable): The outline text, or any iterable of its lines
+            such as an open file handle.
 
+    Returns:
+        defaultdict: The classification dictionary.
+    """
+    return parse_outline(text, start_marker=None, end_marker=None)
 
-def trim_classification_text(text):
-    # Define start and end markers
-    start_marker = "Full classification outline"
-    end_marker = "Subclass ZA – Information resources/materials"
 
-    # Find the start and end positions
-    start_index = text.find(start_marker)
-    end_index = text.find(end_marker)
+def trim_classification_text(text):
+    # Keep only the part of the page between the outline's start and end markers
+    trimmed_lines = list(iter_outline_lines(io.StringIO(text)))
 
     # Ensure both markers are found
-    if start_index == -1 or end_index == -1:
+    if not trimmed_lines or END_MARKER not in trimmed_lines[-1]:
         return None
 
-    # Slice the text to include the content between the markers
-    # Add the length of the end_marker to include the line with "Subclass ZA"
-    trimmed_text = text[start_index : end_index + len(end_marker)]
+    return "".join(trimmed_lines)
+
 
-    return trimmed_text
+def folder_name(code, name):
+    return f"{code} - {name[:150]}"
 
 
-def create_folder_structure(base_dir, classification_dict, level=0, max_levels=10):
+def as_tree(classification):
+    # Accept both a ClassificationTree and any of the nested-dict shapes
+    if isinstance(classification, ClassificationTree):
+        return classification
+    return ClassificationTree.from_dict(classification)
+
+
+def create_folder_structure(
+    base_dir,
+    classification_dict,
+    level=0,
+    max_levels=None,
+    dry_run=False,
+    force=False,
+    jobs=1,
+):
     """
-    Recursively creates a folder structure based on a nested classification dictionary.
+    Creates a folder structure based on a nested classification dictionary.
+
+    All target paths are planned first, only the missing directories are
+    created and a re-run against an unchanged dictionary is skipped.
 
     Args:
         base_dir (str): The base directory where the folder structure will be created.
-        classification_dict (dict): The classification dictionary to convert into folders.
-        level (int): The current recursion level.
-        max_levels (int): The maximum recursion levels allowed (default is 10).
+        classification_dict (ClassificationTree or dict): The classification to convert into folders.
+        level (int): The level to start at.
+        max_levels (int): The deepest level to create, unlimited by default.
+        dry_run (bool): Only print the directories that would be created.
+        force (bool): Ignore the manifest of the last run.
+        jobs (int): Number of top-level classes created in parallel.
     """
-    if level > max_levels:
-        return
-
-    for code, details in classification_dict.items():
-        # Determine directory name
-        if isinstance(details, dict) and "description" in details:
-            dir_name = f"{code} - {details['description'][:150]}"
-        else:
-            dir_name = f"{code} - {str(details)[:150]}"
-
-        # Create the directory
-        current_dir = os.path.join(base_dir, dir_name)
-        os.makedirs(current_dir, exist_ok=True)
+    max_depth = None if max_levels is None else max_levels - level
+    if max_depth is not None and max_depth < 0:
+        return None
 
-        # Recursively create subdirectories if 'subclasses' exist
-        if isinstance(details, dict):
-            if "subclasses" in details:
-                create_folder_structure(
-                    current_dir, details["subclasses"], level + 1, max_levels
-                )
-            else:
-                # Recursively process any further nested dictionaries
-                for sub_key, sub_value in details.items():
-                    if isinstance(sub_value, dict):
-                        create_folder_structure(
-                            current_dir, {sub_key: sub_value}, level + 1, max_levels
-                        )
+    return materialize(
+        base_dir,
+        as_tree(classification_dict).iter_folder_paths(folder_name, max_depth=max_depth),
+        dry_run=dry_run,
+        force=force,
+        jobs=jobs,
+    )
 
 
 def create_external_folder_structure(
-    base_dir, classification_dict, level=0, max_levels=10
+    base_dir,
+    classification_dict,
+    level=0,
+    max_levels=None,
+    dry_run=False,
+    force=False,
+    jobs=1,
 ):
     """
-    Recursively creates a folder structure based on a nested classification dictionary.
+    Creates a folder structure based on a nested classification dictionary
+    loaded from a YAML file.
 
     Args:
         base_dir (str): The base directory where the folder structure will be created.
-        classification_dict (dict): The classification dictionary to convert into folders.
-        level (int): The current recursion level.
-        max_levels (int): The maximum recursion levels allowed (default is 10).
+        classification_dict (ClassificationTree or dict): The classification to convert into folders.
+        level (int): The level to start at.
+        max_levels (int): The deepest level to create, unlimited by default.
+        dry_run (bool): Only print the directories that would be created.
+        force (bool): Ignore the manifest of the last run.
+        jobs (int): Number of top-level classes created in parallel.
     """
-    if level > max_levels:
-        return
-
-    for code, details in classification_dict.items():
-        # Determine directory name
-        if isinstance(details, dict) and "description" in details:
-            dir_name = f"{code} - {details['description'][:150]}"
-        else:
-            dir_name = f"{code} - {str(details)[:150]}"
-
-        # Create the directory
-        current_dir = os.path.join(base_dir, dir_name)
-        os.makedirs(current_dir, exist_ok=True)
-
-        # Recursively create subdirectories if 'subclasses' exist
-        if isinstance(details, dict):
-            if "subclasses" in details:
-                create_folder_structure(
-                    current_dir, details["subclasses"], level + 1, max_levels
-                )
-            else:
-                # Recursively process any further nested dictionaries
-                for sub_key, sub_value in details.items():
-                    if isinstance(sub_value, dict):
-                        create_folder_structure(
-                            current_dir, {sub_key: sub_value}, level + 1, max_levels
-                        )
+    return create_folder_structure(
+        base_dir, classification_dict, level, max_levels, dry_run, force, jobs
+    )
 
 
-def load_yaml_file(file_path):
+def load_yaml_file(file_path, use_cache=True):
     """
     Loads a YAML file into a dictionary.
 
     Args:
-        file_path (str): The path to the YAML file.
+        file_path (str): The path to the YAML file, or to a database written by save_sqlite.
+        use_cache (bool): Use the compiled cache next to the YAML file.
 
     Returns:
-        dict: The loaded YAML as a dictionary.
+        dict: The loaded YAML as a dictionary, a ClassificationTree for a database.
     """
-    with open(file_path, "r") as file:
-        return yaml.safe_load(file)
+    if is_database(file_path):
+        return load_tree(file_path)
+    return load_file(file_path, use_cache)
 
 
 def dict_to_yaml_hierarchy(classification_dict):
-    # Convert the classification dictionary to a YAML string with indentation
-    yaml_str = yaml.dump(
-        dict(classification_dict),
-        sort_keys=False,
-        default_flow_style=False,
-        allow_unicode=True,
-    )
+    # Convert the classification to a YAML string with indentation
+    yaml_str = dump_yaml(as_tree(classification_dict).to_outline_dict())
     return yaml_str
 
 
@@ -275,21 +272,43 @@ def save_yaml_to_file(classification_dict, file_path):
     Saves the classification dictionary as a YAML file.
 
     Args:
-        classification_dict (dict): The classification dictionary to save.
+        classification_dict (ClassificationTree or dict): The classification to save.
         file_path (str): The path to the output YAML file.
     """
-    os.makedirs(file_path.replace("classification.yaml", ""), exist_ok=True)
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
     with open(file_path, "w") as file:
-        yaml.dump(
-            dict(classification_dict),
-            file,
-            sort_keys=False,
-            allow_unicode=True,
-            default_flow_style=False,
-        )
+        dump_yaml(as_tree(classification_dict).to_outline_dict(), file)
     print(f"YAML file saved to {file_path}")
 
 
+def save_multilingual_yaml(trees, file_path):
+    """
+    Saves several translations of a classification as one YAML file, every
+    name a {lang: name} mapping. create_folders and yaml_to_dir pick a language.
+
+    Args:
+        trees (dict): Language code to ClassificationTree, all with the same node ids.
+        file_path (str): The path to the output YAML file.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as file:
+        dump_yaml(next(iter(trees.values())).to_multilingual_dict(trees), file)
+    print(f"YAML file with {', '.join(trees)} saved to {file_path}")
+
+
+def save_sqlite_file(classification_dict, file_path, **meta):
+    """
+    Saves the classification as an indexed SQLite database, see scheme_db.py.
+
+    Args:
+        classification_dict (ClassificationTree or dict): The classification to save.
+        file_path (str): The path to the output database.
+        **meta: Stored with the classification, e.g. its source and language.
+    """
+    count = save_tree(as_tree(classification_dict), file_path, **meta)
+    print(f"{count} classes saved to {file_path}")
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(
@@ -297,8 +316,8 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "action",
-        choices=["create_folders", "print_yaml", "save_yaml", "yaml_to_dir"],
-        help="Action to perform: save_yaml, create_folders, yaml_to_dir or print_yaml",
+        choices=["create_folders", "print_yaml", "save_yaml", "save_sqlite", "yaml_to_dir"],
+        help="Action to perform: save_yaml, save_sqlite, create_folders, yaml_to_dir or print_yaml",
     )
     parser.add_argument(
         "--dir",
@@ -310,25 +329,196 @@ if __name__ == "__main__":
         default="./lcc/classification.yaml",
         help="Base YAML File to work with, defaults to CWD/lcc/classification.yaml",
     )
+    parser.add_argument(
+        "--db",
+        help="SQLite database written by save_sqlite (defaults to DIR/classification.sqlite). "
+        "create_folders, print_yaml and save_yaml read the classification from it when given.",
+    )
+    parser.add_argument(
+        "--from-file",
+        action="store_true",
+        help="save_sqlite: convert --file instead of fetching the outline from Wikipedia.",
+    )
     parser.add_argument(
         "--lang",
-        help="Language in which to fetch the Standard LCC. En and De are implemented. Defaults to En.",
+        help="Language in which to fetch the Standard LCC. En and De are implemented. Defaults to En. "
+        "Several comma separated languages (en,de,fr) are fetched and parsed once and translated at once: "
+        "save_yaml and save_sqlite write one file per language (classification.de.yaml), "
+        "create_folders one tree per language in DIR/LANG.",
         default="en",
     )
+    parser.add_argument(
+        "--combined",
+        action="store_true",
+        help="save_yaml with several languages: write one multilingual file to --file instead.",
+    )
+
+    parser.add_argument(
+        "--translation-cache",
+        help="SQLite file caching translations, defaults to DIR/translations.sqlite",
+    )
+    parser.add_argument(
+        "--no-translation-cache",
+        action="store_true",
+        help="Translate everything again without reading or writing the cache.",
+    )
+    parser.add_argument(
+        "--clear-translation-cache",
+        action="store_true",
+        help="Invalidate all cached translations for --lang before running.",
+    )
+
+    parser.add_argument(
+        "--translate-workers",
+        type=int,
+        default=4,
+        help="Number of concurrent translation requests, defaults to 4.",
+    )
+    parser.add_argument(
+        "--translate-rate",
+        type=float,
+        help="Maximum translation requests per second, unlimited by default.",
+    )
+
+    parser.add_argument(
+        "--source-file",
+        help="Parse a saved snapshot (.json) or text dump of the Wikipedia page instead of fetching it.",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        help="Directory of the local page snapshots, defaults to DIR/.snapshots",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the local snapshot without checking Wikipedia for a newer revision.",
+    )
+    parser.add_argument(
+        "--snapshot-ttl",
+        type=float,
+        help="Use snapshots younger than this many seconds without a revision check.",
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the directories create_folders and yaml_to_dir would create.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Scan the folder structure even if it is unchanged since the last run.",
+    )
+
+    parser.add_argument(
+        "--no-yaml-cache",
+        action="store_true",
+        help="Always parse --file instead of using its compiled cache.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of top-level classes whose folders are created in parallel.",
+    )
+
+    metrics.add_arguments(parser)
 
     args = parser.parse_args()
 
-    if args.action == "create_folders":
-        lcc_dict = get_lcc_from_wikipedia(args.lang)
-        create_folder_structure(args.dir, lcc_dict)
+    with metrics.measured(args):
+        # An empty --lang keeps the outline untranslated
+        langs = parse_languages(args.lang) or [None]
+        # Actions that take the classification from the database, the YAML file or Wikipedia
+        read_db = args.db is not None and args.action in ("create_folders", "print_yaml", "save_yaml")
+        from_wikipedia = args.action != "yaml_to_dir" and not read_db and not (
+            args.action == "save_sqlite" and args.from_file
+        )
 
-    elif args.action == "print_yaml":
-        lcc_dict = get_lcc_from_wikipedia(args.lang)
-        pretty_print_hierarchy(lcc_dict)
+        translation_cache = None
+        if not args.no_translation_cache and from_wikipedia:
+            translation_cache = TranslationCache(
+                args.translation_cache or os.path.join(args.dir, "translations.sqlite")
+            )
+            if args.clear_translation_cache:
+                for lang in langs:
+                    translation_cache.invalidate(target_lang=lang)
+        translator = BatchTranslator(
+            cache=translation_cache,
+            workers=args.translate_workers,
+            rate_limit=args.translate_rate,
+        )
+
+        page_text = None
+        if from_wikipedia:
+            if args.source_file:
+                page_text = iter_source_lines(args.source_file)
+            else:
+                page_text = get_page_text(
+                    SnapshotStore(args.snapshot_dir or os.path.join(args.dir, ".snapshots")),
+                    offline=args.offline,
+                    ttl=args.snapshot_ttl,
+                )
 
-    elif args.action == "save_yaml":
-        lcc_dict = get_lcc_from_wikipedia(args.lang)
-        save_yaml_to_file(lcc_dict, args.file)
+        # One classification per language, a single one is written where it always was
+        trees = {}
+        if read_db:
+            trees = {None: load_tree(args.db)}
+        elif from_wikipedia and len(langs) > 1:
+            trees = get_lcc_languages(langs, translator, page_text)
+        elif from_wikipedia:
+            trees = {langs[0]: get_lcc_from_wikipedia(langs[0], translator, page_text)}
+        multiple = len(trees) > 1
+
+        if args.action == "create_folders":
+            for lang, lcc_dict in trees.items():
+                create_folder_structure(
+                    os.path.join(args.dir, lang) if multiple else args.dir,
+                    lcc_dict,
+                    dry_run=args.dry_run,
+                    force=args.force,
+                    jobs=args.jobs,
+                )
+
+        elif args.action == "print_yaml":
+            for lang, lcc_dict in trees.items():
+                if multiple:
+                    print(f"# {lang}")
+                pretty_print_hierarchy(lcc_dict)
+
+        elif args.action == "save_yaml":
+            if multiple and args.combined:
+                save_multilingual_yaml(trees, args.file)
+            else:
+                for lang, lcc_dict in trees.items():
+                    save_yaml_to_file(lcc_dict, language_path(args.file, lang) if multiple else args.file)
+
+        elif args.action == "save_sqlite":
+            db_path = args.db or os.path.join(args.dir, "classification.sqlite")
+            if args.from_file:
+                trees = {"": load_yaml_file(args.file, use_cache=not args.no_yaml_cache)}
+            for lang, lcc_dict in trees.items():
+                save_sqlite_file(
+                    lcc_dict,
+                    language_path(db_path, lang) if multiple else db_path,
+                    source=args.file if args.from_file else "wikipedia",
+                    language=lang or "",
+                )
+
+        elif args.action == "yaml_to_dir":
+            data = load_yaml_file(args.file, use_cache=not args.no_yaml_cache)
+            # A multilingual file gets one tree per language asked for that it has
+            available = scheme_languages(data)
+            selected = [lang for lang in langs if lang in available] or available[:1] or [None]
+            for lang in selected:
+                create_external_folder_structure(
+                    os.path.join(args.dir, lang) if len(selected) > 1 else args.dir,
+                    ClassificationTree.from_dict(data, lang) if lang else data,
+                    dry_run=args.dry_run,
+                    force=args.force,
+                    jobs=args.jobs,
+                )
 
-    elif args.action == "yaml_to_dir":
-        create_external_folder_structure(args.dir, load_yaml_file(args.file))
+        if translation_cache is not None:
+            print(translation_cache.stats())
+            translation_cache.close()
@@ -0,0 +1,349 @@
+"""
+Compact in-memory model of a classification scheme.
+
+Nodes are stored array-backed (parallel arrays of codes, names and parent,
+first child, last child and next sibling ids), so trees with millions of nodes
+stay small and are walked without recursion. A dict maps every code to its
+node in O(1), a lazily built sorted code list answers prefix queries.
+
+The project knows three nested-dict shapes, all of them can be loaded with
+ClassificationTree.from_dict:
+
+    parse_classification_outline:
+        {code: {"description": str, "subclasses": {code: str or dict}}}
+    YAML layout of the README / yaml_to_dir.py:
+        {code: {"name": str, "subclasses": [{code: {"name": ..., "subclasses": [...]}}]}}
+        with plain strings as leaves ({code: str}) and list items written as
+        {code: None, "name": ..., "subclasses": [...]} when indented that way.
+    Multilingual outline, written by save_yaml with several languages:
+        {code: {"description": {lang: str, ...}, "subclasses": {code: {"description": ...}}}}
+
+A multilingual scheme is loaded in one of its languages, the first by default.
+"""
+
+import os
+from array import array
+from bisect import bisect_left
+
+ROOT = 0
+NO_NODE = -1
+META_KEYS = ("name", "description", "subclasses")
+
+
+def pick_language(names, lang=None):
+    # {"name": ...}, or {lang: name} of a multilingual scheme, falling back to its first language
+    if "name" in names:
+        return names["name"]
+    if lang in names:
+        return names[lang]
+    return next(iter(names.values()), None)
+
+
+def node_fields(value, lang=None):
+    """
+    Splits a node value of any of the supported shapes into name and children.
+
+    Args:
+        lang (str): Language picked from the names of a multilingual scheme.
+
+    Returns:
+        tuple: (name, children) where children is a dict, a list or None.
+    """
+    if value is None:
+        return "", None
+    if isinstance(value, str):
+        return value, None
+    if isinstance(value, dict):
+        name = value.get("description", value.get("name"))
+        if isinstance(name, dict):
+            name = pick_language(name, lang)
+        return ("" if name is None else str(name)), value.get("subclasses")
+    return str(value), None
+
+
+def parse_languages(value):
+    # "en, DE,zh-CN" -> ["en", "de", "zh-CN"], the translator's region codes are case-sensitive
+    langs = []
+    for lang in value.split(","):
+        language, dash, region = lang.strip().partition("-")
+        if language:
+            langs.append(language.lower() + dash + region)
+    return list(dict.fromkeys(langs))
+
+
+def scheme_languages(data):
+    """Returns the languages of a multilingual scheme, an empty list for any other."""
+    if not isinstance(data, (dict, list)):
+        return []
+    for _, value in iter_entries(data):
+        if isinstance(value, dict):
+            names = value.get("description", value.get("name"))
+            if isinstance(names, dict) and "name" not in names:
+                return list(names)
+        return []
+    return []
+
+
+def iter_entries(children):
+    # Yields (code, value) pairs of a subclasses dict or list
+    if isinstance(children, dict):
+        yield from children.items()
+    elif isinstance(children, list):
+        for item in children:
+            if isinstance(item, dict):
+                codes = [key for key in item if key not in META_KEYS]
+                if len(codes) == 1 and item[codes[0]] is None and len(item) > 1:
+                    # {code: None, "name": ..., "subclasses": [...]}
+                    yield codes[0], {key: item[key] for key in item if key != codes[0]}
+                else:
+                    yield from item.items()
+            elif item is not None:
+                yield str(item), None
+
+
+class ClassificationTree:
+    """
+    Array-backed classification tree.
+
+    Node 0 is an invisible root, the top-level classes are its children.
+    """
+
+    __slots__ = (
+        "codes",
+        "names",
+        "parents",
+        "first_child",
+        "last_child",
+        "next_sibling",
+        "index",
+        "_sorted_codes",
+    )
+
+    def __init__(self):
+        self.codes = [""]
+        self.names = [""]
+        self.parents = array("l", [NO_NODE])
+        self.first_child = array("l", [NO_NODE])
+        self.last_child = array("l", [NO_NODE])
+        self.next_sibling = array("l", [NO_NODE])
+        self.index = {}
+        self._sorted_codes = None
+
+    def __len__(self):
+        return len(self.codes) - 1
+
+    def add(self, code, name="", parent=ROOT):
+        """
+        Appends a node as the last child of parent.
+
+        Returns:
+            int: The id of the new node.
+        """
+        node = len(self.codes)
+        code = str(code)
+        self.codes.append(code)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.first_child.append(NO_NODE)
+        self.last_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+
+        if self.first_child[parent] == NO_NODE:
+            self.first_child[parent] = node
+        else:
+            self.next_sibling[self.last_child[parent]] = node
+        self.last_child[parent] = node
+
+        self.index.setdefault(code, node)
+        self._sorted_codes = None
+        return node
+
+    def find(self, code):
+        """Returns the node id for a code, or None."""
+        return self.index.get(code)
+
+    def children(self, node=ROOT):
+        child = self.first_child[node]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def has_children(self, node):
+        return self.first_child[node] != NO_NODE
+
+    def path(self, node):
+        """Returns the node ids from the top-level class down to node."""
+        nodes = []
+        while node != ROOT:
+            nodes.append(node)
+            node = self.parents[node]
+        nodes.reverse()
+        return nodes
+
+    def code_path(self, code):
+        """Returns the codes from the top-level class down to code, e.g. ["Q", "QA", "QA76"]."""
+        node = self.find(code)
+        if node is None:
+            return None
+        return [self.codes[n] for n in self.path(node)]
+
+    def walk(self, node=ROOT, max_depth=None):
+        """
+        Yields (node, depth) for all descendants of node in pre-order, parents
+        before their children. Top-level classes have depth 0.
+        """
+        start = self.first_child[node]
+        if start == NO_NODE:
+            return
+        stack = [(start, 0)]
+        while stack:
+            current, depth = stack.pop()
+            yield current, depth
+            sibling = self.next_sibling[current]
+            if sibling != NO_NODE:
+                stack.append((sibling, depth))
+            child = self.first_child[current]
+            if child != NO_NODE and (max_depth is None or depth < max_depth):
+                stack.append((child, depth + 1))
+
+    def subtree(self, code):
+        """Yields the ids of the node with code and all of its descendants."""
+        node = self.find(code)
+        if node is None:
+            return
+        yield node
+        for descendant, _ in self.walk(node):
+            yield descendant
+
+    def with_prefix(self, prefix):
+        """Returns all codes starting with prefix, in sorted order."""
+        if self._sorted_codes is None:
+            self._sorted_codes = sorted(self.index)
+        codes = self._sorted_codes
+        start = bisect_left(codes, prefix)
+        end = start
+        while end < len(codes) and codes[end].startswith(prefix):
+            end += 1
+        return codes[start:end]
+
+    def relabel(self, names):
+        """
+        Returns a copy of the tree with other names, e.g. translations.
+
+        Args:
+            names (dict or callable): Mapping of old to new name, or a function.
+        """
+        tree = ClassificationTree()
+        tree.codes = list(self.codes)
+        tree.parents = array("l", self.parents)
+        tree.first_child = array("l", self.first_child)
+        tree.last_child = array("l", self.last_child)
+        tree.next_sibling = array("l", self.next_sibling)
+        tree.index = dict(self.index)
+        lookup = names if callable(names) else (lambda name: names.get(name, name))
+        tree.names = [""] + [lookup(name) for name in self.names[1:]]
+        return tree
+
+    def iter_folder_paths(self, dir_name, separator=os.sep, max_depth=None):
+        """
+        Yields relative folder paths, every parent before its children.
+
+        Args:
+            dir_name (callable): Builds a folder name from (code, name).
+            separator (str): Path separator, usually os.sep.
+            max_depth (int): Deepest level to include, unlimited if None.
+        """
+        parent_paths = {ROOT: ""}
+        for node, depth in self.walk(max_depth=max_depth):
+            parent_path = parent_paths[self.parents[node]]
+            folder = dir_name(self.codes[node], self.names[node])
+            path = f"{parent_path}{separator}{folder}" if parent_path else folder
+            yield path
+            if self.first_child[node] != NO_NODE:
+                parent_paths[node] = path
+
+    @classmethod
+    def from_dict(cls, data, lang=None):
+        """
+        Loads any of the supported nested-dict shapes, see the module docstring.
+
+        Args:
+            lang (str): Language to load of a multilingual scheme.
+        """
+        tree = cls()
+        if not data:
+            return tree
+        stack = [(ROOT, iter_entries(data))]
+        while stack:
+            parent, entries = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+            code, value = entry
+            name, children = node_fields(value, lang)
+            node = tree.add(code, name, parent)
+            if children:
+                stack.append((node, iter_entries(children)))
+        return tree
+
+    def to_outline_dict(self):
+        """
+        Dumps the parse_classification_outline shape. Top-level classes are
+        {"description", "subclasses"} dicts, leaves below them plain strings.
+        """
+        result = {}
+        containers = {ROOT: result}
+        for node, depth in self.walk():
+            container = containers[self.parents[node]]
+            if depth > 0 and not self.has_children(node):
+                container[self.codes[node]] = self.names[node]
+                continue
+            subclasses = {}
+            container[self.codes[node]] = {
+                "description": self.names[node],
+                "subclasses": subclasses,
+            }
+            containers[node] = subclasses
+        return result
+
+    def to_multilingual_dict(self, translations):
+        """
+        Dumps the multilingual outline shape, every name a {lang: name} dict.
+
+        Args:
+            translations (dict): Language code to a relabeled copy of this
+                tree, e.g. from translate_tree, so node ids are the same.
+        """
+        result = {}
+        containers = {ROOT: result}
+        for node, _ in self.walk():
+            entry = {"description": {lang: tree.names[node] for lang, tree in translations.items()}}
+            containers[self.parents[node]][self.codes[node]] = entry
+            if self.has_children(node):
+                entry["subclasses"] = containers[node] = {}
+        return result
+
+    def to_yaml_dict(self, leaf_strings=True):
+        """
+        Dumps the YAML layout of the README, as read by yaml_to_dir.py.
+
+        Args:
+            leaf_strings (bool): Write leaves as {code: name} instead of
+                {code: {"name": name}}.
+        """
+        result = {}
+        containers = {}
+        for node, depth in self.walk():
+            code = self.codes[node]
+            if depth > 0 and leaf_strings and not self.has_children(node):
+                containers[self.parents[node]].append({code: self.names[node]})
+                continue
+            value = {"name": self.names[node]}
+            if self.has_children(node):
+                value["subclasses"] = containers[node] = []
+            if depth == 0:
+                result[code] = value
+            else:
+                containers[self.parents[node]].append({code: value})
+        return result
@@ -0,0 +1,190 @@
+"""
+Ranks the classes of a classification for a document's metadata.
+
+Every node of a ClassificationTree becomes a small document: its own name plus
+the names of its nearest ancestors at a lower weight, so "Algebra" below
+"Mathematics" also matches a book about mathematics. The documents are turned
+into L2-normalized TF-IDF vectors and stored as an inverted index from term to
+(node, weight) postings. Scoring a query only touches the postings of its own
+terms, which keeps it at thousands of documents per second in plain Python.
+"""
+
+import heapq
+import math
+import os
+import re
+from collections import Counter, namedtuple
+
+from classification_tree import ClassificationTree
+from outline_parser import parse_outline
+from scheme_db import is_database, load_tree
+from yaml_io import load_file
+
+TOKEN = re.compile(r"[^\W\d_]{3,}")
+STOPWORDS = frozenset(
+    """
+    and the for with from into other than this that their general works special
+    topics including etc see also about under over aspects
+
+    und der die das den dem des für mit von vom zur zum sowie oder eine einer
+    allgemeines allgemein sonstige andere
+    """.split()
+)
+ANCESTOR_WEIGHT = 0.5
+# Only the parent and grandparent lend their names to a node
+ANCESTOR_LEVELS = 2
+# Only the strongest postings of very common terms are kept
+MAX_POSTINGS = 500
+
+Match = namedtuple("Match", "code name score node")
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # Crude plural folding, "sciences" and "science" are the same term
+        if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def load_classification(file_path):
+    """
+    Loads a classification for the classifier.
+
+    Args:
+        file_path (str): An LCC outline as plain text (.txt), a scheme database
+            written by save_sqlite, or a YAML/JSON scheme in any of the layouts
+            ClassificationTree.from_dict reads.
+
+    Returns:
+        ClassificationTree: The classification.
+    """
+    if file_path.endswith(".txt"):
+        with open(file_path, encoding="utf-8") as f:
+            return ClassificationTree.from_dict(parse_outline(f, None, None))
+    if is_database(file_path):
+        return load_tree(file_path)
+    return ClassificationTree.from_dict(load_file(file_path))
+
+
+class Classifier:
+    """
+    Args:
+        tree (ClassificationTree): The classes to rank.
+        ancestor_weight (float): Weight of the ancestors' names relative to a
+            node's own name.
+        ancestor_levels (int): Number of ancestors whose names are included.
+        max_postings (int): Postings kept per term.
+    """
+
+    def __init__(
+        self, tree, ancestor_weight=ANCESTOR_WEIGHT, ancestor_levels=ANCESTOR_LEVELS, max_postings=MAX_POSTINGS
+    ):
+        self.tree = tree
+        # Outline class codes come with a leading space (" A")
+        self.codes = [code.strip() for code in tree.codes]
+        self.build(ancestor_weight, ancestor_levels, max_postings)
+
+    def build(self, ancestor_weight, ancestor_levels, max_postings):
+        tree = self.tree
+        node_tokens = {0: []}
+        weighted_terms = {}
+        document_frequency = Counter()
+
+        for node, _ in tree.walk():
+            tokens = tokenize(tree.names[node])
+            node_tokens[node] = tokens
+            terms = Counter(tokens)
+            # Ancestors' own names, at a lower weight than the node's
+            ancestor = tree.parents[node]
+            for _ in range(ancestor_levels):
+                for token in node_tokens[ancestor]:
+                    terms[token] += ancestor_weight
+                ancestor = tree.parents[ancestor]
+                if ancestor < 0:
+                    break
+            weighted_terms[node] = terms
+            document_frequency.update(terms.keys())
+
+        documents = len(weighted_terms)
+        self.idf = {
+            term: math.log((documents + 1) / (df + 1)) + 1
+            for term, df in document_frequency.items()
+        }
+
+        postings = {}
+        for node, terms in weighted_terms.items():
+            vector = {term: math.log1p(tf) * self.idf[term] for term, tf in terms.items()}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            for term, weight in vector.items():
+                postings.setdefault(term, []).append((node, weight / norm))
+
+        self.postings = {}
+        for term, entries in postings.items():
+            if len(entries) > max_postings:
+                entries = heapq.nlargest(max_postings, entries, key=lambda entry: entry[1])
+            self.postings[term] = tuple(entries)
+
+    def query_vector(self, text):
+        terms = Counter(token for token in tokenize(text) if token in self.postings)
+        vector = {term: math.log1p(tf) * self.idf[term] for term, tf in terms.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {term: weight / norm for term, weight in vector.items()}
+
+    def rank(self, text, k=5):
+        """
+        Returns the k best matching classes for text, best first.
+
+        Returns:
+            list: Match(code, name, score, node) tuples, score is the cosine similarity.
+        """
+        scores = {}
+        get = scores.get
+        for term, query_weight in self.query_vector(text).items():
+            for node, weight in self.postings[term]:
+                scores[node] = get(node, 0.0) + query_weight * weight
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [Match(self.codes[node], self.tree.names[node], score, node) for node, score in best]
+
+    def classify(self, pdf_file, k=5):
+        """Ranks a pdf_file dict by its title, subject and categories."""
+        return self.rank(metadata_text(pdf_file), k)
+
+    def is_related(self, node, other):
+        # True if one node is an ancestor of the other, i.e. not a competitor
+        return node in self.tree.path(other) or other in self.tree.path(node)
+
+
+def metadata_text(pdf_file):
+    parts = [pdf_file.get("title"), pdf_file.get("subject")]
+    parts += pdf_file.get("categories") or []
+    if not any(parts):
+        # Nothing better known, fall back to the cleaned file name
+        parts.append(pdf_file.get("filename_title") or os.path.splitext(pdf_file.get("filename") or "")[0])
+    return " ".join(str(part) for part in parts if part)
+
+
+def confident_match(classifier, matches, min_score=0.3, min_margin=0.1):
+    """
+    Picks the best match if it is clearly better than its competitors.
+
+    A match competes with every other match that is not its ancestor or
+    descendant: "QA76" winning over "QA" is consistent, over "BF" it is not.
+
+    Returns:
+        Match: The best match, or None if a person should decide.
+    """
+    if not matches or matches[0].score < min_score:
+        return None
+    best = matches[0]
+    for other in matches[1:]:
+        if classifier.is_related(best.node, other.node):
+            continue
+        if best.score - other.score < min_margin:
+            return None
+        break
+    return best
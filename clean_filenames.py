@@ -1,5 +1,12 @@
 import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from metrics import METRICS
+from move_journal import MoveJournal
+from scan_index import DEFAULT_INDEX_PATH, ScanIndex, iter_files
 
 __author__ = "Fabian Schober"
 __version__ = "0.1.0"
@@ -7,34 +14,176 @@ __license__ = "MIT"
 
 target_filelist = []
 
-def target_to_filelist(target_dir):
-    pdf_files = []
-    for root, dirs, files in os.walk(target_dir, topdown=False):
-        for name in files:
-            # print(os.path.join(root, name))
+# Separate from the sorter's index, a cleaned file is not a processed one
+DEFAULT_CLEAN_INDEX_PATH = os.path.join(os.path.dirname(DEFAULT_INDEX_PATH), "clean_filenames_index.sqlite")
+
+def target_to_filelist(target_dir, index=None, full_scan=False):
+    # With a ScanIndex, files cleaned by an earlier run come back with "indexed"
+    with METRICS.stage("scan"):
+        if index is not None:
+            pdf_files = index.scan(target_dir, full_scan)
+            for file in pdf_files:
+                file["root"] = os.path.dirname(file["filepath"])
+            return pdf_files
+
+        pdf_files = []
+        for root, entry in iter_files(target_dir):
             pdf_files.append(
                 {
                 "root": root,  
-                "filepath": os.path.join(root, name), 
-                "filename": name
+                "filepath": entry.path, 
+                "filename": entry.name
                 }
                 )
-    return pdf_files
+        return pdf_files
+
+JOURNAL_NAME = ".rename-journal.jsonl"
+
+def cleaned_name(filename):
+    return filename.replace("_"," ").replace(":"," ").replace("(auth.)","")
+
+def plan_renames(target_filelist):
+    """
+    Plans the renames of all PDFs in one pass, without touching a file.
+
+    A target name is claimed by the first file (in path order) that wants it.
+    Files whose target is claimed by another file, or is the name of any
+    existing file, are left out of the plan. That includes a file the same
+    plan renames away: renames run in batches and in parallel, so the target
+    might not be free yet when its turn comes.
+
+    Returns:
+        tuple: ([(src, dst)] renames, [(src, dst)] collisions, [files already clean])
+    """
+    existing = {file["filepath"] for file in target_filelist}
+    claimed = set()
+    renames = []
+    collisions = []
+    unchanged = []
+    for file in sorted(target_filelist, key=lambda file: file["filepath"]):
+        if file.get("indexed") or not file["filename"].lower().endswith(".pdf"):
+            continue
+        dst = os.path.join(os.path.dirname(file["filepath"]), cleaned_name(file["filename"]))
+        if dst == file["filepath"]:
+            unchanged.append(file)
+        elif dst in claimed or dst in existing:
+            collisions.append((file["filepath"], dst))
+        else:
+            claimed.add(dst)
+            renames.append((file["filepath"], dst))
+    return renames, collisions, unchanged
+
+def rename_file(src, dst):
+    # Checked again right before renaming, os.rename would replace the file
+    if os.path.exists(dst):
+        raise FileExistsError(f"{dst} exists")
+    os.rename(src, dst)
 
-def clean_filename(file):
-    print(file)
-    new_filename = file["filename"].replace("_"," ").replace(":"," ").replace("(auth.)","")
-    os.rename(file["filepath"], os.path.join(file["root"], new_filename))
+def apply_renames(renames, journal, batch_size=500, workers=1, verbose=0):
+    """
+    Applies planned renames in batches, journaling every batch before it runs.
+
+    Args:
+        workers (int): Threads renaming in parallel, useful on network shares.
+
+    Returns:
+        tuple: ([(src, dst)] renames done, [(src, dst, error)] failures)
+    """
+    done = []
+    failed = []
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for start in range(0, len(renames), batch_size):
+            batch = renames[start:start + batch_size]
+            journal.plan(batch)
+            if executor is not None:
+                results = executor.map(lambda move: try_rename(*move), batch)
+            else:
+                results = (try_rename(src, dst) for src, dst in batch)
+            batch_done = []
+            batch_failed = []
+            for (src, dst), error in zip(batch, results):
+                if error is None:
+                    batch_done.append((src, dst))
+                    if verbose:
+                        print("renamed", src, "->", dst)
+                else:
+                    batch_failed.append((src, dst))
+                    failed.append((src, dst, error))
+            journal.done(batch_done)
+            # A failed rename stays "planned" otherwise and recover() would look at it
+            journal.failed(batch_failed)
+            done += batch_done
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return done, failed
+
+def try_rename(src, dst):
+    try:
+        rename_file(src, dst)
+    except OSError as error:
+        return error
+    return None
+
+def print_report(renames, collisions, unchanged, verbose=0):
+    if verbose:
+        for src, dst in renames:
+            print("rename", src, "->", dst)
+    for src, dst in collisions:
+        print("collision", src, "->", dst)
+    print(f"{len(renames)} files to rename, {len(collisions)} collisions, {len(unchanged)} already clean")
 
 
 def main(args):
-    target_filelist = target_to_filelist(args.target_dir)
-    # print(target_filelist)
+    journal_path = args.journal or os.path.join(args.target_dir, JOURNAL_NAME)
+    if args.rollback:
+        journal = MoveJournal(journal_path)
+        with METRICS.stage("rollback"):
+            outcomes = journal.rollback()
+        journal.close()
+        for src, dst, outcome in outcomes:
+            if outcome != "rolled back" or args.verbose:
+                print(outcome, dst, "->", src)
+        print(f"{sum(1 for *_, outcome in outcomes if outcome == 'rolled back')} renames rolled back")
+        return
+
+    index = None
+    if not args.no_scan_index and not args.dry_run:
+        index = ScanIndex(args.scan_index)
+
+    start = time.perf_counter()
+    target_filelist = target_to_filelist(args.target_dir, index, args.full_scan)
+    with METRICS.stage("plan"):
+        renames, collisions, unchanged = plan_renames(target_filelist)
+    planned = time.perf_counter() - start
+    print_report(renames, collisions, unchanged, args.verbose)
+    print(f"planned {len(target_filelist)} files in {planned:.3f}s ({len(target_filelist) / (planned or 1e-9):.0f} files/s)")
+
+    if not args.dry_run:
+        journal = MoveJournal(journal_path)
+        for src, dst, outcome in journal.recover():
+            print("recovered", outcome, src, "->", dst)
+        start = time.perf_counter()
+        with METRICS.stage("rename"):
+            done, failed = apply_renames(renames, journal, args.batch_size, args.workers, args.verbose)
+        applied = time.perf_counter() - start
+        METRICS.count("renames", len(done))
+        journal.close()
+        for src, dst, error in failed:
+            print("could not rename", src, error)
+        print(f"renamed {len(done)} files in {applied:.3f}s ({len(done) / (applied or 1e-9):.0f} files/s), {len(failed)} failed")
+
+        if index is not None:
+            for src, dst in done:
+                index.rename(src, dst)
+                index.record({"filepath": dst, "cleaned": True})
+            for file in unchanged:
+                index.record({"filepath": file["filepath"], "cleaned": True})
 
-    for file in target_filelist:
-        if file["filename"].endswith(".pdf") or file["filename"].endswith(".PDF"):
-            print("processing file", file)
-            clean_filename(file)
+    if index is not None:
+        print(index.stats())
+        index.close()
 
 
 if __name__ == "__main__":
@@ -61,6 +210,46 @@ if __name__ == "__main__":
         "--target_dir",
         default="./sorted",
         help="Target dir with files to be sorted.", action="store", dest="target_dir")
+
+    parser.add_argument(
+        "--scan-index",
+        default=DEFAULT_CLEAN_INDEX_PATH,
+        help="SQLite file indexing already cleaned files.", action="store", dest="scan_index")
+
+    parser.add_argument(
+        "--no-scan-index",
+        help="Clean every file, without reading or updating the scan index.", action="store_true", dest="no_scan_index")
+
+    parser.add_argument(
+        "--full-scan",
+        help="List every directory and stat every file, even where the index says nothing changed.", action="store_true", dest="full_scan")
+
+    parser.add_argument(
+        "--dry-run",
+        help="Only report the planned renames and collisions.", action="store_true", dest="dry_run")
+
+    parser.add_argument(
+        "--journal",
+        help="Rename journal, defaults to TARGET_DIR/" + JOURNAL_NAME + ".", action="store", dest="journal")
+
+    parser.add_argument(
+        "--rollback",
+        help="Undo the renames recorded in the journal.", action="store_true", dest="rollback")
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Renames journaled and applied together.", action="store", dest="batch_size")
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Threads renaming in parallel, e.g. on network shares.", action="store", dest="workers")
+
+    metrics.add_arguments(parser)
     
     args = parser.parse_args()
-    main(args)
+    with metrics.measured(args):
+        main(args)
@@ -0,0 +1,180 @@
+"""
+Index of a destination tree from class code to directory.
+
+Folders created by classification-structure-creator.py are named
+"QA - Mathematics" (classes from the outline even " A - General Works"),
+folders created by yaml_to_dir.py "I000a Verarbeitung & Speicherung". Both
+start with the class code, so the directories can be indexed by code.
+
+The index is kept in SQLite between runs, together with the mtime of every
+directory. A refresh only lists directories whose mtime changed, i.e. that
+had subdirectories added, removed or renamed; the rest of the tree is taken
+from the index and only stat'ed. Lookups go to in-memory maps.
+"""
+
+import os
+import sqlite3
+import time
+from bisect import bisect_left
+
+from metrics import METRICS
+from scan_index import RACY_WINDOW_NS, subtree_range
+
+DEFAULT_DEST_INDEX_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "classification-structure-creator", "dest_index.sqlite"
+)
+
+
+def folder_code(folder_name):
+    """
+    Returns the class code a folder name starts with, e.g. "QA" for
+    "QA - Mathematics" and "QA76" for "QA76 Computer software - Programming".
+    """
+    words = folder_name.split(None, 1)
+    return words[0].rstrip("-") if words else ""
+
+
+class DestinationIndex:
+    """
+    Args:
+        base_dir (str): Root of the destination tree.
+        path (str): SQLite file keeping the index between runs, in memory only if None.
+    """
+
+    def __init__(self, base_dir, path=None):
+        self.base_dir = os.path.abspath(base_dir)
+        self.connection = sqlite3.connect(path or ":memory:")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dest_dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                depth INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            );
+            """
+        )
+        self.paths = []
+        self.codes = {}
+        self.sorted_codes = []
+        self.listed = 0
+        self.unchanged = 0
+
+    def stored_rows(self):
+        low, high = subtree_range(self.base_dir)
+        return self.connection.execute(
+            "SELECT path, parent, mtime_ns FROM dest_dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (self.base_dir, low, high),
+        )
+
+    def refresh(self, full=False):
+        """
+        Brings the index up to date with the destination tree.
+
+        Args:
+            full (bool): List every directory, even unchanged ones.
+        """
+        stored_mtimes = {}
+        stored_children = {}
+        for path, parent, mtime_ns in self.stored_rows():
+            stored_mtimes[path] = mtime_ns
+            stored_children.setdefault(parent, []).append(path)
+
+        self.listed = self.unchanged = 0
+        started_ns = time.time_ns()
+        upserts = []
+        removed = []
+        stack = [(self.base_dir, None, 0)]
+        while stack:
+            directory, parent, depth = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                removed.append(directory)
+                continue
+
+            children = stored_children.get(directory, [])
+            if stored_mtimes.get(directory) != mtime_ns or full:
+                self.listed += 1
+                try:
+                    with os.scandir(directory) as entries:
+                        listed = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+                except OSError:
+                    continue
+                removed.extend(set(children).difference(listed))
+                children = listed
+                if mtime_ns >= started_ns - RACY_WINDOW_NS:
+                    mtime_ns = -1
+                upserts.append(
+                    (directory, parent, depth, folder_code(os.path.basename(directory)) if parent else "", mtime_ns)
+                )
+            else:
+                self.unchanged += 1
+            stack.extend((child, directory, depth + 1) for child in children)
+
+        for path in removed:
+            low, high = subtree_range(path)
+            self.connection.execute(
+                "DELETE FROM dest_dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high)
+            )
+        self.connection.executemany("INSERT OR REPLACE INTO dest_dirs VALUES (?, ?, ?, ?, ?)", upserts)
+        self.connection.commit()
+        self.load()
+        METRICS.count("stat_calls", self.listed + self.unchanged + len(removed))
+        METRICS.count("scandir_calls", self.listed)
+        return self
+
+    def load(self):
+        # Shallowest directory wins if a code is used twice
+        low, high = subtree_range(self.base_dir)
+        self.paths = []
+        self.codes = {}
+        for path, code in self.connection.execute(
+            "SELECT path, code FROM dest_dirs WHERE path >= ? AND path < ? ORDER BY depth, path",
+            (low, high),
+        ):
+            self.paths.append(path)
+            self.codes.setdefault(code, path)
+        self.sorted_codes = sorted(self.codes)
+
+    def add(self, path):
+        """Adds a directory created after the last refresh."""
+        self.paths.append(path)
+        code = folder_code(os.path.basename(path))
+        if code not in self.codes:
+            self.codes[code] = path
+            self.sorted_codes.insert(bisect_left(self.sorted_codes, code), code)
+
+    def find(self, code):
+        """Returns the directory of a class code, or None."""
+        return self.codes.get(code.strip())
+
+    def with_prefix(self, prefix):
+        """Returns (code, directory) for all codes starting with prefix, in code order."""
+        codes = self.sorted_codes
+        start = end = bisect_left(codes, prefix)
+        while end < len(codes) and codes[end].startswith(prefix):
+            end += 1
+        return [(code, self.codes[code]) for code in codes[start:end]]
+
+    def longest_prefix(self, code):
+        """
+        Returns (code, directory) of the longest indexed prefix of code,
+        e.g. the "QA" folder for "QA76.9" if there is no "QA76.9" or "QA76" folder.
+        """
+        code = code.strip()
+        for end in range(len(code), 0, -1):
+            directory = self.codes.get(code[:end])
+            if directory is not None:
+                return code[:end], directory
+        return None
+
+    def stats(self):
+        return f"Destination index: {len(self.paths)} directories, {self.listed} listed, {self.unchanged} unchanged"
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return len(self.paths)
@@ -0,0 +1,259 @@
+"""
+Plan/apply engine for materializing folder structures.
+
+The full set of target paths is computed first, the existing tree is scanned
+once with os.scandir (only descending into directories that are part of the
+plan) and mkdir is issued only for the missing paths, parents first. A
+manifest of the applied plan lets a re-run against an unchanged structure be
+skipped entirely.
+
+Independent subtrees (one per top-level directory) can be created on a thread
+pool, which pays off on high-latency filesystems such as SMB, NFS or FUSE.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import METRICS
+
+MANIFEST_NAME = ".folder-manifest.json"
+
+
+def plan_digest(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode("utf-8", "surrogateescape"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def with_ancestors(paths):
+    # Names may contain path separators ("resources/materials"), which makes
+    # makedirs create intermediate directories. Plan those explicitly.
+    for path in paths:
+        parts = path.split(os.sep)
+        for depth in range(1, len(parts)):
+            yield os.sep.join(parts[:depth])
+        yield path
+
+
+class FolderCreationError(Exception):
+    """
+    Raised when directories could not be created.
+
+    Attributes:
+        errors (list): (relative path, exception) tuples in plan order.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [f"{path}: {error}" for path, error in errors]
+        super().__init__(
+            f"{len(errors)} directories could not be created:\n" + "\n".join(lines)
+        )
+
+
+def group_by_top_level(paths):
+    """
+    Splits parent-first ordered paths into independent subtrees.
+
+    Returns:
+        list: One list of (plan index, path) tuples per top-level directory.
+    """
+    groups = {}
+    for index, path in enumerate(paths):
+        groups.setdefault(path.split(os.sep, 1)[0], []).append((index, path))
+    return list(groups.values())
+
+
+def create_directories(base_dir, indexed_paths, mkdir=os.mkdir):
+    """
+    Creates parent-first ordered directories of one subtree.
+
+    Directories below a failed one are skipped.
+
+    Returns:
+        list: (plan index, relative path, exception) tuples of the failures.
+    """
+    errors = []
+    failed = set()
+    calls = 0
+    for index, path in indexed_paths:
+        if os.path.dirname(path) in failed:
+            failed.add(path)
+            continue
+        calls += 1
+        try:
+            mkdir(os.path.join(base_dir, path))
+        except FileExistsError:
+            pass
+        except OSError as error:
+            failed.add(path)
+            errors.append((index, path, error))
+    METRICS.count("mkdir_calls", calls)
+    return errors
+
+
+def scan_existing(base_dir, planned):
+    """
+    Collects the planned paths that already exist below base_dir.
+
+    Args:
+        base_dir (str): Root of the folder structure.
+        planned (set): Relative paths of all planned directories.
+
+    Returns:
+        set: The relative paths that exist.
+    """
+    existing = set()
+    if not os.path.isdir(base_dir):
+        return existing
+
+    stack = [""]
+    listed = 0
+    while stack:
+        relative_dir = stack.pop()
+        listed += 1
+        try:
+            with os.scandir(os.path.join(base_dir, relative_dir)) as entries:
+                for entry in entries:
+                    relative_path = os.path.join(relative_dir, entry.name)
+                    if relative_path in planned and entry.is_dir():
+                        existing.add(relative_path)
+                        stack.append(relative_path)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    METRICS.count("scandir_calls", listed)
+    return existing
+
+
+class FolderPlan:
+    """
+    Set of directories to create below a base directory.
+
+    Args:
+        base_dir (str): Root of the folder structure.
+        paths (iterable): Relative directory paths, every parent before its children.
+    """
+
+    def __init__(self, base_dir, paths):
+        self.base_dir = base_dir
+        self.paths = list(dict.fromkeys(with_ancestors(paths)))
+        self.digest = plan_digest(self.paths)
+        self.existing = None
+        self.missing = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.base_dir, MANIFEST_NAME)
+
+    def is_unchanged(self):
+        # True if this exact plan has been applied to base_dir before
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                return json.load(file).get("digest") == self.digest
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+
+    def compute(self):
+        """
+        Scans the existing tree and computes the missing directories.
+
+        Returns:
+            list: Relative paths to create, parents first.
+        """
+        self.existing = scan_existing(self.base_dir, set(self.paths))
+        self.missing = [path for path in self.paths if path not in self.existing]
+        return self.missing
+
+    def write_manifest(self):
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({"digest": self.digest, "directories": len(self.paths)}, file)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def apply(self, jobs=1, mkdir=os.mkdir):
+        """
+        Creates all missing directories and writes the manifest.
+
+        Args:
+            jobs (int): Number of top-level subtrees created in parallel.
+            mkdir (callable): Function creating a single directory.
+
+        Returns:
+            int: The number of created directories.
+
+        Raises:
+            FolderCreationError: With all failures in plan order. No manifest
+            is written in that case.
+        """
+        if self.missing is None:
+            self.compute()
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        groups = group_by_top_level(self.missing)
+
+        if jobs > 1 and len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                results = list(
+                    executor.map(
+                        lambda group: create_directories(self.base_dir, group, mkdir),
+                        groups,
+                    )
+                )
+        else:
+            results = [create_directories(self.base_dir, group, mkdir) for group in groups]
+
+        errors = sorted(error for result in results for error in result)
+        if errors:
+            raise FolderCreationError([(path, error) for _, path, error in errors])
+
+        self.write_manifest()
+        return len(self.missing)
+
+    def print_plan(self):
+        # Dry run output, one line per directory that would be created
+        if self.missing is None:
+            self.compute()
+        for path in self.missing:
+            print(f"mkdir {os.path.join(self.base_dir, path)}")
+        print(self.summary())
+
+    def summary(self):
+        return (
+            f"{len(self.paths)} directories planned, {len(self.existing)} existing, "
+            f"{len(self.missing)} to create"
+        )
+
+
+def materialize(base_dir, paths, dry_run=False, force=False, jobs=1):
+    """
+    Plans and applies a folder structure.
+
+    Args:
+        base_dir (str): Root of the folder structure.
+        paths (iterable): Relative directory paths, every parent before its children.
+        dry_run (bool): Only print the plan.
+        force (bool): Ignore the manifest and always scan the existing tree.
+        jobs (int): Number of top-level subtrees created in parallel.
+
+    Returns:
+        FolderPlan: The plan.
+    """
+    with METRICS.stage("folder_plan"):
+        plan = FolderPlan(base_dir, paths)
+        unchanged = not force and not dry_run and plan.is_unchanged()
+
+    if unchanged:
+        METRICS.count("folder_manifest_hits")
+        print(f"Folder structure in {base_dir} is unchanged, nothing to do")
+        return plan
+
+    with METRICS.stage("mkdir_walk"):
+        if dry_run:
+            plan.print_plan()
+        else:
+            plan.apply(jobs)
+            print(plan.summary())
+    return plan
@@ -0,0 +1,295 @@
+import errno
+import os
+import shutil
+import subprocess
+from itertools import islice
+
+from automatic_pdf_sorter import (
+    apply_metadata_record,
+    build_parser,
+    build_resolver,
+    classify_pdf,
+    iter_extracted_metadata,
+    open_dest_index,
+    target_to_filelist,
+    write_metadata_batch,
+)
+from classifier import Classifier, load_classification
+from isbn_lookup import DAY, IsbnLookup, LookupCache
+import metrics
+from metrics import METRICS
+from move_journal import PARTIAL, MoveJournal
+from scan_index import ScanIndex
+
+__author__ = "Fabian Schober"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+JOURNAL_NAME = ".ingest-journal.jsonl"
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def unique_destination(directory, filename, taken=()):
+    # "book.pdf", "book (2).pdf", ... so a move never overwrites a file
+    stem, extension = os.path.splitext(filename)
+    path = os.path.join(directory, filename)
+    number = 2
+    while path in taken or os.path.exists(path):
+        path = os.path.join(directory, f"{stem} ({number}){extension}")
+        number += 1
+    return path
+
+
+def move_file(src, dst):
+    """
+    Moves src to dst, raising FileExistsError instead of replacing a file that
+    appeared at dst since the move was planned.
+
+    Across file systems the file is copied to dst + ".partial" and renamed
+    into place, so a crash never leaves a half-written file at dst.
+    """
+    # Checked again right before moving, os.rename would replace the file
+    if os.path.exists(dst):
+        raise FileExistsError(f"{dst} exists")
+    try:
+        os.rename(src, dst)
+        return
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+    partial = dst + PARTIAL
+    shutil.copy2(src, partial)
+    if os.path.exists(dst):
+        os.remove(partial)
+        raise FileExistsError(f"{dst} exists")
+    os.rename(partial, dst)
+    os.remove(src)
+
+
+def class_folder(classifier, match, dirs):
+    """
+    Creates the folder of a class whose parent class already has one.
+
+    The new folder is named like its parent: "QA - Mathematics" below
+    "Q - Science", "QA Mathematics" below "Q Science".
+
+    Returns:
+        str: The new directory, or None if the parent has no folder either.
+    """
+    parent = classifier.tree.parents[match.node]
+    parent_dir = dirs.find(classifier.codes[parent]) if parent else None
+    if parent_dir is None:
+        return None
+    separator = " - " if " - " in os.path.basename(parent_dir) else " "
+    directory = os.path.join(parent_dir, f"{match.code}{separator}{match.name[:150]}".replace(os.sep, "-"))
+    os.makedirs(directory, exist_ok=True)
+    dirs.add(directory)
+    return directory
+
+
+def choose_directory(pdf_file, dirs):
+    # Asks a person with fzf, fed from the directory list built at the start
+    candidates = " ".join(code for code, _ in pdf_file.get("candidates", []))
+    try:
+        result = subprocess.run(
+            [
+                "fzf",
+                f"--prompt=Select destination directory for {pdf_file['filepath']}: ",
+                f"--header=Suggested classes: {candidates}",
+            ],
+            input="\n".join(dirs.paths),
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+    except FileNotFoundError:
+        return None
+    return result.stdout.strip() or None
+
+
+def plan_moves(files, classifier, dirs, args, planned):
+    """
+    Classifies a chunk of files.
+
+    Args:
+        planned (set): Destinations already used in this run, updated.
+
+    Returns:
+        tuple: ([(src, dst)] moves, [files for review])
+    """
+    moves = []
+    review = []
+    for file in files:
+        match = classify_pdf(file, classifier, args.top_k, args.min_score, args.min_margin)
+        directory = None
+        if match:
+            directory = dirs.find(match.code)
+            if directory is None and args.create_missing and not args.dry_run:
+                directory = class_folder(classifier, match, dirs)
+            if directory is None and args.nearest_folder:
+                # e.g. the "QA" folder for a "QA76.9" match
+                nearest = dirs.longest_prefix(match.code)
+                directory = nearest[1] if nearest else None
+        if directory is None:
+            review.append(file)
+            continue
+        dst = unique_destination(directory, os.path.basename(file["filepath"]), planned)
+        planned.add(dst)
+        moves.append((file["filepath"], dst))
+    return moves, review
+
+
+def apply_moves(moves, journal, dry_run=False):
+    if dry_run:
+        for src, dst in moves:
+            print("would move", src, "->", dst)
+        return len(moves)
+
+    journal.plan(moves)
+    done = []
+    failed = []
+    for src, dst in moves:
+        try:
+            move_file(src, dst)
+        except OSError as error:
+            print("could not move", src, error)
+            failed.append((src, dst))
+            continue
+        print("moved", src, "->", dst)
+        done.append((src, dst))
+    journal.done(done)
+    journal.failed(failed)
+    return len(done)
+
+
+def main(args):
+    with METRICS.stage("classifier_build"):
+        classifier = Classifier(load_classification(args.classification))
+    dirs = open_dest_index(args)
+    print(dirs.stats())
+
+    journal = None
+    if not args.dry_run:
+        journal = MoveJournal(args.journal or os.path.join(args.dest_dir, JOURNAL_NAME))
+        for src, dst, outcome in journal.recover():
+            print("recovered", outcome, src, "->", dst)
+
+    cache = None
+    if not args.no_lookup_cache:
+        cache = LookupCache(args.lookup_cache, args.lookup_ttl * DAY, args.not_found_ttl * DAY)
+    lookup = IsbnLookup(cache, timeout=args.provider_timeout)
+    resolver = build_resolver(args, lookup)
+    # A dry run must not mark the inbox as processed
+    index = None
+    if not args.no_scan_index and not args.dry_run:
+        index = ScanIndex(args.scan_index, args.scan_hash)
+
+    # The inbox is scanned once; files known to the index skip extraction and lookup
+    pdf_files = [
+        file
+        for file in target_to_filelist(args.target_dir, index, args.full_scan)
+        if file["filepath"].lower().endswith(".pdf")
+    ]
+    known = [file for file in pdf_files if file.get("indexed")]
+    new = [file for file in pdf_files if not file.get("indexed")]
+    print(f"{len(pdf_files)} PDFs in the inbox, {len(new)} new")
+
+    def chunks():
+        yield from iter_chunks(known, args.chunk_size)
+        # The process pool keeps extracting while a chunk is looked up and moved
+        for chunk in iter_chunks(iter_extracted_metadata(new, args.jobs, args.isbn_pages), args.chunk_size):
+            extracted = []
+            for file in chunk:
+                if "error" in file:
+                    print("skipping file", file["filepath"], file["error"])
+                else:
+                    extracted.append(file)
+            with METRICS.stage("resolve"):
+                records = resolver.resolve_batch([file["isbn"] for file in extracted])
+            for file, record in zip(extracted, records):
+                apply_metadata_record(file, record)
+            yield extracted
+
+    moved = 0
+    review = []
+    planned = set()
+    for chunk in chunks():
+        moves, chunk_review = plan_moves(chunk, classifier, dirs, args, planned)
+        if args.write_metadata and not args.dry_run:
+            # Written before the move, known files too if an earlier run did not write them
+            fresh = [file for file in chunk if not file.get("metadata_written")]
+            if fresh:
+                write_metadata_batch(fresh, not args.write_in_place, args.jobs, index)
+        if index is not None:
+            for file in chunk:
+                index.record(file)
+            index.commit()
+        with METRICS.stage("move"):
+            moved += apply_moves(moves, journal, args.dry_run)
+        review += chunk_review
+
+    if args.review and not args.dry_run:
+        for file in review[:]:
+            directory = choose_directory(file, dirs)
+            if directory:
+                dst = unique_destination(directory, os.path.basename(file["filepath"]), planned)
+                moved += apply_moves([(file["filepath"], dst)], journal)
+                review.remove(file)
+
+    for file in review:
+        print("review", file["filepath"], file.get("candidates"))
+    print(f"{moved} files {'to move' if args.dry_run else 'moved'}, {len(review)} left for review")
+
+    print(resolver.stats())
+    if cache is not None:
+        print(cache.stats())
+    if index is not None:
+        print(index.stats())
+        index.close()
+    if journal is not None:
+        journal.close()
+    dirs.close()
+    resolver.close()
+
+
+if __name__ == "__main__":
+    """ This is executed when run from the command line """
+    parser = build_parser()
+    parser.description = "Files all PDFs of an inbox into a classification tree in one run."
+    parser.set_defaults(target_dir=None)
+
+    parser.add_argument(
+        "--dry-run",
+        help="Print the moves without moving anything.", action="store_true", dest="dry_run")
+
+    parser.add_argument(
+        "--journal",
+        help="Move journal, defaults to DEST_DIR/" + JOURNAL_NAME + ".", action="store", dest="journal")
+
+    parser.add_argument(
+        "--review",
+        help="Ask for the directory of uncertain files with fzf at the end.", action="store_true", dest="review")
+
+    parser.add_argument(
+        "--create-missing",
+        help="Create the folder of a confident class below its parent class folder if it does not exist.", action="store_true", dest="create_missing")
+
+    parser.add_argument(
+        "--nearest-folder",
+        help="File a class without a folder into the folder of its longest code prefix.", action="store_true", dest="nearest_folder")
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=64,
+        help="Files looked up and moved together.", action="store", dest="chunk_size")
+
+    args = parser.parse_args()
+    if not (args.target_dir and args.dest_dir and args.classification):
+        parser.error("-t/--target_dir, -d/--dest_dir and -c/--classification are required")
+    with metrics.measured(args):
+        main(args)
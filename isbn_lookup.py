@@ -0,0 +1,308 @@
+"""
+ISBN lookups against Google Books and Open Library.
+
+Requests go through a keep-alive HTTP session (one persistent connection per
+host) and every answer is stored in a local SQLite cache keyed by provider
+and normalized ISBN. "Not found" answers are cached as well, with their own,
+usually shorter, expiry. Provider endpoints are configurable, so everything
+can run against a local stub server.
+"""
+
+import http.client
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from metrics import METRICS
+
+USER_AGENT = "classification-structure-creator/0.1"
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "classification-structure-creator", "isbn_lookup.sqlite"
+)
+DAY = 24 * 60 * 60
+
+
+class HttpSession:
+    """
+    Minimal keep-alive HTTP client, reusing one connection per host.
+
+    Args:
+        timeout (float): Socket timeout in seconds.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.connections = {}
+        self.requests = 0
+
+    def connection(self, scheme, netloc):
+        key = (scheme, netloc)
+        if key not in self.connections:
+            connection_class = (
+                http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            )
+            self.connections[key] = connection_class(netloc, timeout=self.timeout)
+        return self.connections[key]
+
+    def get_json(self, url):
+        """
+        GETs url and decodes the JSON body.
+
+        Returns:
+            tuple: (status code, decoded body or None)
+        """
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        for attempt in range(2):
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request(
+                    "GET",
+                    target,
+                    headers={"User-Agent": USER_AGENT, "Accept": "application/json"},
+                )
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed the idle connection, reconnect once
+                connection.close()
+                del self.connections[(parts.scheme, parts.netloc)]
+                if attempt:
+                    raise
+        self.requests += 1
+        METRICS.count("network_calls")
+        METRICS.count("bytes_fetched", len(body))
+
+        if response.status != 200:
+            return response.status, None
+        return response.status, json.loads(body.decode("utf-8"))
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
+
+
+class LookupCache:
+    """
+    SQLite cache of bibliographic records by provider and normalized ISBN.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        ttl (float): Seconds a found record stays valid.
+        not_found_ttl (float): Seconds a "not found" answer stays valid.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=90 * DAY, not_found_ttl=7 * DAY):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.hits = 0
+        self.not_found_hits = 0
+        self.misses = 0
+        # One connection shared by all threads, serialized by the lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lookups (
+                provider TEXT NOT NULL,
+                isbn TEXT NOT NULL,
+                record TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (provider, isbn)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get(self, provider, isbn):
+        """
+        Returns:
+            tuple: (hit, record). On a cached "not found" answer the record is None.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT record, fetched_at FROM lookups WHERE provider = ? AND isbn = ?",
+                (provider, isbn),
+            ).fetchone()
+            if row is not None:
+                record, fetched_at = row
+                ttl = self.ttl if record is not None else self.not_found_ttl
+                if time.time() - fetched_at < ttl:
+                    METRICS.count("lookup_cache_hits")
+                    if record is None:
+                        self.not_found_hits += 1
+                        return True, None
+                    self.hits += 1
+                    return True, json.loads(record)
+            self.misses += 1
+            METRICS.count("lookup_cache_misses")
+            return False, None
+
+    def put(self, provider, isbn, record):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO lookups (provider, isbn, record, fetched_at) VALUES (?, ?, ?, ?)",
+                (provider, isbn, None if record is None else json.dumps(record), time.time()),
+            )
+            self.connection.commit()
+
+    def invalidate(self, provider=None):
+        with self.lock:
+            if provider:
+                self.connection.execute("DELETE FROM lookups WHERE provider = ?", (provider,))
+            else:
+                self.connection.execute("DELETE FROM lookups")
+            self.connection.commit()
+
+    def stats(self):
+        lookups = self.hits + self.not_found_hits + self.misses
+        rate = 100 * (self.hits + self.not_found_hits) / lookups if lookups else 0
+        return (
+            f"ISBN lookup cache: {self.hits} hits, {self.not_found_hits} cached not found, "
+            f"{self.misses} misses ({rate:.0f}% hit rate)"
+        )
+
+    def close(self):
+        self.connection.close()
+
+
+def record_isbns(identifiers):
+    # Split industry identifiers into the ISBN_10/ISBN_13 fields of a record
+    record = {"isbn_10": None, "isbn_13": None}
+    for identifier in identifiers:
+        identifier = identifier.replace("-", "")
+        if len(identifier) == 10 and record["isbn_10"] is None:
+            record["isbn_10"] = identifier
+        elif len(identifier) == 13 and record["isbn_13"] is None:
+            record["isbn_13"] = identifier
+    return record
+
+
+class GoogleBooksProvider:
+    name = "google_books"
+
+    def __init__(self, base_url="https://www.googleapis.com/books/v1/volumes"):
+        self.base_url = base_url
+
+    def url(self, isbn):
+        return f"{self.base_url}?q=isbn:{isbn}"
+
+    def parse(self, obj):
+        items = (obj or {}).get("items") or []
+        if not items:
+            return None
+        info = items[0].get("volumeInfo", {})
+        categories = info.get("categories") or []
+        record = {
+            "title": info.get("title"),
+            "authors": info.get("authors") or [],
+            "subject": ", ".join(categories) or None,
+            "categories": categories,
+            "source": self.name,
+        }
+        record.update(
+            record_isbns(i.get("identifier", "") for i in info.get("industryIdentifiers", []))
+        )
+        return record
+
+
+class OpenLibraryProvider:
+    name = "open_library"
+
+    def __init__(self, base_url="https://openlibrary.org/search.json"):
+        self.base_url = base_url
+
+    def url(self, isbn):
+        return f"{self.base_url}?isbn={isbn}"
+
+    def parse(self, obj):
+        docs = (obj or {}).get("docs") or []
+        if not docs:
+            return None
+        doc = docs[0]
+        subjects = doc.get("subject") or []
+        record = {
+            "title": doc.get("title"),
+            "authors": doc.get("author_name") or [],
+            "subject": ", ".join(subjects[:5]) or None,
+            "categories": subjects[:10],
+            "source": self.name,
+        }
+        record.update(record_isbns(doc.get("isbn") or []))
+        return record
+
+
+class IsbnLookup:
+    """
+    Cached ISBN lookups over keep-alive sessions.
+
+    Every thread gets its own HttpSession, so lookups can run from a thread
+    pool while each thread still reuses its connections.
+
+    Args:
+        cache (LookupCache): Optional cache, without one every lookup hits the network.
+        session (HttpSession): HTTP session shared by all threads, per-thread
+            sessions by default.
+        timeout (float): Socket timeout of the per-thread sessions.
+    """
+
+    def __init__(self, cache=None, session=None, timeout=10):
+        self.cache = cache
+        self.shared_session = session
+        self.timeout = timeout
+        self.sessions = []
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        if self.shared_session is not None:
+            return self.shared_session
+        if not hasattr(self.local, "session"):
+            self.local.session = HttpSession(self.timeout)
+            self.sessions.append(self.local.session)
+        return self.local.session
+
+    @property
+    def requests(self):
+        sessions = [self.shared_session] if self.shared_session else self.sessions
+        return sum(session.requests for session in sessions)
+
+    def lookup(self, provider, isbn):
+        """
+        Looks up a normalized ISBN with one provider.
+
+        Returns:
+            dict: The bibliographic record, or None if the provider does not know the ISBN.
+        """
+        if self.cache is not None:
+            hit, record = self.cache.get(provider.name, isbn)
+            if hit:
+                return record
+
+        with METRICS.stage("http_lookup"):
+            status, obj = self.session.get_json(provider.url(isbn))
+        if status not in (200, 404):
+            raise IOError(f"{provider.name} answered with HTTP {status} for {isbn}")
+        record = provider.parse(obj)
+
+        if self.cache is not None:
+            self.cache.put(provider.name, isbn, record)
+        return record
+
+    def close(self):
+        for session in self.sessions + [self.shared_session]:
+            if session is not None:
+                session.close()
+        if self.cache is not None:
+            self.cache.close()
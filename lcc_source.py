@@ -0,0 +1,185 @@
+"""
+Local snapshot store for the Wikipedia page the LCC outline is parsed from.
+
+A snapshot keeps the page text together with its revision id and fetch time.
+Runs only do a cheap revision check against the MediaWiki API and download
+the full page when the revision changed. With offline mode or a TTL no
+network request is made at all.
+"""
+
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+
+from metrics import METRICS
+
+PAGE_TITLE = "Library of Congress Classification"
+USER_AGENT = "LCC(merlin@example.com)"
+API_URL = "https://{language}.wikipedia.org/w/api.php"
+
+
+class SnapshotStore:
+    """
+    Directory of page snapshots, one JSON file per page and language.
+
+    Args:
+        directory (str): Directory the snapshots are stored in.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, title, language):
+        slug = title.replace(" ", "_").replace("/", "_")
+        return os.path.join(self.directory, f"{language}-{slug}.json")
+
+    def load(self, title, language="en"):
+        """
+        Loads a snapshot.
+
+        Returns:
+            dict: The snapshot with title, language, revision_id, fetched_at and
+            text, or None if there is none.
+        """
+        try:
+            with open(self.path(title, language), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, snapshot):
+        # Write through a temp file, so an interrupted run never leaves a broken snapshot
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(snapshot["title"], snapshot["language"])
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def load_source_file(file_path):
+    """
+    Loads page text from a saved snapshot JSON or a plain text dump of the page.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: The page text.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        content = file.read()
+    if file_path.endswith(".json"):
+        return json.loads(content)["text"]
+    return content
+
+
+def iter_source_lines(file_path):
+    """
+    Yields the lines of a saved snapshot or plain text dump of the page.
+
+    Plain text files are streamed line by line from the open file handle.
+    """
+    if file_path.endswith(".json"):
+        yield from load_source_file(file_path).splitlines(keepends=True)
+        return
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        yield from file
+
+
+def fetch_revision_id(title, language="en"):
+    """
+    Asks the MediaWiki API for the latest revision id of a page, without its text.
+
+    Returns:
+        int: The revision id, or None if the page does not exist.
+    """
+    query = urllib.parse.urlencode(
+        {"action": "query", "prop": "info", "titles": title, "format": "json"}
+    )
+    request = urllib.request.Request(
+        API_URL.format(language=language) + "?" + query,
+        headers={"User-Agent": USER_AGENT},
+    )
+    with METRICS.stage("fetch"), urllib.request.urlopen(request) as f:
+        body = f.read()
+    METRICS.count("network_calls")
+    METRICS.count("bytes_fetched", len(body))
+    obj = json.loads(body.decode("utf-8"))
+
+    for page in obj["query"]["pages"].values():
+        return page.get("lastrevid")
+    return None
+
+
+def download_page(title, language="en"):
+    """
+    Downloads the full page text with Wikipedia-API.
+
+    Returns:
+        dict: A snapshot of the page.
+    """
+    import wikipediaapi
+
+    with METRICS.stage("fetch"):
+        wiki_wiki = wikipediaapi.Wikipedia(
+            user_agent=USER_AGENT,
+            language=language,
+            extract_format=wikipediaapi.ExtractFormat.WIKI,
+        )
+        p_wiki = wiki_wiki.page(title)
+        snapshot = {
+            "title": title,
+            "language": language,
+            "revision_id": p_wiki.lastrevid,
+            "fetched_at": time.time(),
+            "text": p_wiki.text,
+        }
+    METRICS.count("network_calls")
+    METRICS.count("bytes_fetched", len(snapshot["text"].encode("utf-8")))
+    return snapshot
+
+
+def get_page_text(store=None, offline=False, ttl=None, title=PAGE_TITLE, language="en"):
+    """
+    Returns the page text, from the snapshot store where possible.
+
+    Args:
+        store (SnapshotStore): Snapshot store, without one the page is always downloaded.
+        offline (bool): Never touch the network, fail if there is no snapshot.
+        ttl (float): Snapshots younger than this many seconds are used unchecked.
+        title (str): Title of the Wikipedia page.
+        language (str): Language edition of Wikipedia.
+
+    Returns:
+        str: The page text.
+    """
+    if store is None:
+        return download_page(title, language)["text"]
+
+    snapshot = store.load(title, language)
+
+    if offline:
+        if snapshot is None:
+            raise FileNotFoundError(
+                f"No snapshot of '{title}' in {store.directory}, run once without --offline"
+            )
+        METRICS.count("snapshot_hits")
+        return snapshot["text"]
+
+    if snapshot is not None:
+        if ttl is not None and time.time() - snapshot["fetched_at"] < ttl:
+            METRICS.count("snapshot_hits")
+            return snapshot["text"]
+
+        if fetch_revision_id(title, language) == snapshot["revision_id"]:
+            snapshot["fetched_at"] = time.time()
+            store.save(snapshot)
+            METRICS.count("snapshot_hits")
+            return snapshot["text"]
+
+    snapshot = download_page(title, language)
+    store.save(snapshot)
+    return snapshot["text"]
@@ -0,0 +1,222 @@
+"""
+Asynchronous multi-provider metadata resolver.
+
+Every ISBN is sent to several providers (Google Books and Open Library by
+default) concurrently. Each provider has its own timeout and concurrency
+limit, so a slow provider no longer sets the latency for the whole batch.
+With the "first" strategy the first good answer wins, optionally as a hedged
+request: the next provider is only asked once the previous one did not
+answer within hedge_delay seconds. With "merge" all answers are combined.
+
+The HTTP requests themselves run on threads through IsbnLookup, which keeps
+the SQLite cache and keep-alive connections in place. A request that timed out
+keeps its thread and its place in the provider's limit until it returns, so
+the limit holds for the requests really in flight.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from isbn_lookup import GoogleBooksProvider, IsbnLookup, OpenLibraryProvider
+
+STRATEGIES = ("first", "merge")
+
+
+class ProviderSlot:
+    """
+    A provider together with its timeout, concurrency limit and counters.
+
+    Args:
+        provider (object): GoogleBooksProvider, OpenLibraryProvider or alike.
+        timeout (float): Seconds to wait for one answer.
+        concurrency (int): Maximum number of requests in flight.
+    """
+
+    def __init__(self, provider, timeout=10.0, concurrency=4):
+        self.provider = provider
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # Held by the thread for the whole request, also after the caller gave up
+        self.limit = threading.BoundedSemaphore(concurrency)
+        self.semaphore = None
+        self.answers = 0
+        self.wins = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @property
+    def name(self):
+        return self.provider.name
+
+    def stats(self):
+        return (
+            f"{self.name}: {self.answers} answers, {self.wins} used, "
+            f"{self.timeouts} timeouts, {self.errors} errors"
+        )
+
+
+def default_providers(google_books_url=None, open_library_url=None, timeout=10.0, concurrency=4):
+    google_books = GoogleBooksProvider(google_books_url) if google_books_url else GoogleBooksProvider()
+    open_library = OpenLibraryProvider(open_library_url) if open_library_url else OpenLibraryProvider()
+    return [
+        ProviderSlot(google_books, timeout, concurrency),
+        ProviderSlot(open_library, timeout, concurrency),
+    ]
+
+
+def merge_records(records):
+    """
+    Merges records in provider order: the first non-empty value of every field
+    wins, categories are combined.
+    """
+    merged = {}
+    categories = []
+    for record in records:
+        for key, value in record.items():
+            if key == "categories":
+                categories += [c for c in value if c not in categories]
+            elif merged.get(key) in (None, "", []):
+                merged[key] = value
+    merged["categories"] = categories
+    merged["source"] = "+".join(record["source"] for record in records)
+    return merged
+
+
+class MetadataResolver:
+    """
+    Args:
+        providers (list): ProviderSlots in order of preference.
+        lookup (IsbnLookup): Cached lookups, a new uncached one by default.
+        strategy (str): "first" or "merge".
+        hedge_delay (float): With "first", seconds before the next provider is
+            asked as well. None asks all providers at once.
+        max_files (int): Number of files resolved concurrently.
+    """
+
+    def __init__(self, providers=None, lookup=None, strategy="first", hedge_delay=None, max_files=16):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', choose from {', '.join(STRATEGIES)}")
+        self.providers = providers or default_providers()
+        self.lookup = lookup or IsbnLookup()
+        self.strategy = strategy
+        self.hedge_delay = hedge_delay
+        self.max_files = max_files
+        # Every provider can have its limit in flight, timed out or not, and as
+        # many requests waiting for a place
+        self.executor = ThreadPoolExecutor(max_workers=2 * sum(slot.concurrency for slot in self.providers))
+
+    @staticmethod
+    def call(lookup, slot, isbn):
+        # Runs on the executor
+        with slot.limit:
+            return lookup.lookup(slot.provider, isbn)
+
+    async def ask(self, slot, isbn):
+        # One provider, one ISBN, bounded by the provider's limit and timeout
+        loop = asyncio.get_running_loop()
+        async with slot.semaphore:
+            try:
+                record = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, self.call, self.lookup, slot, isbn),
+                    slot.timeout,
+                )
+            except asyncio.TimeoutError:
+                slot.timeouts += 1
+                return None
+            except Exception:
+                slot.errors += 1
+                return None
+        if record is not None:
+            slot.answers += 1
+        return record
+
+    async def resolve_isbn(self, isbn):
+        if self.strategy == "merge":
+            records = await asyncio.gather(*(self.ask(slot, isbn) for slot in self.providers))
+            found = [(slot, r) for slot, r in zip(self.providers, records) if r is not None]
+            for slot, _ in found:
+                slot.wins += 1
+            return merge_records([r for _, r in found]) if found else None
+
+        pending = {}
+        try:
+            for slot in self.providers:
+                pending[asyncio.ensure_future(self.ask(slot, isbn))] = slot
+                # Hedge: only start the next provider if nobody answered in time
+                wait = self.hedge_delay if slot is not self.providers[-1] else None
+                if self.hedge_delay is None:
+                    continue
+                record = await self.first_answer(pending, timeout=wait)
+                if record is not None:
+                    return record
+
+            return await self.first_answer(pending)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def first_answer(self, pending, timeout=None):
+        """
+        Waits for the first task in pending with a record, removing finished tasks.
+
+        Returns:
+            dict: The record, or None if no task delivered one in time.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while pending:
+            remaining = None if deadline is None else max(0, deadline - loop.time())
+            done, _ = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                return None
+            # Prefer the provider that comes first in the list
+            for task in sorted(done, key=lambda t: self.providers.index(pending[t])):
+                slot = pending.pop(task)
+                record = task.result()
+                if record is not None:
+                    slot.wins += 1
+                    return record
+        return None
+
+    async def resolve(self, isbns):
+        """Returns the record of the first ISBN any provider knows, or None."""
+        for isbn in isbns:
+            record = await self.resolve_isbn(isbn)
+            if record is not None:
+                return record
+        return None
+
+    async def resolve_many(self, isbn_lists):
+        # Semaphores belong to the running event loop, so they are made per batch
+        for slot in self.providers:
+            slot.semaphore = asyncio.Semaphore(slot.concurrency)
+        files = asyncio.Semaphore(self.max_files)
+
+        async def resolve_file(isbns):
+            async with files:
+                return await self.resolve(isbns)
+
+        return await asyncio.gather(*(resolve_file(isbns) for isbns in isbn_lists))
+
+    def resolve_batch(self, isbn_lists):
+        """
+        Resolves a batch of files.
+
+        Args:
+            isbn_lists (list): One list of normalized ISBNs per file.
+
+        Returns:
+            list: One record (or None) per file, in the same order.
+        """
+        return asyncio.run(self.resolve_many(isbn_lists))
+
+    def stats(self):
+        return "; ".join(slot.stats() for slot in self.providers)
+
+    def close(self):
+        """Waits for the requests still running, then closes the lookup and its cache."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.lookup.close()
@@ -0,0 +1,174 @@
+"""
+Wall and CPU time per stage of a run, plus counters.
+
+Stages are named sections of a run: fetch, parse, translate, yaml_io,
+folder_plan, mkdir_walk, scan, pdf_parse, isbn_extraction, http_lookup, ...
+Counters count things like network calls, bytes fetched, mkdir, scandir and
+stat calls, pages extracted and cache hits. Both are collected in the
+process-wide METRICS object.
+
+METRICS is off by default. stage() then returns a shared no-op context manager
+and count() only checks a flag, so instrumented code costs next to nothing.
+Entry points add the --profile, --metrics-json and --cprofile options with
+add_arguments() and run their work inside measured(args).
+
+CPU time is the CPU time of the whole process while a stage ran. Nested stages
+are counted in both stages. Stages entered from several threads at once add
+up, so their wall time can exceed the wall time of the run.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+
+NULL_STAGE = contextlib.nullcontext()
+PROFILE_LINES = 25
+
+
+class Stage:
+    __slots__ = ("metrics", "name", "wall", "cpu")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # name -> [calls, wall seconds, cpu seconds]
+        self.stages = {}
+        self.counters = {}
+
+    def stage(self, name):
+        """Returns a context manager timing one run of a stage."""
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, wall, cpu):
+        with self.lock:
+            totals = self.stages.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: "stages" with calls, wall and cpu seconds per stage, and "counters".
+        """
+        with self.lock:
+            return {
+                "stages": {
+                    name: {"calls": calls, "wall": round(wall, 6), "cpu": round(cpu, 6)}
+                    for name, (calls, wall, cpu) in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot):
+        # Adds the snapshot of another process, e.g. a PDF extraction worker
+        with self.lock:
+            for name, stage in snapshot["stages"].items():
+                totals = self.stages.setdefault(name, [0, 0.0, 0.0])
+                totals[0] += stage["calls"]
+                totals[1] += stage["wall"]
+                totals[2] += stage["cpu"]
+            for name, amount in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        snapshot = self.snapshot()
+        lines = [f"{'stage':24s} {'calls':>8s} {'wall':>10s} {'cpu':>10s}"]
+        for name, stage in snapshot["stages"].items():
+            lines.append(f"{name:24s} {stage['calls']:8d} {stage['wall']:9.3f}s {stage['cpu']:9.3f}s")
+        if snapshot["counters"]:
+            lines.append("")
+            lines.extend(f"{name:24s} {amount:>8}" for name, amount in sorted(snapshot["counters"].items()))
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall and CPU time per stage and the counters of the run.",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="PATH",
+        help="Write the stage timings and counters of the run to a JSON file.",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="PATH",
+        help="Run under cProfile and dump the statistics to PATH, printed with --profile.",
+    )
+
+
+def profile_summary(profiler, lines=PROFILE_LINES):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(lines)
+    return stream.getvalue()
+
+
+@contextlib.contextmanager
+def measured(args):
+    """
+    Collects metrics while the block runs, if any of the options of
+    add_arguments() is set, and reports them at the end.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments with profile, metrics_json and cprofile.
+    """
+    if not (args.profile or args.metrics_json or args.cprofile):
+        yield METRICS
+        return
+
+    METRICS.reset()
+    METRICS.enabled = True
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with METRICS.stage("total"):
+            yield METRICS
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        METRICS.enabled = False
+
+        if args.profile:
+            print(METRICS.report())
+            if profiler is not None:
+                print(profile_summary(profiler))
+        if args.metrics_json:
+            with open(args.metrics_json, "w", encoding="utf-8") as file:
+                json.dump(METRICS.snapshot(), file, indent=2)
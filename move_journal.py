@@ -0,0 +1,126 @@
+"""
+Append-only journal of file moves, so an interrupted batch can be resumed.
+
+Every move is written as a "planned" record before it happens and as a "done"
+or "failed" record afterwards, one JSON object per line. After a crash,
+recover() compares the unfinished moves with the file system and repairs
+half-done ones. It never removes a move's target, only the ".partial" copy a
+move across file systems leaves behind.
+"""
+
+import json
+import os
+
+# Suffix of the copy a move across file systems writes before renaming it into place
+PARTIAL = ".partial"
+
+
+class MoveJournal:
+    """
+    Args:
+        path (str): Path of the journal file, appended to if it exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A line cut off by a crash must not swallow the next record
+        cut_off = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                cut_off = f.read(1) != b"\n"
+        self.file = open(path, "a", encoding="utf-8")
+        if cut_off:
+            self.file.write("\n")
+
+    def write(self, records, sync=False):
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def plan(self, moves):
+        """Records (src, dst) moves as planned. Synced, the moves may happen right after."""
+        self.write(({"state": "planned", "src": src, "dst": dst} for src, dst in moves), sync=True)
+
+    def done(self, moves):
+        self.write({"state": "done", "src": src, "dst": dst} for src, dst in moves)
+
+    def failed(self, moves):
+        """Records (src, dst) moves that raised, so recover() leaves them alone."""
+        self.write({"state": "failed", "src": src, "dst": dst} for src, dst in moves)
+
+    def states(self):
+        # Last state of every move, in the order the moves were first planned
+        last = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut off by the crash
+                    continue
+                last[(record["src"], record["dst"])] = record["state"]
+        return last
+
+    def unfinished(self):
+        """Returns the (src, dst) moves that were planned but never marked done."""
+        return [move for move, state in self.states().items() if state == "planned"]
+
+    def rollback(self, move=os.rename):
+        """
+        Moves every completed move back, newest first.
+
+        Returns:
+            list: (src, dst, outcome) for every completed move.
+        """
+        self.recover()
+        outcomes = []
+        for src, dst in reversed([m for m, state in self.states().items() if state == "done"]):
+            if os.path.exists(src):
+                outcome = "source exists"
+            elif not os.path.exists(dst):
+                outcome = "missing"
+            else:
+                move(dst, src)
+                outcome = "rolled back"
+            outcomes.append((src, dst, outcome))
+            self.write([{"state": outcome, "src": src, "dst": dst}])
+        return outcomes
+
+    def recover(self):
+        """
+        Repairs unfinished moves.
+
+        A move whose source is gone and whose target exists is complete. A
+        ".partial" copy next to the target is removed, so the file is picked
+        up again by the next scan. A target next to a still existing source is
+        not the moved file and left alone.
+
+        Returns:
+            list: (src, dst, outcome) for every unfinished move.
+        """
+        outcomes = []
+        for src, dst in self.unfinished():
+            src_exists, dst_exists = os.path.exists(src), os.path.exists(dst)
+            if os.path.exists(dst + PARTIAL):
+                os.remove(dst + PARTIAL)
+                outcome = "undone"
+            elif dst_exists and not src_exists:
+                outcome = "done"
+            elif dst_exists:
+                outcome = "target exists"
+            elif src_exists:
+                outcome = "not moved"
+            else:
+                outcome = "missing"
+            outcomes.append((src, dst, outcome))
+            self.write([{"state": outcome, "src": src, "dst": dst}])
+        return outcomes
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,131 @@
+"""
+Single-pass streaming parser for classification outlines.
+
+Lines are read from any iterable (a list, a generator or an open file handle),
+the start and end markers are detected on the fly and class and subclass
+records are yielded one by one. Apart from the resulting dictionary nothing
+grows with the size of the input.
+"""
+
+import io
+import re
+from collections import defaultdict
+
+START_MARKER = "Full classification outline"
+END_MARKER = "Subclass ZA – Information resources/materials"
+
+# Matches class and subclass lines in one go. The class code keeps the
+# whitespace after "Class" (" A"), as the keys of already saved YAML files do.
+OUTLINE_LINE = re.compile(r"(Class|Subclasses|Subclass)(\s.*?) – (.*)")
+MALFORMED_LINE = re.compile(r"(Class|Subclasses|Subclass) ")
+
+
+def iter_outline_lines(lines, start_marker=START_MARKER, end_marker=END_MARKER):
+    """
+    Yields the lines between the start and the end marker.
+
+    The line containing the start marker is yielded from the marker on, the
+    line containing the end marker up to and including the marker. Without
+    markers every line is yielded.
+
+    Args:
+        lines (iterable): Lines of the page, with or without line endings.
+        start_marker (str): Text the outline starts with, None to start at once.
+        end_marker (str): Text the outline ends with, None to read to the end.
+    """
+    started = start_marker is None
+    for line in lines:
+        if not started:
+            index = line.find(start_marker)
+            if index == -1:
+                continue
+            started = True
+            line = line[index:]
+
+        if end_marker is not None:
+            index = line.find(end_marker)
+            if index != -1:
+                yield line[: index + len(end_marker)]
+                return
+
+        yield line
+
+
+def iter_outline_records(lines, start_marker=START_MARKER, end_marker=END_MARKER):
+    """
+    Yields a record for every class and subclass line of the outline.
+
+    Records are plain (kind, code, description, parent) tuples, kind being
+    "class" or "subclass" and parent the code of the enclosing class.
+
+    Args:
+        lines (iterable): Lines of the page, with or without line endings.
+        start_marker (str): See iter_outline_lines.
+        end_marker (str): See iter_outline_lines.
+    """
+    match_line = OUTLINE_LINE.match
+    started = start_marker is None
+    current_class = None
+
+    for line in lines:
+        if not started:
+            index = line.find(start_marker)
+            if index == -1:
+                continue
+            started = True
+            line = line[index:]
+
+        line = line.strip()
+        match = match_line(line)
+        if match is not None:
+            kind, code, description = match.groups()
+            if kind == "Class":
+                current_class = code
+                yield ("class", code, description, None)
+            else:
+                yield ("subclass", code[1:], description, current_class)
+        elif MALFORMED_LINE.match(line):
+            kind = "Class" if line.startswith("Class") else "Subclass"
+            print(f"Warning: {kind} line not in expected format: '{line}'")
+
+        if end_marker is not None and end_marker in line:
+            return
+
+
+def build_classification_dict(records):
+    """
+    Builds the classification dictionary from outline records.
+
+    Args:
+        records (iterable): Records as yielded by iter_outline_records.
+
+    Returns:
+        defaultdict: {class: {"description": ..., "subclasses": {code: description}}}
+    """
+    classification_dict = defaultdict(dict)
+    for kind, code, description, parent in records:
+        if kind == "class":
+            classification_dict[code] = {
+                "description": description,
+                "subclasses": {},
+            }
+        else:
+            classification_dict[parent].setdefault("subclasses", {})[code] = description
+    return classification_dict
+
+
+def parse_outline(lines, start_marker=START_MARKER, end_marker=END_MARKER):
+    """
+    Trims and parses an outline in a single pass.
+
+    Args:
+        lines (iterable or str): Lines of the page, a string is split into lines.
+
+    Returns:
+        defaultdict: The classification dictionary.
+    """
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+    return build_classification_dict(
+        iter_outline_records(lines, start_marker, end_marker)
+    )
@@ -0,0 +1,228 @@
+"""
+Metadata-only updates of PDF files.
+
+Changing a few Info dictionary entries does not need the pages. The new Info
+dictionary is appended to the file as an incremental update (ISO 32000-1,
+7.5.6), followed by a small cross-reference section that points to it and to
+the previous section. The original bytes stay untouched, only the cross
+reference table and trailer are read, nothing is re-serialized.
+
+By default the file is copied to a temporary file next to it (a kernel-side
+copy, nothing is parsed or held in memory), the update is appended and the
+copy is renamed over the original, so an interrupted run never leaves a
+half-written PDF. In place, only the update itself is written.
+"""
+
+import io
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, create_string_object
+
+from metrics import METRICS
+
+# startxref is in the last few hundred bytes, this leaves room for trailing junk
+TAIL_SIZE = 4096
+STARTXREF = re.compile(rb"startxref\s+(\d+)")
+# Cross-reference stream fields: type, offset, generation
+XREF_WIDTHS = (1, 8, 2)
+
+
+class PdfUpdateError(Exception):
+    """Raised for PDFs that can't be updated incrementally, e.g. encrypted ones."""
+
+
+def last_startxref(file):
+    """
+    Returns:
+        tuple: (offset of the newest cross-reference section, file size,
+        True if the file ends with a line break)
+    """
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(max(0, size - TAIL_SIZE))
+    tail = file.read()
+    offsets = STARTXREF.findall(tail)
+    if not offsets:
+        raise PdfUpdateError("no startxref at the end of the file")
+    return int(offsets[-1]), size, tail.endswith((b"\n", b"\r"))
+
+
+def is_xref_stream(file, offset):
+    # A classic section starts with the "xref" keyword, a stream with "N G obj"
+    file.seek(offset)
+    return not file.read(64).lstrip().startswith(b"xref")
+
+
+def serialize(obj):
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
+
+
+def build_update(reader, entries, start, previous_xref, xref_stream):
+    """
+    Builds the bytes of an incremental update replacing the Info dictionary.
+
+    Args:
+        reader (PdfReader): The opened PDF.
+        entries (dict): Info keys ("/Title") to values, None values keep the old entry.
+        start (int): Offset the update will be written at.
+        previous_xref (int): Offset of the newest cross-reference section.
+        xref_stream (bool): Write a cross-reference stream instead of a table,
+            as files using streams may not be readable by table-only readers.
+
+    Returns:
+        bytes: The update, or None if no entry changes.
+    """
+    trailer = reader.trailer
+    if "/Encrypt" in trailer:
+        raise PdfUpdateError("encrypted PDFs are not updated")
+    size = int(trailer["/Size"])
+
+    old_info = trailer["/Info"].get_object() if "/Info" in trailer else None
+    info = DictionaryObject()
+    if isinstance(old_info, DictionaryObject):
+        info.update(old_info.items())
+    changed = False
+    for key, value in entries.items():
+        if value is None or value == "":
+            continue
+        value = create_string_object(str(value))
+        if info.get(key) != value:
+            info[NameObject(key)] = value
+            changed = True
+    if not changed:
+        return None
+
+    # The Info object keeps its number, a direct or missing one gets a new number
+    info_ref = trailer.raw_get("/Info") if "/Info" in trailer else None
+    if isinstance(info_ref, IndirectObject):
+        info_id, generation = info_ref.idnum, info_ref.generation
+    else:
+        info_id, generation = size, 0
+        size += 1
+
+    out = bytearray()
+    offsets = {info_id: (start, generation)}
+    out += b"%d %d obj\n" % (info_id, generation) + serialize(info) + b"\nendobj\n"
+
+    new_trailer = DictionaryObject()
+    new_trailer[NameObject("/Root")] = trailer.raw_get("/Root")
+    new_trailer[NameObject("/Info")] = IndirectObject(info_id, generation, None)
+    if "/ID" in trailer:
+        new_trailer[NameObject("/ID")] = trailer.raw_get("/ID")
+    new_trailer[NameObject("/Prev")] = NumberObject(previous_xref)
+
+    xref_offset = start + len(out)
+    if xref_stream:
+        xref_id = size
+        size += 1
+        offsets[xref_id] = (xref_offset, 0)
+        rows = sorted(offsets.items())
+        data = b"".join(
+            (1).to_bytes(XREF_WIDTHS[0], "big")
+            + offset.to_bytes(XREF_WIDTHS[1], "big")
+            + gen.to_bytes(XREF_WIDTHS[2], "big")
+            for _, (offset, gen) in rows
+        )
+        new_trailer[NameObject("/Type")] = NameObject("/XRef")
+        new_trailer[NameObject("/Size")] = NumberObject(size)
+        new_trailer[NameObject("/Index")] = ArrayObject(
+            [NumberObject(value) for object_id, _ in rows for value in (object_id, 1)]
+        )
+        new_trailer[NameObject("/W")] = ArrayObject([NumberObject(width) for width in XREF_WIDTHS])
+        new_trailer[NameObject("/Length")] = NumberObject(len(data))
+        out += b"%d 0 obj\n" % xref_id + serialize(new_trailer) + b"\nstream\n" + data + b"\nendstream\nendobj\n"
+    else:
+        new_trailer[NameObject("/Size")] = NumberObject(size)
+        # Starting with the free head entry keeps readers from "correcting" a table not starting at 0
+        out += b"xref\n0 1\n0000000000 65535 f \n"
+        for object_id, (offset, gen) in sorted(offsets.items()):
+            out += b"%d 1\n%010d %05d n \n" % (object_id, offset, gen)
+        out += b"trailer\n" + serialize(new_trailer) + b"\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+    return bytes(out)
+
+
+def write_update(path, update, atomic=True):
+    # The update is written with a single write and synced before it replaces anything
+    if not atomic:
+        with open(path, "ab") as file:
+            file.write(update)
+            file.flush()
+            os.fsync(file.fileno())
+        return
+
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{name}.update-tmp")
+    try:
+        shutil.copyfile(path, tmp_path)
+        shutil.copymode(path, tmp_path)
+        with open(tmp_path, "ab") as file:
+            file.write(update)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def update_info(path, entries, atomic=True):
+    """
+    Sets Info dictionary entries of a PDF with an incremental update.
+
+    Args:
+        path (str): The PDF.
+        entries (dict): Info keys ("/Title") to values, None values keep the old entry.
+        atomic (bool): Write through a temporary copy and rename instead of
+            appending to the file in place.
+
+    Returns:
+        int: Bytes of the update, 0 if nothing changed.
+
+    Raises:
+        PdfUpdateError: For PDFs that can't be updated incrementally.
+    """
+    with METRICS.stage("pdf_write"):
+        # A file object keeps PdfReader from reading the whole file into memory
+        with open(path, "rb") as file:
+            previous_xref, size, ends_with_newline = last_startxref(file)
+            xref_stream = is_xref_stream(file, previous_xref)
+            separator = b"" if ends_with_newline else b"\n"
+            reader = PdfReader(file)
+            update = build_update(reader, entries, size + len(separator), previous_xref, xref_stream)
+        if update is None:
+            return 0
+        write_update(path, separator + update, atomic)
+    METRICS.count("pdf_update_bytes", len(separator) + len(update))
+    return len(separator) + len(update)
+
+
+def update_many(updates, atomic=True, workers=1):
+    """
+    Applies update_info to many PDFs, optionally on a thread pool.
+
+    Args:
+        updates (list): (path, entries) tuples.
+
+    Returns:
+        list: (path, bytes written or None, error or None) in the order of updates.
+    """
+
+    def apply(update):
+        path, entries = update
+        try:
+            return path, update_info(path, entries, atomic), None
+        except Exception as error:
+            return path, None, f"{type(error).__name__}: {error}"
+
+    if workers > 1 and len(updates) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(apply, updates))
+    return [apply(update) for update in updates]
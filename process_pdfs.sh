@@ -1,13 +1,18 @@
 #!/bin/bash
 
+# Interactive, one python3 run per file. For large inboxes use ingest_pdfs.py,
+# which files a whole inbox in one process and only asks about uncertain files.
+
 # Check for required arguments
-if [ "$#" -ne 2 ]; then
-  echo "Usage: $0 <target_directory> <destination_directory>"
+if [ "$#" -lt 2 ] || [ "$#" -gt 3 ]; then
+  echo "Usage: $0 <target_directory> <destination_directory> [classification_file]"
   exit 1
 fi
 
 TARGET_DIR="$1"
 DEST_DIR="$2"
+# Optional outline or YAML scheme; confident matches are then moved without asking
+CLASSIFICATION="$3"
 PYTHON_SCRIPT="/home/fabian/Projects/316 Classification Structure Creator/°~ DEV/classification-structure-creator/automatic_pdf_sorter.py"
 
 # Verify the target directory exists
@@ -33,10 +38,21 @@ find "$TARGET_DIR" -type f -name '*.pdf' | while IFS= read -r pdf_file; do
   echo "Processing: $pdf_file"
 
   # Run the python script with the PDF file as an argument
-  python3 "$PYTHON_SCRIPT" -f "$pdf_file"
-  
-  # Use fzf to select the destination directory
-  destination=$(find "$DEST_DIR" -type d | fzf --prompt="Select destination directory for $pdf_file: ")
+  destination=""
+  candidates=""
+  if [ -n "$CLASSIFICATION" ]; then
+    output=$(python3 "$PYTHON_SCRIPT" -f "$pdf_file" -c "$CLASSIFICATION" -d "$DEST_DIR")
+    candidates=$(printf '%s\n' "$output" | sed -n 's/^candidates: //p')
+    # Folder of a confident class, looked up in the destination index
+    destination=$(printf '%s\n' "$output" | sed -n 's/^destination: //p')
+  else
+    python3 "$PYTHON_SCRIPT" -f "$pdf_file"
+  fi
+
+  # Use fzf to select the destination directory, only if no class was certain
+  if [ -z "$destination" ]; then
+    destination=$(find "$DEST_DIR" -type d | fzf --prompt="Select destination directory for $pdf_file: " --header="Suggested classes: $candidates")
+  fi
 
   # Move the PDF file to the selected destination directory
   if [ -n "$destination" ]; then
@@ -0,0 +1,294 @@
+"""
+Incremental scan index of PDF libraries.
+
+Every file seen by a scan is kept in a SQLite database together with its size,
+mtime, an optional content hash and whatever metadata was extracted from it.
+Re-running a scan only reports new or changed files as such; unchanged files
+come back with their stored metadata, so they do not have to be opened again.
+
+Directories are indexed with their mtime as well. A directory whose mtime has
+not changed since the last scan has had no entries added, removed or renamed,
+so its listing is taken from the index instead of the file system. Files that
+are modified in place inside such a directory are only noticed by a full scan.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from metrics import METRICS
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "classification-structure-creator", "scan_index.sqlite"
+)
+# Keys describing the file itself, everything else in a file dict is metadata
+FILE_KEYS = ("filepath", "filename", "size", "mtime_ns", "hash", "indexed")
+# A directory changed this close to the scan might change again within the
+# same mtime tick, so its mtime is not trusted on the next run
+RACY_WINDOW_NS = 2 * 10**9
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_files(root):
+    """
+    Walks root with os.scandir, without an index.
+
+    Yields:
+        tuple: (directory, os.DirEntry) for every regular file.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        METRICS.count("scandir_calls")
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield directory, entry
+        except OSError:
+            continue
+
+
+def subtree_range(path):
+    # Rows below path sort between "path/" and "path0" ("0" follows "/")
+    return path + os.sep, path + chr(ord(os.sep) + 1)
+
+
+class ScanIndex:
+    """
+    Args:
+        path (str): Path of the SQLite database file.
+        use_hash (bool): Hash new and changed files. A file whose size and
+            mtime changed but whose content did not keeps its metadata, and
+            moved files are recognized by their hash.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, use_hash=False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.use_hash = use_hash
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT,
+                metadata TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+            CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+            """
+        )
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.unchanged = 0
+        self.changed = 0
+        self.removed = 0
+        self.listed_dirs = 0
+        self.pruned_dirs = 0
+
+    def stored_files(self, directory):
+        return {
+            row[0]: row[1:]
+            for row in self.connection.execute(
+                "SELECT path, size, mtime_ns, hash, metadata FROM files WHERE dir = ?", (directory,)
+            )
+        }
+
+    def stored_subdirs(self, directory):
+        return [
+            row[0]
+            for row in self.connection.execute("SELECT path FROM dirs WHERE parent = ?", (directory,))
+        ]
+
+    def forget_subtree(self, path):
+        low, high = subtree_range(path)
+        self.connection.execute(
+            "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high)
+        )
+        self.removed += self.connection.execute(
+            "DELETE FROM files WHERE path >= ? AND path < ?", (low, high)
+        ).rowcount
+
+    def metadata_by_hash(self, content_hash, size):
+        row = self.connection.execute(
+            "SELECT metadata FROM files WHERE hash = ? AND size = ? AND metadata IS NOT NULL LIMIT 1",
+            (content_hash, size),
+        ).fetchone()
+        return row[0] if row else None
+
+    def scan(self, root, full=False):
+        """
+        Scans root and updates the index.
+
+        Args:
+            root (str): Directory to scan.
+            full (bool): List every directory and stat every file, even in
+                directories that did not change since the last scan.
+
+        Returns:
+            list: One dict per file with "filepath", "filename", "size",
+                "mtime_ns" and "indexed". Unchanged files ("indexed": True)
+                also carry the metadata recorded for them.
+        """
+        root = os.path.abspath(root)
+        self.reset_stats()
+        started_ns = time.time_ns()
+        files = []
+        # Deleted only at the end, so moved files can still be found by hash
+        vanished_files = []
+        stack = [(root, os.stat(root).st_mtime_ns, None)]
+        stat_calls = 1
+        while stack:
+            directory, mtime_ns, parent = stack.pop()
+            row = self.connection.execute(
+                "SELECT mtime_ns FROM dirs WHERE path = ?", (directory,)
+            ).fetchone()
+
+            if row is not None and row[0] == mtime_ns and not full:
+                self.pruned_dirs += 1
+                for path, (size, file_mtime_ns, content_hash, metadata) in self.stored_files(directory).items():
+                    files.append(self.file_dict(path, size, file_mtime_ns, content_hash, metadata))
+                    self.unchanged += 1
+                for subdir in self.stored_subdirs(directory):
+                    stat_calls += 1
+                    try:
+                        stack.append((subdir, os.stat(subdir).st_mtime_ns, directory))
+                    except OSError:
+                        self.forget_subtree(subdir)
+                continue
+
+            self.listed_dirs += 1
+            stored = self.stored_files(directory)
+            known_subdirs = set(self.stored_subdirs(directory))
+            updates = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        stat_calls += 1
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, entry.stat(follow_symlinks=False).st_mtime_ns, directory))
+                            known_subdirs.discard(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            files.append(self.check_file(entry.path, stat, stored.pop(entry.path, None), updates))
+            except OSError:
+                continue
+
+            for subdir in known_subdirs:
+                self.forget_subtree(subdir)
+            vanished_files.extend(stored)
+            if mtime_ns >= started_ns - RACY_WINDOW_NS:
+                mtime_ns = -1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                (directory, parent, mtime_ns),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO files (path, dir, size, mtime_ns, hash, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, directory) + values for path, values in updates],
+            )
+
+        self.removed += len(vanished_files)
+        self.connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in vanished_files])
+        self.connection.commit()
+        METRICS.count("stat_calls", stat_calls)
+        METRICS.count("scandir_calls", self.listed_dirs)
+        METRICS.count("scan_index_hits", self.unchanged)
+        return files
+
+    def check_file(self, path, stat, stored, updates):
+        # Compares a listed file with its stored row and queues an update if it changed
+        if stored is not None and stored[:2] == (stat.st_size, stat.st_mtime_ns):
+            self.unchanged += 1
+            return self.file_dict(path, *stored)
+
+        content_hash = None
+        metadata = None
+        if self.use_hash:
+            content_hash = file_hash(path)
+            if stored is not None and stored[2] == content_hash:
+                metadata = stored[3]
+            else:
+                metadata = self.metadata_by_hash(content_hash, stat.st_size)
+
+        updates.append((path, (stat.st_size, stat.st_mtime_ns, content_hash, metadata)))
+        if metadata is not None:
+            self.unchanged += 1
+        else:
+            self.changed += 1
+        return self.file_dict(path, stat.st_size, stat.st_mtime_ns, content_hash, metadata)
+
+    @staticmethod
+    def file_dict(path, size, mtime_ns, content_hash, metadata):
+        file = {
+            "filepath": path,
+            "filename": os.path.basename(path),
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "hash": content_hash,
+            "indexed": metadata is not None,
+        }
+        if metadata is not None:
+            file.update(json.loads(metadata))
+        return file
+
+    def record(self, file):
+        """Stores the metadata of a file dict returned by scan."""
+        metadata = {key: value for key, value in file.items() if key not in FILE_KEYS}
+        self.connection.execute(
+            "UPDATE files SET metadata = ? WHERE path = ?", (json.dumps(metadata), file["filepath"])
+        )
+
+    def refresh(self, path):
+        """Stores the new size, mtime and hash of a file the run wrote to, keeping its metadata."""
+        stat = os.stat(path)
+        content_hash = file_hash(path) if self.use_hash else None
+        self.connection.execute(
+            "UPDATE files SET size = ?, mtime_ns = ?, hash = ? WHERE path = ?",
+            (stat.st_size, stat.st_mtime_ns, content_hash, path),
+        )
+
+    def rename(self, old_path, new_path):
+        """Moves the row of a file renamed within an already scanned directory."""
+        self.connection.execute(
+            "UPDATE files SET path = ?, dir = ? WHERE path = ?",
+            (new_path, os.path.dirname(new_path), old_path),
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def stats(self):
+        return (
+            f"Scan index: {self.unchanged} unchanged, {self.changed} new or changed, "
+            f"{self.removed} removed files; {self.listed_dirs} directories listed, "
+            f"{self.pruned_dirs} unchanged"
+        )
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
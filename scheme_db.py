@@ -0,0 +1,269 @@
+"""
+SQLite form of a classification scheme.
+
+Nodes are numbered in pre-order and stored with their parent, depth and
+materialized code path ("Q/QA/QA76/QA76.9"). A closure table holds one row per
+(descendant, ancestor) pair, the node itself included at distance 0, so
+ancestor and descendant queries are single index range scans and prefix
+queries use the index on the codes. Codes are stored as they are (outline
+classes come with a leading space, " A") and looked up without surrounding
+whitespace.
+
+The nodes are streamed into a temporary file without a journal, the closure
+table is derived from them inside SQLite one level at a time, the indexes are
+built after all rows are in and the file is then renamed into place, so
+readers never see a half written scheme.
+"""
+
+import os
+import sqlite3
+
+from classification_tree import ROOT, ClassificationTree
+from metrics import METRICS
+
+DB_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+PATH_SEPARATOR = "/"
+SCHEMA_VERSION = 1
+
+
+def is_database(file_path):
+    return file_path.endswith(DB_SUFFIXES)
+
+
+def prefix_range(prefix):
+    # Codes starting with prefix sort between prefix and prefix with its last character incremented
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def iter_nodes(tree):
+    """Yields (id, parent, code, name, depth, path) for every node of tree in pre-order."""
+    # Ids and paths from the top-level class down to the current node
+    lineage = []
+    paths = []
+    codes = tree.codes
+    names = tree.names
+    for node_id, (node, depth) in enumerate(tree.walk(), 1):
+        del lineage[depth:]
+        del paths[depth:]
+        code = codes[node]
+        path = f"{paths[-1]}{PATH_SEPARATOR}{code}" if paths else code
+        yield node_id, lineage[-1] if lineage else None, code, names[node], depth, path
+        lineage.append(node_id)
+        paths.append(path)
+
+
+def save_tree(tree, file_path, **meta):
+    """
+    Writes a classification into a new SQLite database, replacing file_path.
+
+    Args:
+        tree (ClassificationTree): The classification.
+        file_path (str): Path of the database.
+        **meta: Stored in the meta table, e.g. source or language.
+
+    Returns:
+        int: The number of nodes written.
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = file_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with METRICS.stage("sqlite_io"):
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.executescript(
+                """
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                PRAGMA locking_mode = EXCLUSIVE;
+                PRAGMA cache_size = -262144;
+                CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE nodes (
+                    id INTEGER PRIMARY KEY,
+                    parent INTEGER,
+                    code TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    path TEXT NOT NULL
+                );
+                CREATE TABLE closure (
+                    descendant INTEGER NOT NULL,
+                    ancestor INTEGER NOT NULL,
+                    distance INTEGER NOT NULL,
+                    PRIMARY KEY (descendant, ancestor)
+                ) WITHOUT ROWID;
+                """
+            )
+            # Streamed from the generator, the rows are never all in memory
+            count = connection.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)", iter_nodes(tree)).rowcount
+            write_closure(connection)
+
+            # Built after the bulk insert, sorting once is much faster than updating per row
+            connection.executescript(
+                """
+                CREATE INDEX nodes_code ON nodes (trim(code), id);
+                CREATE INDEX closure_ancestor ON closure (ancestor, descendant, distance);
+                """
+            )
+            meta = dict(meta, schema_version=SCHEMA_VERSION, nodes=count)
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [(key, str(value)) for key, value in meta.items()])
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(tmp_path, file_path)
+
+    METRICS.count("sqlite_nodes_written", count)
+    return count
+
+
+def write_closure(connection):
+    # Level by level inside SQLite: every node gets its parent's rows one step further
+    connection.execute("INSERT INTO closure SELECT id, id, 0 FROM nodes")
+    max_depth = connection.execute("SELECT MAX(depth) FROM nodes").fetchone()[0] or 0
+    for depth in range(1, max_depth + 1):
+        connection.execute(
+            "INSERT INTO closure SELECT nodes.id, closure.ancestor, closure.distance + 1 "
+            "FROM nodes JOIN closure ON closure.descendant = nodes.parent "
+            "WHERE nodes.depth = ? ORDER BY nodes.id",
+            (depth,),
+        )
+
+
+class SchemeDatabase:
+    """
+    Read access to a scheme written by save_tree.
+
+    Args:
+        file_path (str): Path of the database.
+    """
+
+    def __init__(self, file_path):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"No scheme database at {file_path}")
+        self.file_path = file_path
+        self.connection = sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)
+
+    @property
+    def meta(self):
+        return dict(self.connection.execute("SELECT key, value FROM meta"))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def node_id(self, code):
+        # The first node in pre-order wins if a code is used twice
+        row = self.connection.execute(
+            "SELECT id FROM nodes WHERE trim(code) = ? ORDER BY id LIMIT 1", (code.strip(),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def find(self, code):
+        """
+        Returns:
+            tuple: (code, name, depth, path) of the node, or None.
+        """
+        return self.connection.execute(
+            "SELECT code, name, depth, path FROM nodes WHERE trim(code) = ? ORDER BY id LIMIT 1", (code.strip(),)
+        ).fetchone()
+
+    def code_path(self, code):
+        """Returns the codes from the top-level class down to code, e.g. ["Q", "QA", "QA76"]."""
+        node_id = self.node_id(code)
+        if node_id is None:
+            return None
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT nodes.code FROM closure JOIN nodes ON nodes.id = closure.ancestor "
+                "WHERE closure.descendant = ? ORDER BY closure.distance DESC",
+                (node_id,),
+            )
+        ]
+
+    def ancestors(self, code):
+        """Returns (code, name) of all ancestors of code, the top-level class first."""
+        node_id = self.node_id(code)
+        if node_id is None:
+            return []
+        return self.connection.execute(
+            "SELECT nodes.code, nodes.name FROM closure JOIN nodes ON nodes.id = closure.ancestor "
+            "WHERE closure.descendant = ? AND closure.distance > 0 ORDER BY closure.distance DESC",
+            (node_id,),
+        ).fetchall()
+
+    def descendants(self, code, max_depth=None):
+        """
+        Returns (code, name, distance) of all descendants of code in pre-order.
+
+        Args:
+            max_depth (int): Only descendants at most this many levels below code.
+        """
+        node_id = self.node_id(code)
+        if node_id is None:
+            return []
+        query = (
+            "SELECT nodes.code, nodes.name, closure.distance FROM closure JOIN nodes ON nodes.id = closure.descendant "
+            "WHERE closure.ancestor = ? AND closure.distance > 0"
+        )
+        parameters = [node_id]
+        if max_depth is not None:
+            query += " AND closure.distance <= ?"
+            parameters.append(max_depth)
+        return self.connection.execute(query + " ORDER BY closure.descendant", parameters).fetchall()
+
+    def with_prefix(self, prefix):
+        """Returns all codes starting with prefix, in sorted order."""
+        prefix = prefix.strip()
+        if not prefix:
+            return [row[0] for row in self.connection.execute("SELECT DISTINCT trim(code) FROM nodes ORDER BY 1")]
+        return [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT DISTINCT trim(code) FROM nodes WHERE trim(code) >= ? AND trim(code) < ? ORDER BY 1",
+                prefix_range(prefix),
+            )
+        ]
+
+    def load(self, code=None):
+        """
+        Loads the scheme, or the subtree of code, into a ClassificationTree.
+
+        Node ids are in pre-order, so parents always come before their children
+        and a subtree is a contiguous range of ids.
+        """
+        with METRICS.stage("sqlite_io"):
+            if code is None:
+                rows = self.connection.execute("SELECT parent, code, name FROM nodes ORDER BY id")
+                offset = 0
+            else:
+                offset = self.node_id(code)
+                if offset is None:
+                    raise KeyError(code)
+                rows = self.connection.execute(
+                    "SELECT nodes.parent, nodes.code, nodes.name FROM closure JOIN nodes ON nodes.id = closure.descendant "
+                    "WHERE closure.ancestor = ? ORDER BY closure.descendant",
+                    (offset,),
+                )
+                offset -= 1
+
+            tree = ClassificationTree()
+            add = tree.add
+            for parent, node_code, name in rows:
+                parent = ROOT if parent is None or parent <= offset else parent - offset
+                add(node_code, name, parent)
+        return tree
+
+    def close(self):
+        self.connection.close()
+
+
+def load_tree(file_path, code=None):
+    """Loads a scheme database, or the subtree of code, into a ClassificationTree."""
+    database = SchemeDatabase(file_path)
+    try:
+        return database.load(code)
+    finally:
+        database.close()
@@ -0,0 +1,285 @@
+"""
+Streaming, memory-bounded loading of classification schemes.
+
+YAML files are read as a libyaml event stream, JSON files through a small
+incremental tokenizer. Both produce the same events, which are turned into
+(depth, code, name) nodes in pre-order while the file is being read. Only the
+path from the top-level class to the current node is kept in memory, so peak
+memory depends on the depth of the tree and not on the number of nodes.
+
+The same shapes as ClassificationTree.from_dict are understood, multilingual
+schemes in the language asked for. A node's name
+must come before its subclasses to be streamed through; if it comes after
+them, that node's subtree is buffered until the name is known.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+
+import yaml
+
+from classification_tree import pick_language
+from yaml_io import SafeLoader
+
+MAP_START = "map_start"
+MAP_END = "map_end"
+SEQ_START = "seq_start"
+SEQ_END = "seq_end"
+SCALAR = "scalar"
+
+NAME_KEYS = ("description", "name")
+YAML_NULLS = ("", "~", "null", "Null", "NULL")
+JSON_LITERAL = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null")
+JSON_TOKEN = re.compile(r"[^\s,:\]\}]+")
+JSON_WHITESPACE = re.compile(r"[ \t\n\r,:]*")
+
+
+def iter_yaml_events(file):
+    """Yields (kind, value) events of a YAML document, scalars as str or None."""
+    for event in yaml.parse(file, Loader=SafeLoader):
+        if isinstance(event, yaml.ScalarEvent):
+            value = event.value
+            # implicit[0] is set for plain (unquoted) scalars
+            if event.implicit[0] and value in YAML_NULLS:
+                value = None
+            yield SCALAR, value
+        elif isinstance(event, yaml.MappingStartEvent):
+            yield MAP_START, None
+        elif isinstance(event, yaml.MappingEndEvent):
+            yield MAP_END, None
+        elif isinstance(event, yaml.SequenceStartEvent):
+            yield SEQ_START, None
+        elif isinstance(event, yaml.SequenceEndEvent):
+            yield SEQ_END, None
+        elif isinstance(event, yaml.AliasEvent):
+            raise ValueError("YAML aliases are not supported when streaming")
+
+
+def iter_json_events(file, chunk_size=1 << 16):
+    """
+    Yields (kind, value) events of a JSON document, reading chunk_size
+    characters at a time.
+    """
+    structural = {"{": MAP_START, "}": MAP_END, "[": SEQ_START, "]": SEQ_END}
+    literals = {"true": True, "false": False, "null": None}
+    buffer = ""
+    pos = 0
+    eof = False
+
+    while True:
+        pos = JSON_WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if eof:
+                return
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        char = buffer[pos]
+        if char in structural:
+            yield structural[char], None
+            pos += 1
+            continue
+
+        if char == '"':
+            try:
+                value, end = scanstring(buffer, pos + 1)
+            except json.JSONDecodeError:
+                # The string continues in the next chunk
+                if eof:
+                    raise
+                end = None
+        else:
+            token = JSON_TOKEN.match(buffer, pos)
+            if token.end() == len(buffer) and not eof:
+                # The number or literal may continue in the next chunk
+                end = None
+            elif JSON_LITERAL.fullmatch(token.group()) is None:
+                raise json.JSONDecodeError("Unexpected value", buffer, pos)
+            else:
+                end = token.end()
+                text = token.group()
+                value = literals[text] if text in literals else json.loads(text)
+
+        if end is None:
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield SCALAR, value
+        pos = end
+
+
+class StreamWalker:
+    """
+    Turns a document event stream into (depth, code, name) nodes in pre-order.
+
+    Args:
+        events (iterable): (kind, value) events from iter_yaml_events or iter_json_events.
+        lang (str): Language picked from the names of a multilingual scheme.
+    """
+
+    def __init__(self, events, lang=None):
+        self.events = iter(events)
+        self.lang = lang
+        self.peeked = None
+
+    def next_event(self):
+        if self.peeked is not None:
+            event, self.peeked = self.peeked, None
+            return event
+        return next(self.events)
+
+    def peek_event(self):
+        if self.peeked is None:
+            self.peeked = next(self.events)
+        return self.peeked
+
+    def skip_value(self, event):
+        # Consume a whole value of which the first event was already read
+        depth = 0
+        while True:
+            kind = event[0]
+            if kind in (MAP_START, SEQ_START):
+                depth += 1
+            elif kind in (MAP_END, SEQ_END):
+                depth -= 1
+            if depth == 0:
+                return
+            event = self.next_event()
+
+    def read_name(self):
+        kind, value = self.next_event()
+        if kind == SCALAR:
+            return None if value is None else str(value)
+        if kind == MAP_START:
+            # name: {name: "..."}, or description: {lang: "...", ...} in a multilingual scheme
+            names = {}
+            while True:
+                kind, key = self.next_event()
+                if kind == MAP_END:
+                    return pick_language(names, self.lang) if names else None
+                names[key] = self.read_name()
+        self.skip_value((kind, value))
+        return None
+
+    def __iter__(self):
+        # Skip to the top-level container, a document without one has no nodes
+        for kind, _ in self.events:
+            if kind in (MAP_START, SEQ_START):
+                yield from self.walk_container(kind, 0)
+                return
+
+    def walk_container(self, start, depth):
+        end = MAP_END if start == MAP_START else SEQ_END
+        while True:
+            kind, value = self.next_event()
+            if kind == end:
+                return
+            if start == MAP_START:
+                yield from self.walk_node(str(value), depth, self.next_event())
+            elif kind == MAP_START:
+                yield from self.walk_list_item(depth)
+            elif kind == SCALAR:
+                if value is not None:
+                    yield depth, str(value), ""
+            else:
+                self.skip_value((kind, value))
+
+    def walk_list_item(self, depth):
+        # {code: value} or {code: None, "name": ..., "subclasses": [...]}
+        while True:
+            kind, code = self.next_event()
+            if kind == MAP_END:
+                return
+            event = self.next_event()
+            if event == (SCALAR, None) and self.peek_event()[0] != MAP_END:
+                yield from self.walk_mapping(str(code), depth)
+                return
+            yield from self.walk_node(str(code), depth, event)
+
+    def walk_node(self, code, depth, event):
+        kind, value = event
+        if kind == SCALAR:
+            yield depth, code, "" if value is None else str(value)
+        elif kind == MAP_START:
+            yield from self.walk_mapping(code, depth)
+        else:
+            self.skip_value(event)
+            yield depth, code, ""
+
+    def walk_mapping(self, code, depth):
+        names = {}
+        emitted = False
+        buffered = []
+
+        while True:
+            kind, key = self.next_event()
+            if kind == MAP_END:
+                break
+            if key in NAME_KEYS:
+                names[key] = self.read_name()
+            elif key == "subclasses":
+                event = self.next_event()
+                if event[0] not in (MAP_START, SEQ_START):
+                    self.skip_value(event)
+                    continue
+                children = self.walk_container(event[0], depth + 1)
+                if names and not emitted:
+                    yield depth, code, self.pick_name(names)
+                    emitted = True
+                if emitted:
+                    yield from children
+                else:
+                    buffered.extend(children)
+            else:
+                self.skip_value(self.next_event())
+
+        if not emitted:
+            yield depth, code, self.pick_name(names)
+        yield from buffered
+
+    @staticmethod
+    def pick_name(names):
+        for key in NAME_KEYS:
+            if names.get(key) is not None:
+                return names[key]
+        return ""
+
+
+def iter_scheme_nodes(file_path, lang=None):
+    """
+    Yields (depth, code, name) for every node of a YAML or JSON scheme while
+    the file is being read, names of a multilingual scheme in lang.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        if file_path.endswith(".json"):
+            events = iter_json_events(file)
+        else:
+            events = iter_yaml_events(file)
+        yield from StreamWalker(events, lang)
+
+
+def iter_scheme_paths(file_path, dir_name, separator, lang=None):
+    """
+    Yields relative folder paths, every parent before its children, while the
+    file is being read.
+
+    Args:
+        file_path (str): The YAML or JSON file.
+        dir_name (callable): Builds a folder name from (code, name).
+        separator (str): Path separator, usually os.sep.
+        lang (str): Language of a multilingual scheme, its first by default.
+    """
+    parents = []
+    for depth, code, name in iter_scheme_nodes(file_path, lang):
+        del parents[depth:]
+        folder = dir_name(code, name)
+        path = f"{parents[-1]}{separator}{folder}" if parents else folder
+        parents.append(path)
+        yield path
@@ -0,0 +1,19 @@
+"""
+Helpers of classification_tree.
+
+Run with `python3 -m pytest tests`.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classification_tree import parse_languages  # noqa: E402
+
+
+def test_parse_languages():
+    assert parse_languages(" EN, de,,en") == ["en", "de"]
+    assert parse_languages("zh-CN,ZH-TW,zh-CN") == ["zh-CN", "zh-TW"]
+    assert parse_languages("") == []
@@ -0,0 +1,34 @@
+"""
+Rename planning of clean_filenames.
+
+Run with `python3 -m pytest tests`.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from clean_filenames import plan_renames  # noqa: E402
+
+
+def file_list(directory, names):
+    return [{"filepath": os.path.join(directory, name), "filename": name} for name in names]
+
+
+def test_claimed_target_is_a_collision(tmp_path):
+    files = file_list(str(tmp_path), ["a_b.pdf", "a:b.pdf"])
+    renames, collisions, unchanged = plan_renames(files)
+    assert renames == [(str(tmp_path / "a:b.pdf"), str(tmp_path / "a b.pdf"))]
+    assert collisions == [(str(tmp_path / "a_b.pdf"), str(tmp_path / "a b.pdf"))]
+
+
+def test_target_freed_within_plan_is_a_collision(tmp_path):
+    # "A (auth.).pdf" is renamed to "A .pdf", but its name stays taken for the
+    # file that would be cleaned into it
+    files = file_list(str(tmp_path), ["A (auth.).pdf", "A (auth(auth.).).pdf"])
+    renames, collisions, unchanged = plan_renames(files)
+    assert renames == [(str(tmp_path / "A (auth.).pdf"), str(tmp_path / "A .pdf"))]
+    assert collisions == [(str(tmp_path / "A (auth(auth.).).pdf"), str(tmp_path / "A (auth.).pdf"))]
+    assert unchanged == []
@@ -0,0 +1,111 @@
+"""
+ISBN lookups against the local stub server in benchmarks/stub_isbn_server.py.
+
+Run with `python3 -m pytest tests`.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from isbn_lookup import GoogleBooksProvider, HttpSession, IsbnLookup, LookupCache, OpenLibraryProvider  # noqa: E402
+from stub_isbn_server import StubServer  # noqa: E402
+
+ISBN = "9780306406157"
+UNKNOWN_ISBN = "9781234567897"
+BOOK = {"title": "Signal Processing", "authors": ["A. Author", "B. Author"], "categories": ["Mathematics", "Physics"]}
+
+
+@pytest.fixture
+def server():
+    server = StubServer({ISBN: BOOK}, port=0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def providers(server):
+    return (
+        GoogleBooksProvider(server.base_url + "/books/v1/volumes"),
+        OpenLibraryProvider(server.base_url + "/search.json"),
+    )
+
+
+def test_google_books_parse(providers):
+    google, _ = providers
+    record = IsbnLookup().lookup(google, ISBN)
+    assert record == {
+        "title": "Signal Processing",
+        "authors": ["A. Author", "B. Author"],
+        "subject": "Mathematics, Physics",
+        "categories": ["Mathematics", "Physics"],
+        "source": "google_books",
+        "isbn_10": None,
+        "isbn_13": ISBN,
+    }
+
+
+def test_open_library_parse(providers):
+    _, open_library = providers
+    record = IsbnLookup().lookup(open_library, ISBN)
+    assert record == {
+        "title": "Signal Processing",
+        "authors": ["A. Author", "B. Author"],
+        "subject": "Mathematics, Physics",
+        "categories": ["Mathematics", "Physics"],
+        "source": "open_library",
+        "isbn_10": None,
+        "isbn_13": ISBN,
+    }
+
+
+def test_unknown_isbn_is_none(providers):
+    for provider in providers:
+        assert IsbnLookup().lookup(provider, UNKNOWN_ISBN) is None
+
+
+def test_cache_hit_on_second_lookup(server, providers, tmp_path):
+    google, _ = providers
+    lookup = IsbnLookup(LookupCache(str(tmp_path / "cache.sqlite")))
+    first = lookup.lookup(google, ISBN)
+    second = lookup.lookup(google, ISBN)
+    assert first == second
+    assert server.requests["/books/v1/volumes"] == 1
+    assert (lookup.cache.hits, lookup.cache.misses) == (1, 1)
+    lookup.close()
+
+
+def test_not_found_ttl(server, providers, tmp_path):
+    google, _ = providers
+    # Found records stay valid, "not found" answers expire at once
+    lookup = IsbnLookup(LookupCache(str(tmp_path / "cache.sqlite"), ttl=3600, not_found_ttl=0))
+    for _ in range(2):
+        assert lookup.lookup(google, ISBN) is not None
+        assert lookup.lookup(google, UNKNOWN_ISBN) is None
+    assert server.requests["/books/v1/volumes"] == 3
+    assert lookup.cache.not_found_hits == 0
+    lookup.close()
+
+    lookup = IsbnLookup(LookupCache(str(tmp_path / "cache.sqlite"), ttl=3600, not_found_ttl=3600))
+    assert lookup.lookup(google, UNKNOWN_ISBN) is None
+    assert lookup.cache.not_found_hits == 1
+    assert server.requests["/books/v1/volumes"] == 3
+    lookup.close()
+
+
+def test_connection_reuse(server, providers):
+    session = HttpSession()
+    lookup = IsbnLookup(session=session)
+    for provider in providers:
+        for _ in range(5):
+            lookup.lookup(provider, ISBN)
+    assert session.requests == 10
+    # Both providers live on the same host, one keep-alive connection serves all requests
+    assert server.connections == 1
+    lookup.close()
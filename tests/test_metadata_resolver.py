@@ -0,0 +1,34 @@
+"""
+MetadataResolver against the local stub server in benchmarks/stub_isbn_server.py.
+
+Run with `python3 -m pytest tests`.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from isbn_lookup import GoogleBooksProvider, IsbnLookup, LookupCache  # noqa: E402
+from metadata_resolver import MetadataResolver, ProviderSlot  # noqa: E402
+from stub_isbn_server import StubServer  # noqa: E402
+
+
+def test_concurrency_limit_holds_after_timeouts(tmp_path):
+    server = StubServer({}, port=0, default_latency=0.5).start()
+    try:
+        slot = ProviderSlot(GoogleBooksProvider(server.base_url + "/books/v1/volumes"), timeout=0.05, concurrency=2)
+        resolver = MetadataResolver([slot], IsbnLookup(LookupCache(str(tmp_path / "cache.sqlite"))))
+        for batch in range(3):
+            records = resolver.resolve_batch([[f"97800000000{batch}{i}"] for i in range(4)])
+            assert records == [None] * 4
+        # Timed out requests are waited for before the cache is closed
+        resolver.close()
+        assert slot.timeouts == 12
+        assert server.max_in_flight <= 2
+        assert server.in_flight == 0
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,100 @@
+"""
+MoveJournal recovery with the moves of ingest_pdfs and clean_filenames.
+
+Run with `python3 -m pytest tests`.
+"""
+
+import errno
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ingest_pdfs  # noqa: E402
+from clean_filenames import apply_renames  # noqa: E402
+from move_journal import PARTIAL, MoveJournal  # noqa: E402
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return str(path)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_failed_move_keeps_existing_target(tmp_path):
+    src = write(tmp_path / "book.pdf", "new")
+    dst = write(tmp_path / "shelf.pdf", "someone else's")
+    journal = MoveJournal(str(tmp_path / "journal.jsonl"))
+    assert ingest_pdfs.apply_moves([(src, dst)], journal) == 0
+    assert journal.states() == {(src, dst): "failed"}
+    assert journal.recover() == []
+    journal.close()
+    assert read(src) == "new"
+    assert read(dst) == "someone else's"
+
+
+def test_recover_never_removes_target(tmp_path):
+    src = write(tmp_path / "book.pdf", "new")
+    dst = write(tmp_path / "shelf.pdf", "someone else's")
+    journal = MoveJournal(str(tmp_path / "journal.jsonl"))
+    # Crashed after planning, a file appeared at the target meanwhile
+    journal.plan([(src, dst)])
+    assert journal.recover() == [(src, dst, "target exists")]
+    journal.close()
+    assert read(dst) == "someone else's"
+
+
+def test_recover_removes_partial_copy(tmp_path):
+    src = write(tmp_path / "book.pdf", "new")
+    dst = str(tmp_path / "shelf.pdf")
+    write(dst + PARTIAL, "ne")
+    journal = MoveJournal(str(tmp_path / "journal.jsonl"))
+    journal.plan([(src, dst)])
+    assert journal.recover() == [(src, dst, "undone")]
+    journal.close()
+    assert not os.path.exists(dst + PARTIAL)
+    assert read(src) == "new"
+
+
+def test_move_across_file_systems(tmp_path, monkeypatch):
+    src = write(tmp_path / "book.pdf", "new")
+    dst = str(tmp_path / "shelf.pdf")
+    rename = os.rename
+
+    def cross_device(a, b):
+        if a == src:
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        rename(a, b)
+
+    monkeypatch.setattr(os, "rename", cross_device)
+    ingest_pdfs.move_file(src, dst)
+    assert read(dst) == "new"
+    assert not os.path.exists(src)
+    assert not os.path.exists(dst + PARTIAL)
+
+
+def test_move_never_replaces(tmp_path):
+    src = write(tmp_path / "book.pdf", "new")
+    dst = write(tmp_path / "shelf.pdf", "someone else's")
+    with pytest.raises(FileExistsError):
+        ingest_pdfs.move_file(src, dst)
+    assert read(dst) == "someone else's"
+
+
+def test_failed_rename_is_journaled(tmp_path):
+    src = write(tmp_path / "a_book.pdf", "new")
+    dst = write(tmp_path / "a book.pdf", "someone else's")
+    journal = MoveJournal(str(tmp_path / "journal.jsonl"))
+    done, failed = apply_renames([(src, dst)], journal)
+    assert done == [] and len(failed) == 1
+    assert journal.recover() == []
+    journal.close()
+    assert read(dst) == "someone else's"
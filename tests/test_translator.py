@@ -0,0 +1,42 @@
+"""
+Retries of BatchTranslator.call_backend.
+
+Run with `python3 -m pytest tests`.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from translator import BatchTranslator, FakeBackend, TransientError  # noqa: E402
+
+
+class FailingBackend(FakeBackend):
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+
+    def translate(self, text, lang):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().translate(text, lang)
+
+
+def test_transient_errors_are_retried():
+    backend = FailingBackend([TransientError("429"), ConnectionResetError()])
+    translator = BatchTranslator(backend, retries=2, backoff=0)
+    assert translator.call_backend("Science", "de") == "[de] Science"
+
+
+def test_other_errors_fail_at_once():
+    for error in (ModuleNotFoundError("deep_translator"), ValueError("unknown language")):
+        translator = BatchTranslator(FailingBackend([error]), retries=3, backoff=10)
+        start = time.perf_counter()
+        with pytest.raises(type(error)):
+            translator.call_backend("Science", "xx")
+        assert time.perf_counter() - start < 1
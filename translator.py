@@ -0,0 +1,554 @@
+"""
+Translation backends and a batched translation pass for classification trees.
+
+The tree is walked once, every unique string is collected and the strings are
+packed into as few request-sized payloads as the backend allows. The results
+are mapped back into a copy of the tree afterwards.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import METRICS
+
+MAX_PAYLOAD_SIZE = 5000
+PAYLOAD_SEPARATOR = "\n"
+
+
+class TransientError(Exception):
+    """A failed backend call that may succeed when retried, e.g. a rate limit."""
+
+
+class GoogleBackend:
+    """Translation backend using deep_translator's GoogleTranslator."""
+
+    name = "google"
+    max_payload_size = MAX_PAYLOAD_SIZE
+
+    def __init__(self, source="auto"):
+        self.source = source
+        self.calls = 0
+        # One translator per thread and language, they are not thread safe
+        self._local = threading.local()
+
+    def translate(self, text, lang):
+        # Imported lazily, so the fake backend works without deep_translator
+        from deep_translator import GoogleTranslator
+        from deep_translator.exceptions import RequestError, ServerException, TooManyRequests
+
+        translators = self._local.__dict__.setdefault("translators", {})
+        if lang not in translators:
+            translators[lang] = GoogleTranslator(source=self.source, target=lang)
+        self.calls += 1
+        try:
+            return translators[lang].translate(text)
+        except (RequestError, ServerException, TooManyRequests) as error:
+            raise TransientError(str(error)) from error
+
+
+class FakeBackend:
+    """
+    Local stand-in for a network backend, used in tests and benchmarks.
+
+    Every line is prefixed with the target language, e.g. "Science" becomes
+    "[de] Science". An optional latency is slept on every call.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.0, max_payload_size=MAX_PAYLOAD_SIZE):
+        self.latency = latency
+        self.max_payload_size = max_payload_size
+        self.calls = 0
+
+    def translate(self, text, lang):
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        return PAYLOAD_SEPARATOR.join(
+            f"[{lang}] {line}" if line else line
+            for line in text.split(PAYLOAD_SEPARATOR)
+        )
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def get_backend(name):
+    """
+    Creates a translation backend by name.
+
+    Args:
+        name (str): One of the keys of BACKENDS.
+
+    Returns:
+        object: The backend instance.
+    """
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown translation backend '{name}', choose from {', '.join(BACKENDS)}"
+        )
+    return BACKENDS[name]()
+
+
+def split_text_into_chunks(text, max_chunk_size=MAX_PAYLOAD_SIZE):
+    # Split a long text at line boundaries into chunks of at most max_chunk_size
+    chunks = []
+    current_chunk = []
+    current_length = 0
+
+    for line in text.splitlines(keepends=True):
+        line_length = len(line)
+        if current_chunk and current_length + line_length > max_chunk_size:
+            chunks.append("".join(current_chunk))
+            current_chunk = [line]
+            current_length = line_length
+        else:
+            current_chunk.append(line)
+            current_length += line_length
+
+    if current_chunk:
+        chunks.append("".join(current_chunk))
+
+    return chunks
+
+
+def collect_strings(tree):
+    """
+    Collects every unique string leaf of a nested dict/list tree.
+
+    Keys are left alone, only values are collected. The order of first
+    appearance is kept.
+
+    Args:
+        tree (dict): The tree to walk.
+
+    Returns:
+        list: The unique strings.
+    """
+    seen = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            values = list(node.values())
+        elif isinstance(node, list):
+            values = list(node)
+        else:
+            continue
+        for value in reversed(values):
+            if isinstance(value, str):
+                seen.setdefault(value, None)
+            else:
+                stack.append(value)
+    return list(seen)
+
+
+def apply_translations(tree, translations):
+    """
+    Returns a copy of the tree with every string leaf replaced by its translation.
+
+    Args:
+        tree (dict): The tree to copy.
+        translations (dict): Mapping of original to translated string.
+
+    Returns:
+        dict: The translated copy.
+    """
+    if isinstance(tree, dict):
+        return {key: apply_translations(value, translations) for key, value in tree.items()}
+    if isinstance(tree, list):
+        return [apply_translations(value, translations) for value in tree]
+    if isinstance(tree, str):
+        return translations.get(tree, tree)
+    return tree
+
+
+def pack_payloads(texts, max_payload_size=MAX_PAYLOAD_SIZE):
+    """
+    Packs texts into as few separator-joined payloads as the size limit allows.
+
+    Texts that contain the separator or are larger than the limit on their own
+    get a payload of their own.
+
+    Args:
+        texts (list): The strings to pack.
+        max_payload_size (int): The maximum payload length in characters.
+
+    Returns:
+        list: A list of payloads, each one a list of texts.
+    """
+    payloads = []
+    current = []
+    current_length = 0
+
+    for text in texts:
+        if PAYLOAD_SEPARATOR in text or len(text) >= max_payload_size:
+            payloads.append([text])
+            continue
+
+        added_length = len(text) + (len(PAYLOAD_SEPARATOR) if current else 0)
+        if current and current_length + added_length > max_payload_size:
+            payloads.append(current)
+            current = []
+            current_length = 0
+            added_length = len(text)
+
+        current.append(text)
+        current_length += added_length
+
+    if current:
+        payloads.append(current)
+
+    return payloads
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum burst size, defaults to one second worth of tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Block until a token is available and take it
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class TranslationCache:
+    """
+    Persistent SQLite cache of translated strings.
+
+    Entries are keyed by (source text hash, source lang, target lang, backend).
+    When more than max_entries are stored, the least recently used entries are
+    evicted.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        max_entries (int): Upper bound for the number of cached translations.
+    """
+
+    def __init__(self, path, max_entries=200000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # Several target languages are translated at once, each thread uses the cache
+        self.lock = threading.Lock()
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                text_hash TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (text_hash, source_lang, target_lang, backend)
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts, source_lang, target_lang, backend):
+        """
+        Looks up cached translations.
+
+        Returns:
+            dict: Mapping of original to translated string for all hits.
+        """
+        with self.lock:
+            hashes = {self.text_hash(text): text for text in texts}
+            found = {}
+            keys = list(hashes)
+            # Stay below SQLite's limit for bound parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = self.connection.execute(
+                    f"""
+                    SELECT text_hash, translation FROM translations
+                    WHERE source_lang = ? AND target_lang = ? AND backend = ?
+                    AND text_hash IN ({", ".join("?" * len(batch))})
+                    """,
+                    [source_lang, target_lang, backend, *batch],
+                ).fetchall()
+                found.update((hashes[text_hash], translation) for text_hash, translation in rows)
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    """
+                    UPDATE translations SET last_used = ?
+                    WHERE text_hash = ? AND source_lang = ? AND target_lang = ? AND backend = ?
+                    """,
+                    [
+                        (now, self.text_hash(text), source_lang, target_lang, backend)
+                        for text in found
+                    ],
+                )
+                self.connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, translations, source_lang, target_lang, backend):
+        """
+        Stores translations and evicts the oldest entries above max_entries.
+
+        Args:
+            translations (dict): Mapping of original to translated string.
+        """
+        with self.lock:
+            now = time.time()
+            self.connection.executemany(
+                """
+                INSERT OR REPLACE INTO translations
+                (text_hash, source_lang, target_lang, backend, translation, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (self.text_hash(text), source_lang, target_lang, backend, translation, now)
+                    for text, translation in translations.items()
+                ],
+            )
+            self.evict()
+            self.connection.commit()
+
+    def evict(self):
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM translations").fetchone()
+        if count > self.max_entries:
+            self.connection.execute(
+                """
+                DELETE FROM translations WHERE rowid IN (
+                    SELECT rowid FROM translations ORDER BY last_used LIMIT ?
+                )
+                """,
+                (count - self.max_entries,),
+            )
+
+    def invalidate(self, target_lang=None, backend=None, text=None):
+        """
+        Removes cached entries. Without arguments the whole cache is cleared.
+
+        Args:
+            target_lang (str): Only remove entries for this target language.
+            backend (str): Only remove entries of this backend.
+            text (str): Only remove the entries for this source text.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        conditions = []
+        params = []
+        if target_lang:
+            conditions.append("target_lang = ?")
+            params.append(target_lang)
+        if backend:
+            conditions.append("backend = ?")
+            params.append(backend)
+        if text is not None:
+            conditions.append("text_hash = ?")
+            params.append(self.text_hash(text))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.connection.execute(f"DELETE FROM translations{where}", params)
+        self.connection.commit()
+        return cursor.rowcount
+
+    def stats(self):
+        return f"Translation cache: {self.hits} hits, {self.misses} misses"
+
+    def close(self):
+        self.connection.close()
+
+
+class BatchTranslator:
+    """
+    Translates whole classification trees with as few backend calls as possible.
+
+    Args:
+        backend (object): Any object with a translate(text, lang) method.
+            Defaults to GoogleBackend.
+        max_payload_size (int): Payload size limit, defaults to the backend's.
+        cache (TranslationCache): Optional persistent cache, consulted before
+            the backend is called.
+        workers (int): Number of payloads translated concurrently.
+        rate_limit (float): Maximum backend calls per second, unlimited if None.
+        retries (int): How often a backend call failing with a TransientError
+            or a network error (OSError) is retried.
+        backoff (float): Initial retry delay in seconds, doubled on every retry.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        max_payload_size=None,
+        cache=None,
+        workers=1,
+        rate_limit=None,
+        retries=3,
+        backoff=0.5,
+    ):
+        self.backend = backend or GoogleBackend()
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_payload_size = max_payload_size or getattr(
+            self.backend, "max_payload_size", MAX_PAYLOAD_SIZE
+        )
+
+    def call_backend(self, text, lang):
+        # Rate limited backend call with exponential backoff on transient
+        # failures; a missing module or an unknown language fails at once
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                METRICS.count("translation_requests")
+                METRICS.count("translation_bytes", len(text.encode("utf-8")))
+                return self.backend.translate(text, lang)
+            except (TransientError, OSError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+
+    def translate_text(self, text, lang):
+        # Long texts are split at line boundaries and translated chunk by chunk
+        return "".join(
+            self.call_backend(chunk, lang)
+            for chunk in split_text_into_chunks(text, self.max_payload_size)
+        )
+
+    def translate_payload(self, payload, lang):
+        """
+        Translates one packed payload and returns the translated texts in order.
+
+        If the backend does not keep the line structure intact, the texts of
+        the payload are translated one by one instead.
+        """
+        if len(payload) == 1:
+            return [self.translate_text(payload[0], lang)]
+
+        result = self.call_backend(PAYLOAD_SEPARATOR.join(payload), lang)
+        lines = result.split(PAYLOAD_SEPARATOR) if result is not None else []
+        if len(lines) != len(payload):
+            return [self.translate_text(text, lang) for text in payload]
+        return lines
+
+    def translate_strings(self, texts, lang):
+        """
+        Translates a list of strings.
+
+        Args:
+            texts (list): The strings to translate, duplicates are translated once.
+            lang (str): The target language code.
+
+        Returns:
+            dict: Mapping of original to translated string.
+        """
+        unique_texts = [text for text in dict.fromkeys(texts) if text.strip()]
+        source_lang = getattr(self.backend, "source", "auto")
+        backend_name = getattr(self.backend, "name", type(self.backend).__name__)
+
+        translations = {}
+        if self.cache is not None:
+            translations = self.cache.get_many(
+                unique_texts, source_lang, lang, backend_name
+            )
+            unique_texts = [text for text in unique_texts if text not in translations]
+            METRICS.count("translation_cache_hits", len(translations))
+
+        fetched = {}
+        payloads = pack_payloads(unique_texts, self.max_payload_size)
+        if self.workers > 1 and len(payloads) > 1:
+            # map() hands the results back in payload order
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(
+                    lambda payload: self.translate_payload(payload, lang), payloads
+                )
+                for payload, translated in zip(payloads, results):
+                    fetched.update(zip(payload, translated))
+        else:
+            for payload in payloads:
+                fetched.update(zip(payload, self.translate_payload(payload, lang)))
+
+        if self.cache is not None and fetched:
+            self.cache.put_many(fetched, source_lang, lang, backend_name)
+
+        translations.update(fetched)
+        return translations
+
+    def translate_many(self, texts, langs):
+        """
+        Translates a list of strings into several languages at once.
+
+        Every language is translated on its own thread, with up to workers
+        payloads in flight each. The rate limit applies to all of them together.
+
+        Args:
+            texts (list): The strings to translate, duplicates are translated once.
+            langs (list): The target language codes.
+
+        Returns:
+            dict: Mapping of language code to a translate_strings mapping.
+        """
+        texts = list(dict.fromkeys(texts))
+        if len(langs) == 1:
+            return {langs[0]: self.translate_strings(texts, langs[0])}
+        with ThreadPoolExecutor(max_workers=len(langs)) as executor:
+            results = executor.map(lambda lang: self.translate_strings(texts, lang), langs)
+            return dict(zip(langs, results))
+
+    def translate_tree(self, tree, lang):
+        """
+        Translates all string values of a nested dict/list tree.
+
+        Args:
+            tree (dict): The tree to translate.
+            lang (str): The target language code.
+
+        Returns:
+            dict: A translated copy of the tree.
+        """
+        translations = self.translate_strings(collect_strings(tree), lang)
+        return apply_translations(tree, translations)
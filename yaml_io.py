@@ -0,0 +1,112 @@
+"""
+Fast YAML/JSON loading and YAML dumping.
+
+The C-accelerated libyaml loader and dumper are used when PyYAML was built
+with them, with a transparent fallback to the pure-Python implementations.
+Parsed documents are kept in a compiled cache file next to the source file,
+keyed by path, mtime and size, so repeated runs skip parsing entirely.
+"""
+
+import json
+import marshal
+import os
+
+import yaml
+
+from metrics import METRICS
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+CACHE_VERSION = 1
+
+
+def cache_path(file_path):
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.cache")
+
+
+def cache_key(file_path):
+    stat = os.stat(file_path)
+    return (CACHE_VERSION, os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+def read_cache(file_path):
+    """
+    Returns the cached document for file_path, or None if the cache is missing
+    or stale.
+    """
+    try:
+        with open(cache_path(file_path), "rb") as file:
+            key, data = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if tuple(key) != cache_key(file_path):
+        return None
+    return data
+
+
+def write_cache(file_path, key, data):
+    # Documents with values marshal can't store (e.g. YAML timestamps) are not cached
+    path = cache_path(file_path)
+    try:
+        with open(path + ".tmp", "wb") as file:
+            marshal.dump((key, data), file)
+        os.replace(path + ".tmp", path)
+    except (OSError, ValueError):
+        try:
+            os.remove(path + ".tmp")
+        except OSError:
+            pass
+
+
+def parse_file(file_path):
+    if file_path.endswith(".json"):
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    with open(file_path, "r", encoding="utf8") as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+
+def load_file(file_path, use_cache=True):
+    """
+    Loads a YAML or JSON file, from the compiled cache where possible.
+
+    Args:
+        file_path (str): The path to the YAML or JSON file.
+        use_cache (bool): Read and write the compiled cache.
+
+    Returns:
+        The loaded document.
+    """
+    with METRICS.stage("yaml_io"):
+        if not use_cache:
+            return parse_file(file_path)
+
+        data = read_cache(file_path)
+        if data is not None:
+            METRICS.count("yaml_cache_hits")
+            return data
+
+        key = cache_key(file_path)
+        data = parse_file(file_path)
+        write_cache(file_path, key, data)
+        return data
+
+
+def dump_yaml(data, stream=None):
+    """
+    Dumps data as block-style YAML, keeping the key order and unicode characters.
+
+    Returns:
+        str: The YAML text if no stream was given.
+    """
+    with METRICS.stage("yaml_io"):
+        return yaml.dump(
+            data,
+            stream,
+            Dumper=SafeDumper,
+            sort_keys=False,
+            default_flow_style=False,
+            allow_unicode=True,
+        )
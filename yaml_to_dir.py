@@ -1,81 +1,138 @@
 import os
-import yaml
-import json
 import argparse
 
+from classification_tree import ClassificationTree, parse_languages
+from folder_plan import materialize
+import metrics
+from metrics import METRICS
+from scheme_db import is_database, load_tree
+from stream_loader import iter_scheme_paths
+from yaml_io import load_file
+
+
+def folder_name(code, name):
+    return f"{code} {name}".strip()
+
+
+def create_folder_structure(base_dir, classification_dict, level=0, max_levels=None, jobs=1, dry_run=False, force=False):
+    # Plan all directories first, then only create the missing ones
+    if not isinstance(classification_dict, ClassificationTree):
+        classification_dict = ClassificationTree.from_dict(classification_dict)
+    max_depth = None if max_levels is None else max_levels - level
+
+    return materialize(
+        base_dir,
+        classification_dict.iter_folder_paths(folder_name, max_depth=max_depth),
+        dry_run=dry_run,
+        force=force,
+        jobs=jobs,
+    )
+
+
+def create_folder_structure_streaming(base_dir, file_path, dry_run=False, lang=None):
+    # Create the directories while the file is still being read, memory only
+    # depends on the depth of the tree
+    created = 0
+    existing = 0
+    with METRICS.stage("mkdir_walk"):
+        for path in iter_scheme_paths(file_path, folder_name, os.sep, lang):
+            current_dir = os.path.join(base_dir, path)
+            if dry_run:
+                print(f"mkdir {current_dir}")
+                continue
+            try:
+                os.mkdir(current_dir)
+                created += 1
+            except FileExistsError:
+                existing += 1
+            except FileNotFoundError:
+                # Names containing a path separator need intermediate directories
+                os.makedirs(current_dir, exist_ok=True)
+                created += 1
+    METRICS.count("mkdir_calls", created + existing)
+    if not dry_run:
+        print(f"{created} directories created, {existing} existing")
 
-def create_folder_structure(base_dir, classification_dict, level=0, max_levels=10):
-    if level > max_levels:
-        return
-
-    # Process the current level of the dictionary
-    for key, value in classification_dict.items():
-        # print(key, value)
-        if value is None:
-            print(key, "Value is None")
-            continue  # Skip if value is None
-
-        # Check if the value is a dictionary, which means we have a class with subclasses
-        if isinstance(value, dict):
-            # Retrieve the 'name' key if present, otherwise use an empty string
-            dir_name = f"{key} {value.get('name', '')}".strip()
-            current_dir = os.path.join(base_dir, dir_name)
-            os.makedirs(current_dir, exist_ok=True)
-            print(f"Created directory DICT: {current_dir}")
-
-            # If there are subclasses, recursively process them
-            subclasses = value.get('subclasses', [])
-            # print(subclasses)
-            if isinstance(subclasses, list):
-                # print("LIST")
-                for subclass in subclasses:
-                    # Each subclass is a dictionary; get its key and value
-                    if subclass:
-                        # print(subclass)
-                        subclass_key, subclass_value = list(subclass.items())[0]
-                        # Call the function recursively with the subclass dictionary
-                        create_folder_structure(current_dir, {subclass_key: subclass_value}, level + 1, max_levels)
-
-        # If the value is a string, we have a subclass entry
-        elif isinstance(value, str):
-            dir_name = f"{key} {value}".strip()
-            current_dir = os.path.join(base_dir, dir_name)
-            os.makedirs(current_dir, exist_ok=True)
-            print(f"Created directory STRING: {current_dir}")
-            
 
 def main():
     # Set up argument parsing
     parser = argparse.ArgumentParser(
         description="Create folder structure from a YAML file."
     )
-    parser.add_argument("file", type=str, help="Path to the YAML file")
+    parser.add_argument("file", type=str, help="Path to the YAML file, or a database written by save_sqlite")
     parser.add_argument(
         "output_dir",
         type=str,
         help="Base output directory where folders will be created",
     )
 
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of top-level classes whose folders are created in parallel",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the directories that would be created",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Scan the folder structure even if it is unchanged since the last run",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Create folders while reading the file, for schemes too large to load at once",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the file instead of using its compiled cache",
+    )
+    parser.add_argument(
+        "--subtree",
+        help="Only create the folders of this class and its subclasses (databases only)",
+    )
+
+    parser.add_argument(
+        "--lang",
+        help="Language of a multilingual scheme, comma separated for one folder tree per language in OUTPUT_DIR/LANG",
+    )
+
+    metrics.add_arguments(parser)
+
     # Parse arguments
     args = parser.parse_args()
+    langs = parse_languages(args.lang or "") or [None]
     
     
-    if args.file.endswith("yaml"):
-        with open(args.file, "r", encoding="utf8") as file:
-            data = yaml.safe_load(file)
+    with metrics.measured(args):
+        if is_database(args.file):
+            data = load_tree(args.file, args.subtree)
+            create_folder_structure(args.output_dir, data, jobs=args.jobs, dry_run=args.dry_run, force=args.force)
+
+        elif args.stream and (args.file.endswith("yaml") or args.file.endswith("json")):
+            for lang in langs:
+                output_dir = os.path.join(args.output_dir, lang) if len(langs) > 1 else args.output_dir
+                if not args.dry_run:
+                    os.makedirs(output_dir, exist_ok=True)
+                create_folder_structure_streaming(output_dir, args.file, dry_run=args.dry_run, lang=lang)
+
+        elif args.file.endswith("yaml") or args.file.endswith("json"):
+            data = load_file(args.file, use_cache=not args.no_cache)
             # print(json.dumps(data, indent=4))
-        create_folder_structure(args.output_dir, data)
-        
-    
-    elif args.file.endswith("json"):
-        with open(args.file, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            # print(data)
-        create_folder_structure(args.output_dir, data)
+            for lang in langs:
+                output_dir = os.path.join(args.output_dir, lang) if len(langs) > 1 else args.output_dir
+                tree = ClassificationTree.from_dict(data, lang)
+                create_folder_structure(output_dir, tree, jobs=args.jobs, dry_run=args.dry_run, force=args.force)
+            
         
-    
-    else:
-        print("No valid file was provided")
+        else:
+            print("No valid file was provided")
 
     # Create the folder structure
 